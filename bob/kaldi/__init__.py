@@ -1,22 +1,50 @@
+from .aio import agmm_score
+from .aio import aivector_extract
+from .aio import amfcc
+from .aio import annet_forward
+from .aio import aplda_score
+from .cache import FeatureCache
+from .cache import UbmCache
 from .cepstral import cepstral
 from .dnn import compute_dnn_phone
 from .dnn import compute_dnn_vad
 from .dnn import nnet_forward
+from .extractor import FeatureExtractor
+from .fbank import fbank
+from .fbank import fbank_mfcc
 from .gmm import gmm_score
+from .gmm import gmm_score_fast
+from .gmm import gmm_score_matrix
 from .gmm import ubm_enroll
 from .gmm import ubm_full_train
 from .gmm import ubm_train
 from .hmm import train_mono
-
-# from .gmm import gmm_score_fast
 from .ivector import ivector_extract
 from .ivector import ivector_train
 from .ivector import plda_enroll
 from .ivector import plda_score
 from .ivector import plda_train
 from .mfcc import compute_vad
+from .mfcc import compute_vad_batch
 from .mfcc import mfcc
+from .mfcc import mfcc_batch
 from .mfcc import mfcc_from_path
+from .mfcc import mfcc_from_paths
+from .mfcc import mfcc_from_segments
+from .mfcc import mfcc_vad
+from .models import DiagGmm
+from .models import FullGmm
+from .online import OnlineMfcc
+from .online import mfcc_chunked
+from .native import add_deltas
+from .native import apply_cmvn
+from .native import apply_cmvn_sliding
+from .native import compute_cmvn_stats
+from .native import compute_vad_from_feats
+from .native import get_backend
+from .native import set_backend
+from .worker import KaldiWorker
+from .worker import WorkerPool
 
 
 def get_config():
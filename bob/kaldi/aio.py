@@ -0,0 +1,479 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+"""Coroutines running the Kaldi binaries without blocking an event loop"""
+
+import asyncio
+import collections
+import functools
+import logging
+import os
+import signal
+import tempfile
+import weakref
+from io import BytesIO
+
+from . import io
+from . import native
+from .mfcc import _mfcc_commands
+from .models import _Gmm
+
+logger = logging.getLogger(__name__)
+
+_max_concurrency = os.cpu_count() or 1
+_limits = weakref.WeakKeyDictionary()
+
+
+def set_max_concurrency(limit):
+    """Sets how many Kaldi pipelines the coroutines run at the same time.
+
+    Requests above the limit wait for a running pipeline to finish. The
+    limit applies to each event loop separately, and changing it takes
+    effect on the pipelines already waiting.
+
+    Parameters
+    ----------
+    limit : int
+        The maximum number of concurrent pipelines, by default the number
+        of CPUs.
+    """
+    global _max_concurrency
+    if limit < 1:
+        raise ValueError("The concurrency limit must be positive, not %s" % limit)
+    _max_concurrency = limit
+    for loop, limiter in list(_limits.items()):
+        try:
+            loop.call_soon_threadsafe(limiter.resize)
+        except RuntimeError:
+            pass  # the loop is closed
+
+
+class _Limiter(object):
+    """A semaphore of an event loop whose size is ``_max_concurrency``, read
+    again whenever a pipeline starts or the limit changes"""
+
+    def __init__(self):
+        self._running = 0
+        self._waiters = collections.deque()
+
+    def resize(self):
+        # wake as many waiters as the limit lets run
+        free = _max_concurrency - self._running
+        for waiter in self._waiters:
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self):
+        while self._running >= _max_concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                self.resize()  # pass a wake-up on to the next waiter
+                raise
+            finally:
+                self._waiters.remove(waiter)
+        self._running += 1
+
+    async def __aexit__(self, *exc_info):
+        self._running -= 1
+        self.resize()
+
+
+def _limiter():
+    loop = asyncio.get_running_loop()
+    limiter = _limits.get(loop)
+    if limiter is None:
+        limiter = _limits[loop] = _Limiter()
+    return limiter
+
+
+async def _run(cmds, data=b""):
+    """Runs the chain of processes ``cmds``, feeding ``data`` to the first.
+
+    The input is written while the output of the last process and the
+    logs of all processes are read, so large inputs and outputs cannot
+    fill up the pipes.
+
+    Returns
+    -------
+    bytes
+        The standard output of the last process.
+
+    Raises
+    ------
+    RuntimeError
+        If one of the processes failed.
+    """
+    async with _limiter():
+        procs = []
+        try:
+            stdin = asyncio.subprocess.PIPE
+            for i, cmd in enumerate(cmds):
+                if i + 1 < len(cmds):
+                    next_stdin, stdout = os.pipe()
+                else:
+                    next_stdin, stdout = None, asyncio.subprocess.PIPE
+                try:
+                    procs.append(
+                        await asyncio.create_subprocess_exec(
+                            *cmd,
+                            stdin=stdin,
+                            stdout=stdout,
+                            stderr=asyncio.subprocess.PIPE
+                        )
+                    )
+                except BaseException:
+                    # nothing will read from the next pipe
+                    if next_stdin is not None:
+                        os.close(next_stdin)
+                    raise
+                finally:
+                    # the ends of the pipes now belong to the processes
+                    if stdin != asyncio.subprocess.PIPE:
+                        os.close(stdin)
+                    if next_stdin is not None:
+                        os.close(stdout)
+                stdin = next_stdin
+
+            async def write():
+                try:
+                    procs[0].stdin.write(data)
+                    await procs[0].stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.debug("%s exited before reading all input", cmds[0][0])
+                finally:
+                    procs[0].stdin.close()
+
+            results = await asyncio.gather(
+                write(), procs[-1].stdout.read(), *[p.stderr.read() for p in procs]
+            )
+            failed = []
+            for cmd, proc, log in zip(cmds, procs, results[2:]):
+                await proc.wait()
+                logger.debug("%s", log.decode("utf-8", "replace"))
+                if proc.returncode != 0:
+                    failed.append((proc.returncode == -signal.SIGPIPE, cmd[0], proc))
+            if failed:
+                # processes killed by SIGPIPE only report a failure downstream
+                _, name, proc = min(failed, key=lambda f: f[0])
+                code = proc.returncode
+                raise RuntimeError("%s failed with exit code %d" % (name, code))
+            return results[1]
+        finally:
+            # on errors and cancellation
+            for proc in procs:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+
+
+def _write_text(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, "wt") as fp:
+        fp.write(text)
+    return path
+
+
+def _model_path(directory, name, model):
+    """The file of a parsed model, or of a text model written to
+    ``directory``"""
+    if isinstance(model, _Gmm):
+        return model.path()
+    return _write_text(directory, name, model)
+
+
+def _mat_ark(feats):
+    buf = BytesIO()
+    io.write_mat(buf, feats, key=b"abc")
+    return buf.getvalue()
+
+
+async def amfcc(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    normalization=True,
+    backend=None,
+):
+    """Computes the MFCCs of speech samples, as :py:func:`bob.kaldi.mfcc`.
+
+    With the Kaldi backend, ``compute-mfcc-feats | add-deltas`` run as
+    asyncio subprocesses. With the native backend, the features are
+    computed in the default executor of the event loop.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        A 1D numpy ndarray object containing 64-bit float numbers with
+        the audio signal, or an integer array of 16-bit PCM samples.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    normalization : :obj:`bool`, optional
+        If true, the input samples in ``data`` are normalized to [-1, 1].
+        The input array is left untouched.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The MFCCs calculated for the input signal (2D array of
+        32-bit floats).
+    """
+    peak = native._pcm_peak(data, normalization)
+
+    if native._resolve_backend(backend) == "native":
+        compute = functools.partial(
+            native.mfcc,
+            data,
+            rate,
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+            peak=peak,
+        )
+        return await asyncio.get_running_loop().run_in_executor(None, compute)
+
+    options = [
+        ("sample_frequency", rate),
+        ("preemphasis_coefficient", preemphasis_coefficient),
+        ("raw_energy", str(raw_energy).lower()),
+        ("frame_length", frame_length),
+        ("frame_shift", frame_shift),
+        ("num_ceps", num_ceps),
+        ("num_mel_bins", num_mel_bins),
+        ("cepstral_lifter", cepstral_lifter),
+        ("dither", dither),
+        ("snip_edges", str(snip_edges).lower()),
+    ]
+    buf = BytesIO()
+    buf.write(b"abc ")
+    io.write_wav(buf, data, rate, peak=peak)
+
+    out = await _run(_mfcc_commands(options, "ark:-"), buf.getvalue())
+    feats = [mat for name, mat in io.read_mat_ark(BytesIO(out))][0]
+    return native.apply_cmvn_sliding(feats)
+
+
+async def agmm_score(feats, spkubm, ubm):
+    """Scores features against a speaker model, as
+    :py:func:`bob.kaldi.gmm_score`.
+
+    Both models are evaluated concurrently.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 2D numpy ndarray object containing MFCCs.
+    spkubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi adapted global DiagGMM, or the parsed model.
+    ubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi global DiagGMM, or the parsed model.
+
+    Returns
+    -------
+    float
+        The difference of the average per-frame log-likelihoods.
+    """
+    data = _mat_ark(feats)
+    with tempfile.TemporaryDirectory() as tmp:
+        cmds = [
+            [
+                "gmm-global-get-frame-likes",
+                "--average=true",
+                _model_path(tmp, "%d.dubm" % i, model),
+                "ark:-",
+                "ark,t:-",
+            ]
+            for i, model in enumerate((spkubm, ubm))
+        ]
+        outs = await asyncio.gather(*[_run([cmd], data) for cmd in cmds])
+    spk_score, ubm_score = [float(out.split()[1]) for out in outs]
+    return spk_score - ubm_score
+
+
+async def aivector_extract(
+    feats, fubm, ivector_extractor, num_gselect=20, min_post=0.025, posterior_scale=1.0
+):
+    """Extracts an iVector, as :py:func:`bob.kaldi.ivector_extract`.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 2D numpy ndarray object containing MFCCs.
+    fubm : str or :py:class:`bob.kaldi.FullGmm`
+        A full-diagonal UBM, text formatted or parsed
+    ivector_extractor : str
+        An ivector extractor model
+
+    See :py:func:`bob.kaldi.ivector_extract` for the remaining parameters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The iVectors calculated for the input signal.
+    """
+    data = _mat_ark(feats)
+    with tempfile.TemporaryDirectory() as tmp:
+        fubmfile = _model_path(tmp, "final.fubm", fubm)
+        iefile = _write_text(tmp, "final.ie", ivector_extractor)
+        dubmfile = os.path.join(tmp, "final.dubm")
+        gselfile = os.path.join(tmp, "gselect")
+        postfile = os.path.join(tmp, "post")
+
+        await _run([["fgmm-global-to-gmm", fubmfile, dubmfile]])
+        await _run(
+            [
+                [
+                    "gmm-gselect",
+                    "--n=" + str(num_gselect),
+                    dubmfile,
+                    "ark:-",
+                    "ark:" + gselfile,
+                ]
+            ],
+            data,
+        )
+        await _run(
+            [
+                [
+                    "fgmm-global-gselect-to-post",
+                    "--min-post=" + str(min_post),
+                    fubmfile,
+                    "ark:-",
+                    "ark,s,cs:" + gselfile,
+                    "ark:-",
+                ],
+                ["scale-post", "ark:-", str(posterior_scale), "ark:" + postfile],
+            ],
+            data,
+        )
+        out = await _run(
+            [["ivector-extract", iefile, "ark:-", "ark,s,cs:" + postfile, "ark:-"]],
+            data,
+        )
+    return [vec for name, vec in io.read_vec_flt_ark(BytesIO(out))][0]
+
+
+async def aplda_score(feats, model, plda, globalmean, smoothing=0):
+    """Scores an iVector against a speaker model, as
+    :py:func:`bob.kaldi.plda_score`.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 1D numpy ndarray object containing an iVector.
+    model : str
+        A speaker model (average iVectors).
+    plda : str
+        A PLDA model.
+    globalmean : str
+        A global PLDA mean.
+    smoothing: float
+        Factor used in smoothing within-class covariance
+        (add this factor times between-class covar).
+
+    Returns
+    -------
+    float
+        A PLDA score.
+    """
+    buf = BytesIO()
+    io.write_vec_flt(buf, feats, key=b"spk1")
+    with tempfile.TemporaryDirectory() as tmp:
+        spkfile = _write_text(tmp, "spk", model)
+        pldafile = _write_text(tmp, "plda", plda)
+        meanfile = _write_text(tmp, "mean", globalmean)
+        trials = _write_text(tmp, "trials", "spk0 spk1\n")
+        smoothed = os.path.join(tmp, "plda.smooth")
+        score = os.path.join(tmp, "score")
+
+        await _run(
+            [["ivector-copy-plda", "--smoothing=" + str(smoothing), pldafile, smoothed]]
+        )
+        await _run(
+            [
+                ["ivector-subtract-global-mean", meanfile, "ark:-", "ark:-"],
+                ["ivector-normalize-length", "ark:-", "ark:-"],
+                [
+                    "ivector-plda-scoring",
+                    "--normalize-length=true",
+                    smoothed,
+                    "ark:" + spkfile,
+                    "ark:-",
+                    trials,
+                    score,
+                ],
+            ],
+            buf.getvalue(),
+        )
+        with open(score) as fp:
+            scoretxt = fp.readline().split()
+    return float(scoretxt[2]) if scoretxt else -1
+
+
+async def annet_forward(
+    feats,
+    nnet,
+    feats_transform="",
+    apply_log=False,
+    no_softmax=False,
+    prior_floor=1e-10,
+    prior_scale=1,
+    use_gpu=False,
+):
+    """Computes the forward pass of a network, as
+    :py:func:`bob.kaldi.nnet_forward`.
+
+    Parameters
+    ----------
+    feats: numpy.ndarray
+        The input cepstral features (2D array of 32-bit floats).
+    nnet: str
+        The neural network
+
+    See :py:func:`bob.kaldi.nnet_forward` for the remaining parameters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The posterior features.
+    """
+    cmd = [
+        "nnet-forward",
+        "--apply-log=" + str(apply_log).lower(),
+        "--no-softmax=" + str(no_softmax).lower(),
+        "--prior-floor=" + str(prior_floor),
+        "--prior-scale=" + str(prior_scale),
+        "--use-gpu=" + str(use_gpu).lower(),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        if feats_transform != "":
+            transform = _write_text(tmp, "transform.nnet", feats_transform)
+            cmd += ["--feature-transform=" + transform]
+        cmd += [_write_text(tmp, "final.nnet", nnet), "ark:-", "ark:-"]
+        out = await _run([cmd], _mat_ark(feats))
+    return [mat for name, mat in io.read_mat_ark(BytesIO(out))][0]
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import collections
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import struct
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from . import io
+from . import native
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureCache(object):
+    """A content-addressed on-disk cache of extracted features.
+
+    Each entry is stored as a Kaldi binary matrix (or vector) in a
+    directory sharded by the first two hex digits of its key. Entries are
+    read back as copy-on-write memory maps, so a hit costs no parsing and
+    no copy until the features are modified. The features of several
+    channels are stored as an archive with a matrix per channel, and read
+    back as a 3D array. When the directory grows
+    over ``max_bytes``, the least recently used entries are removed.
+
+    The cache can be shared between processes: entries are written to a
+    temporary file and renamed into place.
+
+    Parameters
+    ----------
+    directory : str
+        The directory holding the cache, created if it does not exist.
+    max_bytes : :obj:`int`, optional
+        The size limit of the cache.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups served from the cache.
+    misses : int
+        Number of lookups that had to compute the features.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def key(self, name, signal, **options):
+        """Computes the key of an extraction.
+
+        Parameters
+        ----------
+        name : str
+            The name of the extractor.
+        signal : numpy.ndarray or str
+            The input samples, hashed with their data type and shape, or the
+            path of an audio file, identified by its absolute path,
+            modification time and size.
+        **options
+            All parameters that change the result.
+
+        Returns
+        -------
+        str
+            The hexadecimal key.
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr((name, sorted(options.items()))).encode("utf-8"))
+        if isinstance(signal, str):
+            st = os.stat(signal)
+            path = os.path.abspath(signal)
+            h.update(repr((path, st.st_mtime_ns, st.st_size)).encode("utf-8"))
+        else:
+            signal = np.ascontiguousarray(signal)
+            h.update(repr((signal.dtype.str, signal.shape)).encode("utf-8"))
+            h.update(memoryview(signal).cast("B"))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".ark")
+
+    def get(self, key):
+        """Reads an entry.
+
+        Parameters
+        ----------
+        key : str
+            The key, as returned by :py:meth:`key`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The features, memory mapped, or ``None`` if they are not cached.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fd:
+                header = fd.read(15)
+            os.utime(path, None)  # most recently used
+        except (IOError, OSError):
+            return None
+        if not header.startswith(b"\0B"):  # an archive of channels
+            return np.stack([mat for _, mat in io.read_mat_ark(path)])
+        if header[2:5] in (b"FM ", b"DM "):
+            rows, cols = struct.unpack("<xixi", header[5:15])
+            shape, offset = (rows, cols), 15
+        else:
+            shape, offset = struct.unpack("<xi", header[5:10]), 10
+        dtype = "float32" if header[2:3] == b"F" else "float64"
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=shape)
+
+    def put(self, key, value):
+        """Stores an entry.
+
+        Parameters
+        ----------
+        key : str
+            The key, as returned by :py:meth:`key`.
+        value : numpy.ndarray
+            The features, a 1D or 2D array of 32 or 64-bit floats, or a 3D
+            array with the features of several channels.
+        """
+        path = self._path(key)
+        shard = os.path.dirname(path)
+        if not os.path.isdir(shard):
+            os.makedirs(shard, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=shard, delete=False) as fd:
+            if value.ndim == 1:
+                io.write_vec_flt(fd, value)
+            elif value.ndim == 2:
+                io.write_mat(fd, value)
+            else:
+                for i, mat in enumerate(value):
+                    io.write_mat(fd, mat, key=b"ch%d" % i)
+        try:
+            self._size -= os.path.getsize(path)  # replaced entry
+        except OSError:
+            pass
+        self._size += os.path.getsize(fd.name)
+        os.replace(fd.name, path)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # removed by another process
+                yield entry.path, st.st_mtime, st.st_size
+
+    def _evict(self):
+        # leave some room, so the next entries do not trigger a new scan
+        target = 0.9 * self.max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        self._size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            self._size -= size
+        logger.debug("Trimmed feature cache %s to %d bytes", self.directory, self._size)
+
+    def fetch(self, key, compute):
+        """Returns an entry, computing and storing it if needed.
+
+        Parameters
+        ----------
+        key : str
+            The key, as returned by :py:meth:`key`.
+        compute : callable
+            Computes the features when they are not cached.
+
+        Returns
+        -------
+        numpy.ndarray
+            The features.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.put(key, np.asarray(value))
+        return value
+
+    def clear(self):
+        """Removes all entries"""
+        for path, _, _ in list(self._entries()):
+            os.unlink(path)
+        self._size = 0
+
+
+def _digest_array(h, array):
+    array = np.ascontiguousarray(array)
+    h.update(repr((array.dtype.str, array.shape)).encode("utf-8"))
+    h.update(memoryview(array).cast("B"))
+
+
+def _nbytes(value):
+    """The size of a cached value, whose arrays are made read-only"""
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value.nbytes
+    return len(value)
+
+
+class UbmCache(object):
+    """An in-memory cache of the statistics of utterances under a UBM.
+
+    Scoring or enrolling the same utterance with the same UBM computes
+    the same UBM frame log-likelihoods, Gaussian selection and posteriors
+    every time. Pass a cache to :py:func:`bob.kaldi.gmm_score`,
+    :py:func:`bob.kaldi.gmm_score_fast`, :py:func:`bob.kaldi.ubm_enroll`
+    or :py:func:`bob.kaldi.ivector_extract` to compute them once per
+    utterance. Entries are keyed on a hash of the features and of the UBM,
+    as given: a text model and its parsed
+    :py:class:`bob.kaldi.DiagGmm` have different keys. A parsed model is
+    hashed on its first use only, so it should not be modified afterwards.
+    The backends do not share entries, as their results differ slightly.
+    When the cached arrays take more than ``max_bytes``, the least
+    recently used entries are dropped.
+
+    The cache can be shared between threads. The cached arrays are
+    read-only.
+
+    Parameters
+    ----------
+    max_bytes : :obj:`int`, optional
+        The size limit of the cached arrays.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups served from the cache.
+    misses : int
+        Number of lookups that had to compute the statistics.
+    nbytes : int
+        The size of the cached arrays.
+    """
+
+    def __init__(self, max_bytes=1 << 28):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = collections.OrderedDict()
+        self._digests = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def key(self, feats, ubm):
+        """Computes the key of an utterance under a UBM.
+
+        Parameters
+        ----------
+        feats : numpy.ndarray
+            The features of the utterance, hashed with their data type and
+            shape.
+        ubm : str or :py:class:`bob.kaldi.DiagGmm` or :py:class:`bob.kaldi.FullGmm`
+            The UBM, text formatted or parsed.
+
+        Returns
+        -------
+        tuple
+            The hexadecimal digests of the features and of the UBM.
+        """
+        h = hashlib.blake2b(digest_size=20)
+        _digest_array(h, feats)
+        if isinstance(ubm, str):
+            m = hashlib.blake2b(ubm.encode("utf-8"), digest_size=20)
+            return h.hexdigest(), m.hexdigest()
+        # a parsed model is not modified once used, see its path()
+        with self._lock:
+            digest = self._digests.get(ubm)
+        if digest is None:
+            m = hashlib.blake2b(digest_size=20)
+            for token, attribute, _ in ubm._LAYOUT:
+                m.update(token.encode("utf-8"))
+                _digest_array(m, getattr(ubm, attribute))
+            digest = m.hexdigest()
+            with self._lock:
+                self._digests[ubm] = digest
+        return h.hexdigest(), digest
+
+    def fetch(self, key, name, compute):
+        """Returns an entry, computing and storing it if needed.
+
+        Parameters
+        ----------
+        key : tuple
+            The key, as returned by :py:meth:`key`.
+        name : str
+            The name of the statistics, with the options that change them.
+        compute : callable
+            Computes the statistics when they are not cached: an array,
+            bytes or a tuple of arrays.
+
+        Returns
+        -------
+        object
+            The statistics.
+        """
+        entry = (key, name)
+        with self._lock:
+            value = self._entries.get(entry)
+            if value is not None:
+                self._entries.move_to_end(entry)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = compute()
+        size = _nbytes(value)
+        with self._lock:
+            if size > self.max_bytes or entry in self._entries:
+                return value
+            self._entries[entry] = value
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self.nbytes -= _nbytes(dropped)
+        return value
+
+    def clear(self):
+        """Removes all entries"""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def cached(func):
+    """Makes the ``cache`` argument of a feature extractor effective.
+
+    The first argument of ``func`` is the signal (samples or path) and its
+    other arguments are the options of the extraction, except ``cache``.
+    Whether a ``pool`` is used is part of the key, as the dither noise of
+    warm workers differs from a fresh run.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        cache = bound.arguments.get("cache")
+        if cache is None:
+            return func(*args, **kwargs)
+        bound.apply_defaults()
+        bound.arguments["cache"] = None
+        options = dict(bound.arguments)
+        signal = options.pop(next(iter(signature.parameters)))
+        del options["cache"]
+        if "pool" in options:
+            options["pool"] = options["pool"] is not None
+        if "backend" in options:
+            options["backend"] = native._resolve_backend(options["backend"])
+        key = cache.key(func.__name__, signal, **options)
+        return cache.fetch(key, lambda: func(*bound.args, **bound.kwargs))
+
+    return wrapper
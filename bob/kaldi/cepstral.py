@@ -4,18 +4,16 @@
 # August 28, 2017
 
 import logging
-import os
-import tempfile
-from subprocess import PIPE
-from subprocess import Popen
-
-import numpy as np
 
 from . import io
+from . import native
+from . import pipeline
+from .cache import cached
 
 logger = logging.getLogger(__name__)
 
 
+@cached
 def cepstral(
     data,
     cepstral_type,
@@ -33,21 +31,28 @@ def cepstral(
     dither=1.0,
     snip_edges=True,
     normalization=True,
+    cmvn_stats=None,
+    norm_means=True,
+    norm_vars=False,
+    backend=None,
+    cache=None,
 ):
-    """Computes the cepstral (mfcc/plp) features for given speech samples.
+    """Computes the cepstral (mfcc/plp/fbank) features for given speech samples.
 
     Parameters
     ----------
     data : numpy.ndarray
         A 1D numpy ndarray object containing 64-bit float numbers with
         the audio signal to calculate the cepstral features from. The
-        input needs to be normalized between [-1, 1].
+        input needs to be normalized between [-1, 1]. Integer arrays are
+        taken as 16-bit PCM samples and used without conversion.
 
     rate : float
         The sampling rate of the input signal in ``data``.
 
     cepstral_type: str
-        The type of cepstral features: mfcc or plp
+        The type of cepstral features: mfcc, plp or fbank (log mel
+        filterbank energies)
 
     preemphasis_coefficient : :obj:`float`, optional
         Coefficient for use in signal preemphasis
@@ -60,7 +65,8 @@ def cepstral(
     frame_shift : :obj:`int`, optional
         Frame shift in milliseconds
     num_ceps : :obj:`int`, optional
-        Number of cepstra in MFCC computation (including C0)
+        Number of cepstra in MFCC computation (including C0), not used for
+        fbank
     num_mel_bins : :obj:`int`, optional
         Number of triangular mel-frequency bins
     cepstral_lifter : :obj:`int`, optional
@@ -79,6 +85,23 @@ def cepstral(
         the ends.
     normalization : :obj:`bool`, optional
         If true, the input samples in ``data`` are normalized to [-1, 1].
+        The samples are scaled as they are written or framed, ``data`` is
+        left untouched.
+    cmvn_stats : :obj:`numpy.ndarray`, optional
+        CMVN statistics used instead of the statistics of the utterance,
+        e.g. the statistics of all utterances of a speaker computed with
+        :py:func:`bob.kaldi.compute_cmvn_stats`.
+    norm_means : :obj:`bool`, optional
+        If false, no CMVN is applied, e.g. to get the features to
+        accumulate the statistics of a speaker from.
+    norm_vars : :obj:`bool`, optional
+        If true, also normalize the variance.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run the Kaldi binaries, ``native`` to compute the
+        features in-process. If not set, the backend selected with
+        :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.FeatureCache`, optional
+        If given, the features are looked up in and stored to the cache.
 
     Returns
     -------
@@ -88,81 +111,69 @@ def cepstral(
 
     """
 
-    assert cepstral_type == "mfcc" or cepstral_type == "plp"
+    assert cepstral_type in ("mfcc", "plp", "fbank")
     binary1 = "compute-" + cepstral_type + "-feats"
     cmd1 = [binary1]
-    binary2 = "compute-cmvn-stats"
-    cmd2 = [binary2]
-    binary3 = "apply-cmvn"
-    cmd3 = [binary3]
-    binary4 = "add-deltas"
-    cmd4 = [binary4]
-
-    # compute features plus deltas and sliding cmvn into the ark file
+
+    # compute static features into the ark file, cmvn and deltas are
+    # applied in-process
     cmd1 += [
         "--sample-frequency=" + str(rate),
         "--preemphasis-coefficient=" + str(preemphasis_coefficient),
         "--raw-energy=" + str(raw_energy).lower(),
         "--frame-length=" + str(frame_length),
         "--frame-shift=" + str(frame_shift),
-        "--num-ceps=" + str(num_ceps),
         "--num-mel-bins=" + str(num_mel_bins),
-        "--cepstral-lifter=" + str(cepstral_lifter),
         "--dither=" + str(dither),
         "--snip-edges=" + str(snip_edges).lower(),
-        "ark:-",
-        "ark:-",
     ]
-    cmd4 += [
-        "--delta-order=" + str(delta_order),
+    if cepstral_type != "fbank":
+        cmd1 += [
+            "--num-ceps=" + str(num_ceps),
+            "--cepstral-lifter=" + str(cepstral_lifter),
+        ]
+    cmd1 += [
         "ark:-",
         "ark:-",
     ]
 
     # import ipdb; ipdb.set_trace()
-    if normalization:
-        data /= np.max(np.abs(data), axis=0)  # normalize to [-1,1]
+    peak = native._pcm_peak(data, normalization)  # normalize to [-1,1]
+
+    if native._resolve_backend(backend) == "native":
+        return native.cepstral(
+            data,
+            cepstral_type,
+            rate,
+            delta_order=delta_order,
+            cmvn_stats=cmvn_stats,
+            norm_means=norm_means,
+            norm_vars=norm_vars,
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+            peak=peak,
+        )
 
     # Compute static features
-    with open(os.devnull, "w") as fnull:
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=fnull)
-
+    def write(stdin):
         # write wav file name (as if it were a Kaldi ark file)
-        pipe1.stdin.write(b"abc ")
+        stdin.write(b"abc ")
         # write WAV file in 16-bit format
-        io.write_wav(pipe1.stdin, data, rate)
-        pipe1.stdin.close()
+        io.write_wav(stdin, data, rate, peak=peak)
 
-        feats = [mat for name, mat in io.read_mat_ark(pipe1.stdout)][0]
+    feats = pipeline.run([cmd1], write, pipeline.first(io.read_mat_ark))
 
     assert len(feats)
 
-    # Compute and apply CMVN with deltas
-    with tempfile.NamedTemporaryFile(suffix=".cmvn") as cmvnfile, open(
-        os.devnull, "w"
-    ) as fnull:
-
-        cmd2 += [
-            "ark:-",
-            cmvnfile.name,
-        ]
-
-        pipe2 = Popen(cmd2, stdin=PIPE, stdout=PIPE, stderr=fnull)
-        io.write_mat(pipe2.stdin, feats, key=b"abc")
-        # pipe2.stdin.close()
-        pipe2.communicate()
-
-        cmd3 += [
-            cmvnfile.name,
-            "ark:-",
-            "ark:-",
-        ]
-
-        pipe3 = Popen(cmd3, stdin=PIPE, stdout=PIPE, stderr=fnull)
-        pipe4 = Popen(cmd4, stdin=pipe3.stdout, stdout=PIPE, stderr=fnull)
-        io.write_mat(pipe3.stdin, feats, key=b"abc")
-        pipe3.stdin.close()
-
-        ret = [mat for name, mat in io.read_mat_ark(pipe4.stdout)][0]
-
-        return ret
+    # Apply CMVN with deltas
+    feats = native.apply_cmvn(feats, cmvn_stats, norm_means, norm_vars)
+    return native.add_deltas(feats, delta_order)
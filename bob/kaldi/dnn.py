@@ -6,8 +6,6 @@
 import logging
 import os
 import tempfile
-from subprocess import PIPE
-from subprocess import Popen
 
 import numpy as np
 import pkg_resources
@@ -15,6 +13,8 @@ import pkg_resources
 import bob.kaldi
 
 from . import io
+from . import pipeline
+from .worker import read_mat_record
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +28,7 @@ def nnet_forward(
     prior_floor=1e-10,
     prior_scale=1,
     use_gpu=False,
+    pool=None,
 ):
     """Computes the forward pass for given features.
 
@@ -50,6 +51,9 @@ def nnet_forward(
         Scaling factor to be applied on pdf-log-priors.
     use_gpu : :obj:`bool`, optional
         Compute forward pass on GPU.
+    pool : :py:class:`bob.kaldi.WorkerPool`, optional
+        If given, ``nnet-forward`` is run on a warm worker process of the
+        pool, which keeps the network loaded between calls.
 
     Returns
     -------
@@ -69,6 +73,22 @@ def nnet_forward(
         "--use-gpu=" + str(use_gpu).lower(),
     ]
 
+    if pool is not None:
+        models = {"nnet": nnet}
+        if feats_transform != "":
+            models["transform"] = feats_transform
+            cmd1 += ["--feature-transform={transform}"]
+        cmd1 += [
+            "{nnet}",
+            "ark:-",
+            "ark,f:-",
+        ]
+
+        def write(stdin):
+            io.write_mat(stdin, feats, key=b"abc")
+
+        return pool.submit([cmd1], write, read_mat_record, models)
+
     # save nnet model to a file
     with tempfile.NamedTemporaryFile(delete=False, suffix=".nnet") as dnn:
         with open(dnn.name, "wt") as fp:
@@ -89,17 +109,12 @@ def nnet_forward(
         "ark:-",
         "ark:-",
     ]
-    with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        io.write_mat(pipe1.stdin, feats, key=b"abc")
-        pipe1.stdin.close()
-        # pipe1.communicate()
-
-        posts = [mat for name, mat in io.read_mat_ark(pipe1.stdout)][0]
 
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+    posts = pipeline.run(
+        [cmd1],
+        lambda stdin: io.write_mat(stdin, feats, key=b"abc"),
+        pipeline.first(io.read_mat_ark),
+    )
 
     os.unlink(dnn.name)
     if feats_transform != "":
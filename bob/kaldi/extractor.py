@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import logging
+
+import numpy as np
+
+from . import native
+
+logger = logging.getLogger(__name__)
+
+_CMVN = ("sliding", "utterance", None)
+
+
+class FeatureExtractor(object):
+    """Extracts features with a fixed configuration, reusing its tables.
+
+    The window, mel filterbank, DCT matrix, lifter and PLP weights of the
+    configuration are built the first time a signal of a given sampling
+    rate is processed, and kept for all the following signals. Features
+    are computed in-process, as with the ``native`` backend.
+
+    The extractor can be pickled, e.g. to send it to the workers of a
+    :py:class:`multiprocessing.Pool`: only the configuration is
+    serialized, the tables are rebuilt on first use.
+
+    Parameters
+    ----------
+    feature_type : :obj:`str`, optional
+        The type of features: mfcc, plp or fbank (log mel filterbank
+        energies).
+    cmvn : :obj:`str`, optional
+        ``sliding`` to apply the sliding-window CMN after the deltas, as
+        :py:func:`bob.kaldi.mfcc`, ``utterance`` to apply the CMN of each
+        utterance before the deltas, as :py:func:`bob.kaldi.cepstral`, or
+        ``None`` for no CMN. By default, ``sliding`` for mfcc and
+        ``utterance`` otherwise.
+    delta_order : :obj:`int`, optional
+        Order of the deltas appended to the static features.
+    normalization : :obj:`bool`, optional
+        If true, the input samples are normalized to [-1, 1]. The input
+        arrays are left untouched.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters.
+
+    Attributes
+    ----------
+    config : dict
+        The options of the front-end.
+    """
+
+    def __init__(
+        self,
+        feature_type="mfcc",
+        cmvn="default",
+        delta_order=2,
+        normalization=True,
+        preemphasis_coefficient=0.97,
+        raw_energy=True,
+        frame_length=25,
+        frame_shift=10,
+        num_ceps=13,
+        num_mel_bins=23,
+        cepstral_lifter=22,
+        low_freq=20,
+        high_freq=0,
+        dither=1.0,
+        snip_edges=True,
+    ):
+        if feature_type not in ("mfcc", "plp", "fbank"):
+            raise ValueError("Unknown feature type `%s'" % feature_type)
+        if cmvn == "default":
+            cmvn = "sliding" if feature_type == "mfcc" else "utterance"
+        if cmvn not in _CMVN:
+            raise ValueError("Unknown CMVN `%s'" % cmvn)
+        self.feature_type = feature_type
+        self.cmvn = cmvn
+        self.delta_order = delta_order
+        self.normalization = normalization
+        self.config = dict(
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+        )
+        self._tables = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tables"] = {}
+        return state
+
+    def _tables_for(self, rate):
+        tables = self._tables.get(rate)
+        if tables is None:
+            c = self.config
+            length, _ = native._window_size(rate, c["frame_length"], c["frame_shift"])
+            logger.debug("Building front-end tables for rate %s", rate)
+            tables = native._front_end_tables(
+                rate,
+                length,
+                c["num_mel_bins"],
+                c["low_freq"],
+                c["high_freq"],
+                c["num_ceps"],
+                c["cepstral_lifter"],
+            )
+            self._tables[rate] = tables
+        return tables
+
+    def statics(self, data, rate=8000):
+        """Computes the static features of a signal, without CMN or deltas.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            A 1D numpy ndarray object containing 64-bit float numbers with
+            the audio signal, or an integer array of 16-bit PCM samples.
+        rate : float
+            The sampling rate of the input signal in ``data``.
+
+        Returns
+        -------
+        numpy.ndarray
+            The static features (2D array of 32-bit floats).
+        """
+        c = self.config
+        tables = self._tables_for(rate)
+        length, shift = native._window_size(rate, c["frame_length"], c["frame_shift"])
+        frames = native._frame_signal(np.asarray(data), length, shift, c["snip_edges"])
+        mel_energies, log_energy = native._mel_energies(
+            frames,
+            rate,
+            c["preemphasis_coefficient"],
+            c["raw_energy"],
+            c["num_mel_bins"],
+            c["low_freq"],
+            c["high_freq"],
+            c["dither"],
+            tables=tables,
+            peak=native._pcm_peak(data, self.normalization),
+        )
+        if self.feature_type == "plp":
+            return native._plp_from_mel_energies(
+                mel_energies,
+                log_energy,
+                rate,
+                c["num_ceps"],
+                c["num_mel_bins"],
+                c["cepstral_lifter"],
+                c["low_freq"],
+                c["high_freq"],
+                tables=tables,
+            )
+        log_mel = np.log(np.maximum(mel_energies, native._EPSILON))
+        if self.feature_type == "fbank":
+            return log_mel.astype("float32")
+        return native._mfcc_from_log_mel(
+            log_mel, log_energy, c["num_ceps"], c["cepstral_lifter"], tables
+        )
+
+    def __call__(self, data, rate=8000):
+        """Computes the features of a signal or of a batch of signals.
+
+        Parameters
+        ----------
+        data : numpy.ndarray or list
+            A 1D signal, as in :py:meth:`statics`, or a list of signals.
+        rate : float
+            The sampling rate of the input signals.
+
+        Returns
+        -------
+        numpy.ndarray or list
+            The features (2D array of 32-bit floats), or a list with the
+            features of every signal.
+        """
+        if isinstance(data, (list, tuple)):
+            return [self(signal, rate) for signal in data]
+        feats = self.statics(data, rate)
+        if self.cmvn == "utterance":
+            feats = native.apply_cmvn(feats)
+        feats = native.add_deltas(feats, self.delta_order)
+        if self.cmvn == "sliding":
+            feats = native.apply_cmvn_sliding(feats)
+        return feats
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import logging
+
+from . import io
+from . import native
+from . import pipeline
+from .cache import cached
+
+logger = logging.getLogger(__name__)
+
+
+def _compute_fbank_feats(data, rate, options, use_energy, peak):
+    """Runs ``compute-fbank-feats`` on ``data``, divided by ``peak``"""
+
+    cmd1 = ["compute-fbank-feats", "--sample-frequency=" + str(rate)]
+    cmd1 += [
+        "--%s=%s" % (k.replace("_", "-"), str(v).lower())
+        for k, v in sorted(options.items())
+    ]
+    cmd1 += [
+        "--use-energy=" + str(use_energy).lower(),
+        "ark:-",
+        "ark:-",
+    ]
+
+    def write(stdin):
+        # write wav file name (as if it were a Kaldi ark file)
+        stdin.write(b"abc ")
+        # write WAV file in 16-bit format
+        io.write_wav(stdin, data, rate, peak=peak)
+
+    return pipeline.run([cmd1], write, pipeline.first(io.read_mat_ark))
+
+
+@cached
+def fbank(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_mel_bins=23,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    use_energy=False,
+    normalization=True,
+    backend=None,
+    cache=None,
+):
+    """Computes the log mel filterbank energies for given speech samples.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        A 1D numpy ndarray object containing 64-bit float
+        numbers with the audio signal to calculate the filterbanks from. The
+        input needs to be normalized between [-1, 1]. Integer arrays are
+        taken as 16-bit PCM samples and used without conversion.
+
+    rate : float
+        The sampling rate of the input signal in ``data``.
+
+    preemphasis_coefficient : :obj:`float`, optional
+        Coefficient for use in signal preemphasis
+    raw_energy : :obj:`bool`, optional
+        If true, compute energy before preemphasis and windowing
+    frame_length : :obj:`int`, optional
+        Frame length in milliseconds
+    frame_shift : :obj:`int`, optional
+        Frame shift in milliseconds
+    num_mel_bins : :obj:`int`, optional
+        Number of triangular mel-frequency bins
+    low_freq : :obj:`int`, optional
+        Low cutoff frequency for mel bins
+    high_freq : :obj:`int`, optional
+        High cutoff frequency for mel bins (if < 0, offset from Nyquist)
+    dither : :obj:`float`, optional
+        Dithering constant (0.0 means no dither)
+    snip_edges : :obj:`bool`, optional
+        If true, end effects will be handled by outputting only frames
+        that completely fit in the file, and the number of frames
+        depends on the frame-length.  If false, the number of frames
+        depends only on the frame-shift, and we reflect the data at
+        the ends.
+    use_energy : :obj:`bool`, optional
+        If true, the log-energy is prepended to the filterbank energies.
+    normalization : :obj:`bool`, optional
+        If true, the input samples in ``data`` are normalized to [-1, 1].
+        The samples are scaled as they are written or framed, ``data`` is
+        left untouched.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run ``compute-fbank-feats``, ``native`` to compute the
+        features in-process. If not set, the backend selected with
+        :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.FeatureCache`, optional
+        If given, the features are looked up in and stored to the cache.
+
+    Returns
+    -------
+    numpy.ndarray
+        The log filterbank energies calculated for the input signal (2D
+        array of 32-bit floats).
+
+    """
+
+    peak = native._pcm_peak(data, normalization)  # normalize to [-1,1]
+
+    options = dict(
+        preemphasis_coefficient=preemphasis_coefficient,
+        raw_energy=raw_energy,
+        frame_length=frame_length,
+        frame_shift=frame_shift,
+        num_mel_bins=num_mel_bins,
+        low_freq=low_freq,
+        high_freq=high_freq,
+        dither=dither,
+        snip_edges=snip_edges,
+    )
+
+    if native._resolve_backend(backend) == "native":
+        return native.compute_fbank_feats(
+            data, rate, use_energy=use_energy, peak=peak, **options
+        )
+
+    return _compute_fbank_feats(data, rate, options, use_energy, peak)
+
+
+def fbank_mfcc(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    normalization=True,
+    backend=None,
+):
+    """Computes filterbanks, MFCCs and log-energy in a single front-end
+    pass.
+
+    The signal goes through framing, FFT and the mel filterbank once. The
+    MFCCs are the DCT of the same log filterbank energies, as Kaldi
+    computes them. With the Kaldi backend, a single ``compute-fbank-feats
+    --use-energy=true`` process is run and the DCT is done in-process.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The audio signal, as in :py:func:`bob.kaldi.fbank`.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        The log filterbank energies, as :py:func:`bob.kaldi.fbank`, the
+        static MFCCs, as ``compute-mfcc-feats`` (use
+        :py:func:`bob.kaldi.add_deltas` and
+        :py:func:`bob.kaldi.apply_cmvn_sliding` to get the features of
+        :py:func:`bob.kaldi.mfcc`), and the log-energy of every frame
+        (arrays of 32-bit floats).
+
+    """
+
+    peak = native._pcm_peak(data, normalization)  # normalize to [-1,1]
+
+    options = dict(
+        preemphasis_coefficient=preemphasis_coefficient,
+        raw_energy=raw_energy,
+        frame_length=frame_length,
+        frame_shift=frame_shift,
+        num_mel_bins=num_mel_bins,
+        low_freq=low_freq,
+        high_freq=high_freq,
+        dither=dither,
+        snip_edges=snip_edges,
+    )
+
+    if native._resolve_backend(backend) == "native":
+        return native.compute_front_end(
+            data,
+            rate,
+            num_ceps=num_ceps,
+            cepstral_lifter=cepstral_lifter,
+            peak=peak,
+            **options
+        )
+
+    feats = _compute_fbank_feats(data, rate, options, True, peak)
+    log_energy, log_mel = feats[:, 0], feats[:, 1:]
+    mfcc = native._mfcc_from_log_mel(
+        log_mel.astype("float64"), log_energy, num_ceps, cepstral_lifter
+    )
+    return log_mel, mfcc, log_energy
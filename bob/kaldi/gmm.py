@@ -8,10 +8,15 @@ import logging
 import os
 import shutil
 import tempfile
-from subprocess import PIPE
-from subprocess import Popen
+
+import numpy as np
 
 from . import io
+from . import native
+from . import pipeline
+from .models import DiagGmm
+from .models import model_file
+from .worker import read_text_record
 
 logger = logging.getLogger(__name__)
 
@@ -87,21 +92,13 @@ def ubm_train(
         "--num-gauss-init=" + str(num_gauss_init),
         "--num-iters=" + str(num_iters_init),
     ]
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".dubm"
-    ) as initfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".dubm") as initfile:
         cmd1 += [
             "ark:-",
             initfile.name,
         ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        # write ark file into pipe.stdin
-        io.write_mat(pipe1.stdin, feats, key=b"abc")
-        # pipe1.stdin.close()
-        pipe1.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        # write ark file into stdin
+        pipeline.run([cmd1], lambda stdin: io.write_mat(stdin, feats, key=b"abc"))
 
     # 2. Store Gaussian selection indices on disk-- this speeds up the
     # training passes.
@@ -115,13 +112,7 @@ def ubm_train(
             "ark:-",
             "ark:" + arkfile.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            io.write_mat(pipe.stdin, feats, key=b"abc")
-            pipe.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd], lambda stdin: io.write_mat(stdin, feats, key=b"abc"))
         cmd2 = [binary3]  # gmm-gselect
         cmd2 += [
             "--n=" + str(num_gselect),
@@ -129,15 +120,7 @@ def ubm_train(
             "ark:" + arkfile.name,
             "ark:|gzip -c >" + gselfile.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe2 = Popen(cmd2, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            # write ark file into pipe.stdin
-            # io.write_mat(pipe2.stdin, feats, key='abc')
-            # pipe2.stdin.close()
-            pipe2.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd2])
 
         inModel = initfile.name
         for x in range(0, num_iters):
@@ -151,15 +134,7 @@ def ubm_train(
                     "ark:" + arkfile.name,
                     accfile.name,
                 ]
-                with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                    pipe3 = Popen(cmd3, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                    # write ark file into pipe.stdin
-                    # io.write_mat(pipe3.stdin, feats, key='abc')
-                    # pipe3.stdin.close()
-                    pipe3.communicate()
-                    with open(logfile.name) as fp:
-                        logtxt = fp.read()
-                        logger.debug("%s", logtxt)
+                pipeline.run([cmd3])
                 # Don't remove low-count Gaussians till last iter.
                 if x < num_iters - 1:
                     opt = "--remove-low-count-gaussians=false"
@@ -176,32 +151,21 @@ def ubm_train(
                         accfile.name,
                         estfile.name,
                     ]
-                    with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                        pipe4 = Popen(cmd4, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                        pipe4.communicate()
-                        with open(logfile.name) as fp:
-                            logtxt = fp.read()
-                            logger.debug("%s", logtxt)
+                    pipeline.run([cmd4])
 
                     os.unlink(inModel)
                     inModel = estfile.name
 
     # 6. Copy a single diagonal GMM as text string (for the BEAT platform)
     ret = ""
-    with tempfile.NamedTemporaryFile(
-        suffix=".txt"
-    ) as txtfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(suffix=".txt") as txtfile:
         cmd = [binary6]  # gmm-global-copy
         cmd += [
             "--binary=false",
             estfile.name,
             txtfile.name,
         ]
-        pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd])
         shutil.copyfile(txtfile.name, ubmname)
         with open(txtfile.name, "rt") as f:
             ubmtxt = f.read()
@@ -222,8 +186,9 @@ def ubm_full_train(
     ----------
     feats : numpy.ndarray
             A 2D numpy ndarray object containing MFCCs.
-    dubm : str
-            A text formatted trained Kaldi global DiagGMM model.
+    dubm : str or :py:class:`bob.kaldi.DiagGmm`
+            A text formatted trained Kaldi global DiagGMM model, or the
+            parsed model.
     fubmfile : str
             A path to the full covariance UBM model.
     num_gselect : :obj:`int`, optional
@@ -249,27 +214,19 @@ def ubm_full_train(
     binary6 = "fgmm-global-est"
 
     # Convert UBM string to a file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".dump") as dubmfile:
-        with open(dubmfile.name, "wt") as fp:
-            fp.write(dubm)
+    dubmfile = model_file(dubm, ".dump")
 
     # 1. Init (diagonal GMM to full-cov. GMM)
     # gmm-global-to-fgmm $srcdir/final.dubm $dir/0.ubm || exit 1;
     cmd1 = [binary1]  # gmm-global-to-fgmm
     inModel = ""
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".ubm"
-    ) as initfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ubm") as initfile:
         inModel = initfile.name
         cmd1 += [
             dubmfile.name,
             inModel,
         ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe1.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd1])
 
     # 2. doing Gaussian selection (using diagonal form of model; \
     # selecting $num_gselect indices)
@@ -288,13 +245,7 @@ def ubm_full_train(
             "ark:-",
             "ark:" + arkfile.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            io.write_mat(pipe.stdin, feats, key=b"abc")
-            pipe.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd], lambda stdin: io.write_mat(stdin, feats, key=b"abc"))
         cmd3 = [binary4]  # gmm-gselect
         cmd3 += [
             "--n=" + str(num_gselect),
@@ -302,14 +253,7 @@ def ubm_full_train(
             "ark:" + arkfile.name,
             "ark:|gzip -c >" + gselfile.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe3 = Popen(cmd3, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            # io.write_mat(pipe3.stdin, feats, key='abc')
-            # pipe3.stdin.close()
-            pipe3.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd3])
         # 3 est num_iters times
         for x in range(0, num_iters):
             logger.info("Training pass " + str(x))
@@ -322,13 +266,7 @@ def ubm_full_train(
                     "ark:" + arkfile.name,
                     accfile.name,
                 ]
-                with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                    pipe4 = Popen(cmd4, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                    # io.write_mat(pipe4.stdin, feats, key='abc')
-                    pipe4.communicate()
-                    with open(logfile.name) as fp:
-                        logtxt = fp.read()
-                        logger.debug("%s", logtxt)
+                pipeline.run([cmd4])
                 # Don't remove low-count Gaussians till last iter.
                 if x < num_iters - 1:
                     opt = "--remove-low-count-gaussians=false"
@@ -346,33 +284,59 @@ def ubm_full_train(
                         accfile.name,
                         estfile.name,
                     ]
-                    with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                        pipe5 = Popen(cmd5, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                        pipe5.communicate()
-                        with open(logfile.name) as fp:
-                            logtxt = fp.read()
-                            logger.debug("%s", logtxt)
-                        os.unlink(inModel)
-                        inModel = estfile.name
+                    pipeline.run([cmd5])
+                    os.unlink(inModel)
+                    inModel = estfile.name
 
     shutil.copyfile(estfile.name, fubmfile)
     os.unlink(estfile.name)
-    os.unlink(dubmfile.name)
+    dubmfile.close()
 
     with open(fubmfile) as fp:
         fubmtxt = fp.read()
         return fubmtxt
 
 
-def ubm_enroll(feats, ubm):
+def _diag_gmm(model):
+    """Parses a text formatted diagonal GMM, if needed"""
+    if isinstance(model, DiagGmm):
+        return model
+    return DiagGmm.from_string(model)
+
+
+def _map_adapt_means(ubm, zeroth, first, mean_tau=10.0):
+    """Adapts the means of a UBM to the statistics of an utterance, as
+    ``global-gmm-adapt-map --update-flags=m``"""
+    inv_vars = ubm.inv_vars.astype("float64")
+    means = ubm.means_invvars / inv_vars
+    means = (first + mean_tau * means) / (zeroth + mean_tau)[:, None]
+    return DiagGmm(
+        ubm.weights,
+        (means * inv_vars).astype(ubm.means_invvars.dtype),
+        ubm.inv_vars,
+    )
+
+
+def ubm_enroll(feats, ubm, backend=None, cache=None):
     """Performes MAP adaptation of GMM-UBM model.
 
     Parameters
     ----------
     feats : numpy.ndarray
         A 2D numpy ndarray object containing MFCCs.
-    ubm : str
-        A text formatted Kaldi global DiagGMM.
+    ubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi global DiagGMM, or the parsed model.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run ``gmm-global-acc-stats`` and
+        ``global-gmm-adapt-map``, ``native`` to accumulate the statistics
+        with :py:func:`bob.kaldi.native.gmm_stats` and adapt the means
+        in-process. If not set, the backend selected with
+        :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.UbmCache`, optional
+        If given, the statistics of the utterance are looked up in and
+        stored to the cache. With the ``kaldi`` backend, these are the
+        output of ``gmm-global-acc-stats``, and only
+        ``global-gmm-adapt-map`` is run on a hit.
 
 
     Returns
@@ -386,9 +350,21 @@ def ubm_enroll(feats, ubm):
     binary2 = "global-gmm-adapt-map"
     binary3 = "gmm-global-copy"
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".dump") as ubmfile:
-        with open(ubmfile.name, "wt") as fp:
-            fp.write(ubm)
+    backend = native._resolve_backend(backend)
+    if cache is not None:
+        key = cache.key(feats, ubm)
+
+    if backend == "native":
+        ubm = _diag_gmm(ubm)
+        if cache is None:
+            stats = native.gmm_stats(feats, ubm)
+        else:
+            stats = cache.fetch(
+                key, "stats,native", lambda: native.gmm_stats(feats, ubm)
+            )
+        return _map_adapt_means(ubm, *stats).to_string()
+
+    ubmfile = model_file(ubm, ".dump")
 
     # 1. Accumulate stats for training a diagonal-covariance GMM.
     cmd1 = [binary1]  # gmm-global-acc-stats
@@ -398,9 +374,7 @@ def ubm_enroll(feats, ubm):
         "-",
     ]
     cmd2 = [binary2]  # global-gmm-adapt-map
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".ubm"
-    ) as estfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ubm") as estfile:
         cmd2 += [
             "--update-flags=m",
             ubmfile.name,
@@ -408,45 +382,100 @@ def ubm_enroll(feats, ubm):
             estfile.name,
         ]
 
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe2 = Popen(cmd2, stdin=pipe1.stdout, stdout=PIPE, stderr=logfile)
-        # write ark file into pipe1.stdin
-        io.write_mat(pipe1.stdin, feats, key=b"abc")
-        pipe1.stdin.close()
-        pipe2.communicate()
+    def write(stdin):
+        # write ark file into the stdin of the chain
+        io.write_mat(stdin, feats, key=b"abc")
 
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+    if cache is None:
+        pipeline.run([cmd1, cmd2], write)
+    else:
+        # the binary stats, between the two binaries
+        stats = cache.fetch(key, "stats,kaldi", lambda: pipeline.run([cmd1], write))
+        pipeline.run([cmd2], lambda stdin: stdin.write(stats))
 
     # 3. Copy adapted diagonal GMM as text string (for the BEAT platform)
     ret = ""
-    with tempfile.NamedTemporaryFile(
-        suffix=".txt"
-    ) as txtfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(suffix=".txt") as txtfile:
         cmd = [binary3]  # gmm-global-copy
         cmd += [
             "--binary=false",
             estfile.name,
             txtfile.name,
         ]
-        pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd])
         with open(txtfile.name, "rt") as f:
             ubmtxt = f.read()
 
             ret = ubmtxt
 
-    os.unlink(ubmfile.name)
+    ubmfile.close()
     os.unlink(estfile.name)
 
     return ret
 
 
-def gmm_score(feats, spkubm, ubm):
+def _frame_likes(feats, model, backend, gselfile=None):
+    """Computes the log-likelihood of every frame, on the Gaussians
+    selected in the ``gselfile`` archive if given"""
+
+    binary1 = "gmm-global-get-frame-likes"
+
+    if backend == "native":
+        return native.gmm_frame_likes(feats, _diag_gmm(model))
+
+    modelfile = model_file(model, ".dubm")
+    cmd1 = [binary1]
+    if gselfile is not None:
+        cmd1 += ["--gselect=ark:" + gselfile]
+    cmd1 += [
+        modelfile.name,
+        "ark:-",
+        "ark:-",
+    ]
+    ret = pipeline.run(
+        [cmd1],
+        lambda stdin: io.write_mat(stdin, feats, key=b"abc"),
+        pipeline.first(io.read_vec_flt_ark),
+    )
+    modelfile.close()
+    return ret
+
+
+def _average_like(feats, model, pool, backend, gselfile=None):
+    """Computes the average log-likelihood of the frames, on the Gaussians
+    selected in the ``gselfile`` archive if given"""
+
+    binary1 = "gmm-global-get-frame-likes"
+
+    if backend == "native":
+        return native.gmm_frame_likes(feats, _diag_gmm(model)).mean(dtype="float64")
+
+    cmd1 = [binary1]
+    if gselfile is not None:
+        cmd1 += ["--gselect=ark:" + gselfile]
+    cmd1 += ["--average=true"]
+
+    def write(stdin):
+        io.write_mat(stdin, feats, key=b"abc")
+
+    if pool is not None:
+        cmd = cmd1 + ["{model}", "ark:-", "ark,t,f:-"]
+        return float(pool.submit([cmd], write, read_text_record, {"model": model})[0])
+
+    modelfile = model_file(model, ".dubm")
+    cmd1 += [
+        modelfile.name,
+        "ark:-",
+        "ark,t:-",
+    ]
+
+    # write ark file into stdin, read the score line from stdout
+    rettxt = pipeline.run([cmd1], write, lambda stdout: stdout.readline())
+    modelfile.close()
+    return float(rettxt.split()[1])
+
+
+def gmm_score(feats, spkubm, ubm, pool=None, backend=None, cache=None):
     """Print out per-frame log-likelihoods for input utterance.
 
     Parameters
@@ -454,10 +483,24 @@ def gmm_score(feats, spkubm, ubm):
     feats : numpy.ndarray
         A 2D numpy ndarray object containing MFCCs.
 
-    spkubm : str
-        A text formatted Kaldi adapted global DiagGMM.
-    ubm : str
-        A text formatted Kaldi global DiagGMM.
+    spkubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi adapted global DiagGMM, or the parsed model.
+    ubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi global DiagGMM, or the parsed model.
+    pool : :py:class:`bob.kaldi.WorkerPool`, optional
+        If given, ``gmm-global-get-frame-likes`` is run on warm worker
+        processes of the pool, one per model.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run ``gmm-global-get-frame-likes``, ``native`` to
+        score the frames in-process with
+        :py:func:`bob.kaldi.native.gmm_frame_likes`. Text models are then
+        parsed on every call, so pass :py:class:`bob.kaldi.DiagGmm`
+        objects when scoring repeatedly. If not set, the backend selected
+        with :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.UbmCache`, optional
+        If given, the UBM frame log-likelihoods of the utterance are looked
+        up in and stored to the cache, and only the adapted model is
+        evaluated on a hit.
 
 
     Returns
@@ -467,136 +510,267 @@ def gmm_score(feats, spkubm, ubm):
 
     """
 
-    binary1 = "gmm-global-get-frame-likes"
+    backend = native._resolve_backend(backend)
 
-    # Convert UBM string to a file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".dubm") as ubmfile:
-        with open(ubmfile.name, "wt") as fp:
-            fp.write(ubm)
-
-    # Convert speaker UBM string to a file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".dubm") as spkubmfile:
-        with open(spkubmfile.name, "wt") as fp:
-            fp.write(spkubm)
-
-    models = [spkubmfile.name, ubmfile.name]
-    ret = [0, 0]
-    # import ipdb; ipdb.set_trace()
-    for i, m in enumerate(models):
-        # 1. Accumulate stats for training a diagonal-covariance GMM.
-        cmd1 = [binary1]
+    if cache is None:
+        ubm_like = _average_like(feats, ubm, pool, backend)
+    else:
+        key = cache.key(feats, ubm)
+        ubm_likes = cache.fetch(
+            key, "frame_likes,%s" % backend, lambda: _frame_likes(feats, ubm, backend)
+        )
+        ubm_like = ubm_likes.mean(dtype="float64")
+
+    return float(_average_like(feats, spkubm, pool, backend) - ubm_like)
+
+
+def gmm_score_fast(feats, spkubm, ubm, num_gselect=10, backend=None, cache=None):
+    """Scores an utterance with the adapted model evaluated only on the top
+    Gaussians of the UBM for every frame.
+
+    The Gaussians are selected once per utterance, with the UBM, and used
+    for both models. This is much cheaper than :py:func:`gmm_score` for
+    large UBMs and gives nearly the same score, since the other Gaussians
+    contribute little to the frame likelihoods.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 2D numpy ndarray object containing MFCCs.
+
+    spkubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi adapted global DiagGMM, or the parsed model.
+    ubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi global DiagGMM, or the parsed model.
+    num_gselect : :obj:`int`, optional
+        The number of Gaussians selected for every frame.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run ``gmm-gselect`` and
+        ``gmm-global-get-frame-likes``, ``native`` to score the frames
+        in-process with :py:func:`bob.kaldi.native.gmm_gselect` and
+        :py:func:`bob.kaldi.native.gmm_frame_likes`. If not set, the
+        backend selected with :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.UbmCache`, optional
+        If given, the selected Gaussians and the UBM frame
+        log-likelihoods of the utterance on them are looked up in and
+        stored to the cache.
+
+
+    Returns
+    -------
+    float
+        The average of per-frame log-likelihoods.
+
+    """
+
+    binary1 = "gmm-gselect"
+
+    backend = native._resolve_backend(backend)
+    if cache is not None:
+        key = cache.key(feats, ubm)
+
+    if backend == "native":
+        ubm = _diag_gmm(ubm)
+
+        def select():
+            gselect = native.gmm_gselect(feats, ubm, num_gselect)
+            return gselect, native.gmm_frame_likes(feats, ubm, gselect=gselect)
+
+        if cache is None:
+            gselect, ubm_likes = select()
+        else:
+            name = "gselect%d,%s" % (num_gselect, backend)
+            gselect, ubm_likes = cache.fetch(key, name, select)
+        spk_likes = native.gmm_frame_likes(feats, _diag_gmm(spkubm), gselect=gselect)
+        return float(
+            spk_likes.mean(dtype="float64") - ubm_likes.mean(dtype="float64")
+        )
+
+    def select():
+        """The top Gaussians of the UBM for every frame, as a Kaldi archive"""
+        ubmfile = model_file(ubm, ".dubm")
+        cmd1 = [binary1]  # gmm-gselect
         cmd1 += [
-            "--average=true",
-            m,
+            "--n=" + str(num_gselect),
+            ubmfile.name,
+            "ark:-",
             "ark:-",
-            "ark,t:-",
         ]
+        ret = pipeline.run([cmd1], lambda stdin: io.write_mat(stdin, feats, key=b"abc"))
+        ubmfile.close()
+        return ret
+
+    # 1. Select the top Gaussians of the UBM for every frame
+    if cache is None:
+        gselect = select()
+    else:
+        gselect = cache.fetch(key, "gselect%d,%s" % (num_gselect, backend), select)
+
+    with tempfile.NamedTemporaryFile(suffix=".gselect") as gselfile:
+        gselfile.write(gselect)
+        gselfile.flush()
+
+        # 2. Score both models on the selected Gaussians only
+        if cache is None:
+            ubm_like = _average_like(feats, ubm, None, backend, gselfile.name)
+        else:
+            ubm_likes = cache.fetch(
+                key,
+                "gselect_likes%d,%s" % (num_gselect, backend),
+                lambda: _frame_likes(feats, ubm, backend, gselfile.name),
+            )
+            ubm_like = ubm_likes.mean(dtype="float64")
+        spk_like = _average_like(feats, spkubm, None, backend, gselfile.name)
+
+    return float(spk_like - ubm_like)
+
+
+def _native_score_column(feats, models, ubm, num_gselect):
+    """Scores one utterance against all models in-process, computing the
+    UBM frame likelihoods and the Gaussian selection once"""
+
+    gselect = None
+    if num_gselect is not None:
+        gselect = native.gmm_gselect(feats, ubm, num_gselect)
+    ubm_like = native.gmm_frame_likes(feats, ubm, gselect=gselect)
+    ubm_like = ubm_like.mean(dtype="float64")
+    return [
+        native.gmm_frame_likes(feats, m, gselect=gselect).mean(dtype="float64")
+        - ubm_like
+        for m in models
+    ]
+
+
+def _kaldi_score_columns(utterances, models, ubm, num_gselect):
+    """Scores utterances against all models with one Kaldi run per model
+    over an archive of all the utterances"""
 
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            # write ark file into pipe1.stdin
-            io.write_mat(pipe1.stdin, feats, key=b"abc")
-            pipe1.stdin.close()
-            # pipe1.communicate()
-
-            # read ark from pipe1.stdout
-            rettxt = pipe1.stdout.readline()
-            ret[i] = float(rettxt.split()[1])
-            # ret = [mat for name,mat in io.read_mat_ark(pipe1.stdout)][0]
-
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
-
-    os.unlink(ubmfile.name)
-    os.unlink(spkubmfile.name)
-    return ret[0] - ret[1]
-
-
-# def gmm_score_fast(feats, gmm_file, ubm_file):
-#   """Print out per-frame log-likelihoods for each utterance, as an archive
-#   of vectors of floats.  If --average=true, prints out the average per-frame
-#   log-likelihood for each utterance, as a single float.
-
-#   Parameters:
-
-#     feats (numpy.ndarray): A 2D numpy ndarray object containing MFCCs.
-#     ubm_file (string)    : A Kaldi (spk.-dep.) global GMM.
-
-
-#   Returns:
-
-#     float: The score.
-
-
-#   Raises:
-
-#     RuntimeError: if any problem was detected during the conversion.
-
-#     IOError: if the binary to be executed does not exist
-
-#   """
-
-# # gmm-gselect --n=10  \
-# #     ubm.gmm \
-# #     "$feats" \
-# #     ark:gselect.ark
-
-# # gmm-compute-likes-gmmubm \
-# # --average=true --gselect="ark:gselect.ark"
-# # adapted.gmm \
-# # ubm.gmm \
-# # "$feats" ark,t:score.ark
-
-#   ret=0
-#   with tempfile.NamedTemporaryFile(suffix='.ark') as gselfile:
-#     # 1. Accumulate stats for training a diagonal-covariance GMM.
-#     binary1 = 'gmm-gselect'
-#     cmd1 = [binary1]
-#     cmd1 += [
-#       '--n=10',
-#       ubm_file,
-#       'ark:-',
-#       'ark:' + gselfile.name,
-#     ]
-#     with tempfile.NamedTemporaryFile(suffix='.log') as logfile:
-#       pipe1 = Popen (cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-#       # write ark file into pipe1.stdin
-#       io.write_mat(pipe1.stdin, feats, key='abc')
-#       pipe1.stdin.close()
-#       # pipe1.communicate()
-
-#       with open(logfile.name) as fp:
-#         logtxt = fp.read()
-#         logger.debug("%s", logtxt)
-
-#     binary2 = 'gmm-compute-likes-gmmubm'
-#     cmd2 = [binary2]
-#     cmd2 += [
-#       '--average=true',
-#       '--gselect=ark:' + gselfile.name,
-#       gmm_file,
-#       ubm_file,
-#       'ark:-',
-#       'ark,t:-',
-#     ]
-#     with tempfile.NamedTemporaryFile(suffix='.log') as logfile:
-#       pipe2 = Popen (cmd2, stdin=PIPE, stdout=PIPE, stderr=logfile)
-#       # write ark file into pipe1.stdin
-#       io.write_mat(pipe2.stdin, feats, key='abc')
-#       pipe2.stdin.close()
-#       # pipe2.communicate()
-
-#       with open(logfile.name) as fp:
-#         logtxt = fp.read()
-#         logger.debug("%s", logtxt)
-
-#       # read ark from pipe1.stdout
-#       # import ipdb; ipdb.set_trace()
-#       rettxt = pipe2.stdout.readline().split()
-#       if len(rettxt) > 1:
-#         ret = rettxt[1]
-#       else:
-#         logger.debug("ERROR in gmm_score_fast; outputting score 0")
-
-#   return float(ret)
+    binary1 = "gmm-gselect"
+    binary2 = "gmm-global-get-frame-likes"
+
+    keys = [b"utt%d" % i for i in range(len(utterances))]
+    modelfiles = [model_file(m, ".dubm") for m in list(models) + [ubm]]
+    ret = np.zeros((len(modelfiles), len(utterances)))
+    with tempfile.NamedTemporaryFile(
+        suffix=".ark"
+    ) as arkfile, tempfile.NamedTemporaryFile(suffix=".gselect") as gselfile:
+        for key, feats in zip(keys, utterances):
+            io.write_mat(arkfile, feats, key=key)
+        arkfile.flush()
+
+        opts = []
+        if num_gselect is not None:
+            # 1. Select the top Gaussians of the UBM once per utterance
+            cmd1 = [binary1]  # gmm-gselect
+            cmd1 += [
+                "--n=" + str(num_gselect),
+                modelfiles[-1].name,
+                "ark:" + arkfile.name,
+                "ark:" + gselfile.name,
+            ]
+            pipeline.run([cmd1])
+            opts = ["--gselect=ark:" + gselfile.name]
+
+        # 2. Average frame likelihoods of every utterance, one run per model
+        for i, m in enumerate(modelfiles):
+            cmd2 = [binary2]  # gmm-global-get-frame-likes
+            cmd2 += opts + [
+                "--average=true",
+                m.name,
+                "ark:" + arkfile.name,
+                "ark,t:-",
+            ]
+            likes = dict(line.split() for line in pipeline.run([cmd2]).splitlines())
+            ret[i] = [float(likes.get(key, np.nan)) for key in keys]
+
+    for m in modelfiles:
+        m.close()
+    return ret[:-1] - ret[-1]
+
+
+def _score_columns(utterances, models, ubm, num_gselect, backend):
+    if backend == "native":
+        ubm = _diag_gmm(ubm)
+        models = [_diag_gmm(m) for m in models]
+        return np.array(
+            [_native_score_column(f, models, ubm, num_gselect) for f in utterances]
+        ).T.reshape(len(models), len(utterances))
+    return _kaldi_score_columns(utterances, models, ubm, num_gselect)
+
+
+def gmm_score_matrix(
+    models,
+    utterances,
+    ubm,
+    num_gselect=None,
+    executor=None,
+    backend=None,
+    num_workers=None,
+):
+    """Scores every utterance against every model.
+
+    The UBM frame likelihoods, and the Gaussian selection if
+    ``num_gselect`` is given, are computed once per utterance and shared
+    by all models. With the ``kaldi`` backend, every model is evaluated
+    with a single run of ``gmm-global-get-frame-likes`` over all the
+    utterances.
+
+    Parameters
+    ----------
+    models : list
+        The text formatted Kaldi adapted global DiagGMMs, or the parsed
+        :py:class:`bob.kaldi.DiagGmm` models.
+    utterances : list
+        The 2D numpy ndarray objects containing the MFCCs of the
+        utterances.
+    ubm : str or :py:class:`bob.kaldi.DiagGmm`
+        A text formatted Kaldi global DiagGMM, or the parsed model.
+    num_gselect : :obj:`int`, optional
+        If given, the models are evaluated only on the ``num_gselect``
+        most likely UBM Gaussians of every frame, as with
+        :py:func:`bob.kaldi.gmm_score_fast`. By default, on all the
+        Gaussians, as with :py:func:`bob.kaldi.gmm_score`.
+    executor : :py:class:`concurrent.futures.Executor`, optional
+        If given, e.g. a :py:class:`concurrent.futures.ProcessPoolExecutor`,
+        the utterances are split into ``num_workers`` chunks, scored in
+        parallel. The models are sent to every task, so parse them into
+        :py:class:`bob.kaldi.DiagGmm` objects first.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run the Kaldi binaries, ``native`` to score the frames
+        in-process with :py:mod:`bob.kaldi.native`. If not set, the backend
+        selected with :py:func:`bob.kaldi.set_backend` is used.
+    num_workers : :obj:`int`, optional
+        The number of chunks the utterances are split into with an
+        ``executor``, usually its number of workers. By default, the
+        number of CPUs.
+
+
+    Returns
+    -------
+    numpy.ndarray
+        The scores, one row per model and one column per utterance (2D
+        array of 64-bit floats), as returned by :py:func:`gmm_score`.
+
+    """
+
+    models = list(models)
+    utterances = list(utterances)
+    # resolved here, the workers do not see the backend set in this process
+    backend = native._resolve_backend(backend)
+
+    if executor is None:
+        return _score_columns(utterances, models, ubm, num_gselect, backend)
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    size = max(1, -(-len(utterances) // num_workers))
+    futures = [
+        executor.submit(
+            _score_columns, utterances[i : i + size], models, ubm, num_gselect, backend
+        )
+        for i in range(0, len(utterances), size)
+    ]
+    ret = np.zeros((len(models), len(utterances)))
+    for i, future in zip(range(0, len(utterances), size), futures):
+        ret[:, i : i + size] = future.result()
+    return ret
@@ -6,10 +6,9 @@
 import logging
 import os
 import tempfile
-from subprocess import PIPE
-from subprocess import Popen
 
 from . import io
+from . import pipeline
 
 logger = logging.getLogger(__name__)
 
@@ -111,12 +110,7 @@ def train_mono(
             initf.name,
             treef.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe1.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd1])
 
         cmd2 += [
             treef.name,
@@ -125,24 +119,14 @@ def train_mono(
             "ark,t:" + traf.name,
             "ark,t:" + fstf.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe2 = Popen(cmd2, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe2.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd2])
 
         cmd3 += [
             "ark,t:" + fstf.name,
             "ark:" + arkf.name,
             "ark,t:" + alif.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe3 = Popen(cmd3, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe3.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd3])
 
         cmd4 += [
             initf.name,
@@ -150,12 +134,7 @@ def train_mono(
             "ark,t:" + alif.name,
             accf.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe4 = Popen(cmd4, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe4.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd4])
 
         cmd5 += [
             "--min-gaussian-occupancy=3",
@@ -166,12 +145,7 @@ def train_mono(
             accf.name,
             estf.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe5 = Popen(cmd5, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe5.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd5])
 
         inModel = estf.name
         for x in range(0, num_iters):
@@ -190,12 +164,7 @@ def train_mono(
                 "ark:" + arkf.name,
                 "ark:" + alif.name,
             ]
-            with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                pipe6 = Popen(cmd6, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                pipe6.communicate()
-                with open(logfile.name) as fp:
-                    logtxt = fp.read()
-                    logger.debug("%s", logtxt)
+            pipeline.run([cmd6])
 
             cmd7 = [
                 binary4,
@@ -204,12 +173,7 @@ def train_mono(
                 "ark:" + alif.name,
                 accf.name,
             ]
-            with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                pipe7 = Popen(cmd7, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                pipe7.communicate()
-                with open(logfile.name) as fp:
-                    logtxt = fp.read()
-                    logger.debug("%s", logtxt)
+            pipeline.run([cmd7])
 
             with tempfile.NamedTemporaryFile(delete=False, suffix=".est") as itf:
                 cmd8 = [
@@ -221,12 +185,7 @@ def train_mono(
                     accf.name,
                     itf.name,
                 ]
-                with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                    pipe8 = Popen(cmd8, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                    pipe8.communicate()
-                    with open(logfile.name) as fp:
-                        logtxt = fp.read()
-                        logger.debug("%s", logtxt)
+                pipeline.run([cmd8])
 
                 if x > 0:  # do not remove estf.name; just itf.name
                     os.unlink(inModel)
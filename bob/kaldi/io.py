@@ -796,7 +796,86 @@ def read_cntime(file_or_fd):
     return ans
 
 
-def write_wav(fp, data, rate, bitdepth=16):
+#################################################
+# Segments and recordings of a data directory,
+
+
+def read_wav_scp(file_or_fd):
+    """generator(key,path) = read_wav_scp(file_or_fd)
+    Returns generator of (recording-id, path) tuples, read from a Kaldi
+    ``wav.scp``. Only plain paths are supported, not pipe commands.
+
+    Parameters
+    ----------
+    file_or_fd : obj
+        A ``wav.scp`` file name, gzipped file, pipe or opened file
+        descriptor.
+    """
+    fd = open_or_fd(file_or_fd)
+    try:
+        for line in fd:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.strip()
+            if not line:
+                continue
+            key, path = line.split(None, 1)
+            if path.endswith("|"):
+                raise ValueError("Pipe commands are not supported: %s" % line)
+            yield key, path
+    finally:
+        if fd is not file_or_fd:
+            fd.close()
+
+
+def read_segments(file_or_fd):
+    """generator(utt,reco,start,end,channel) = read_segments(file_or_fd)
+    Returns generator of tuples read from a Kaldi ``segments`` file, with
+    lines ``<utt-id> <recording-id> <start> <end> [<channel>]``. Times are
+    in seconds, an end of -1 (or 0) means the end of the recording, and
+    the channel is ``None`` when not given.
+
+    Parameters
+    ----------
+    file_or_fd : obj
+        A ``segments`` file name, gzipped file, pipe or opened file
+        descriptor.
+    """
+    fd = open_or_fd(file_or_fd)
+    try:
+        for line in fd:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            fields = line.split()
+            if not fields:
+                continue
+            if len(fields) not in (4, 5):
+                raise ValueError("Bad line in segments file: %s" % line)
+            channel = int(fields[4]) if len(fields) == 5 else None
+            yield fields[0], fields[1], float(fields[2]), float(fields[3]), channel
+    finally:
+        if fd is not file_or_fd:
+            fd.close()
+
+
+def _integer_peak(dtype):
+    """The ``peak`` scaling signed integer samples of ``dtype`` to [-1, 1],
+    or ``None`` for 16-bit samples, which are PCM samples as they are.
+
+    Raises
+    ------
+    ValueError
+        If ``dtype`` is an unsigned integer type.
+    """
+    info = np.iinfo(dtype)
+    if info.min == 0:
+        raise ValueError("Unsigned integer samples are not supported: %s" % dtype)
+    if info.bits == 16:
+        return None
+    return float(info.max + 1)
+
+
+def write_wav(fp, data, rate, bitdepth=16, block_size=1 << 16, peak=None):
     """ Write a wav file.
 
     Parameters
@@ -804,11 +883,24 @@ def write_wav(fp, data, rate, bitdepth=16):
     fp : obj
         A file pointer.
     data: numpy.ndarray
-        Data samples
+        Data samples, either floats normalized between [-1, 1] or signed
+        integer PCM samples. 16-bit samples are written as they are, other
+        widths are rescaled to 16 bits.
     rate: int
         Sample rate.
     bitdepth: int, optional
         A bit depth of samples.
+    block_size: int, optional
+        Number of float samples converted at a time.
+    peak: float, optional
+        If given, the samples, floats or integers, are divided by ``peak``
+        a block at a time, e.g. to normalize them to [-1, 1] without
+        modifying or copying ``data``.
+
+    Raises
+    ------
+    ValueError
+        If ``data`` holds unsigned integers.
     """
     num_chan = 1
     num_samp = data.size
@@ -819,10 +911,13 @@ def write_wav(fp, data, rate, bitdepth=16):
 
     if bitdepth == 8:
         bytes_per_samp = 1
+        dtype = "int8"
     elif bitdepth == 16:
         bytes_per_samp = 2
+        dtype = "<i2"
     elif bitdepth == 32:
         bytes_per_samp = 4
+        dtype = "uint32"
 
     subchunk2size = num_chan * num_samp * bytes_per_samp
     chunk_size = 36 + subchunk2size
@@ -846,15 +941,128 @@ def write_wav(fp, data, rate, bitdepth=16):
     fp.write(b"data")
     fp.write(np.array(subchunk2size, dtype="int32"))
 
-    # import pdb; pdb.set_trace()
-    if bitdepth == 8:
-        scale = 1 << 7
-        fp.write(np.asarray(scale * data, dtype="int8"))
-    elif bitdepth == 16:
-        scale = 1 << 15
-        fp.write(np.asarray(scale * data, dtype="int16"))
-    elif bitdepth == 32:
-        scale = 1 << 31
-        fp.write(np.asarray(scale * data, dtype="uint32"))
+    data = np.asarray(data).reshape(-1)
+    if peak is None and np.issubdtype(data.dtype, np.integer):
+        peak = _integer_peak(data.dtype)
+        if peak is None and bitdepth == 16:
+            # PCM samples, written from the array buffer
+            fp.write(np.ascontiguousarray(data, dtype=dtype))
+            return
+        if peak is None:
+            peak = float(1 << 15)
+
+    # convert the samples block by block, to avoid copies of the signal
+    scale = 1 << (bitdepth - 1)
+    for start in range(0, num_samp, block_size):
+        block = data[start : start + block_size]
+        if peak is not None:
+            block = block / peak
+        fp.write(np.asarray(scale * block, dtype=dtype))
 
     return
+
+
+def _wav_header(fd, filename):
+    """Parses the chunks of a RIFF/WAVE file up to its data"""
+    riff = fd.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:] != b"WAVE":
+        raise ValueError("Not a WAV file: %s" % filename)
+    fmt = None
+    while True:
+        chunk = fd.read(8)
+        if len(chunk) < 8:
+            raise ValueError("No data chunk in WAV file: %s" % filename)
+        chunk_id, size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"data":
+            break
+        if chunk_id == b"fmt ":
+            fmt = fd.read(size)
+            size = 0
+        # chunks are padded to an even size
+        fd.seek(size + (size & 1), os.SEEK_CUR)
+    if fmt is None:
+        raise ValueError("No format chunk in WAV file: %s" % filename)
+    tag, num_chan, rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if tag == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE
+        tag = struct.unpack("<H", fmt[24:26])[0]
+    if tag != 1:
+        raise ValueError("Only PCM WAV files are supported: %s" % filename)
+    # streamed files may not have the size of their data
+    return num_chan, rate, "<i%d" % (bits // 8), fd.tell(), size
+
+
+def _sphere_header(fd, filename):
+    """Parses the header of a NIST Sphere file"""
+    magic = fd.read(16)
+    if magic[:8] != b"NIST_1A\n":
+        raise ValueError("Not a NIST Sphere file: %s" % filename)
+    offset = int(magic[8:].strip())
+    fields = {}
+    for line in fd.read(offset - 16).split(b"\n"):
+        line = line.split()
+        if line and line[0] == b"end_head":
+            break
+        if len(line) >= 3:
+            fields[line[0].decode("ascii")] = line[2].decode("ascii")
+    coding = fields.get("sample_coding", "pcm")
+    if coding != "pcm":
+        raise ValueError(
+            "Only uncompressed PCM Sphere files are supported: %s (%s)"
+            % (filename, coding)
+        )
+    order = ">" if fields.get("sample_byte_format", "01") == "10" else "<"
+    dtype = "%si%s" % (order, fields.get("sample_n_bytes", "2"))
+    num_chan = int(fields.get("channel_count", 1))
+    size = int(fields.get("sample_count", -1)) * num_chan * int(dtype[2:])
+    return num_chan, int(fields["sample_rate"]), dtype, offset, size
+
+
+def read_audio(filename):
+    """ Memory maps the samples of a PCM WAV or NIST Sphere file.
+
+    The samples are not read nor copied: they are a read-only view on the
+    file, with one row per channel. Slicing a channel or a block of
+    samples also gives views, so long files can be processed a block at a
+    time.
+
+    Parameters
+    ----------
+    filename : str
+        The path of a PCM WAV or uncompressed NIST Sphere file.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        The samples as 16-bit integers, a 2D array with shape
+        ``(channels, samples)``.
+    rate : int
+        Sample rate.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a 16-bit PCM WAV or NIST Sphere file. Other
+        sample widths would have to be converted, which a memory map
+        cannot do.
+    """
+    with open(filename, "rb") as fd:
+        if fd.read(4) == b"RIFF":
+            header = _wav_header
+        else:
+            header = _sphere_header
+        fd.seek(0)
+        num_chan, rate, dtype, offset, size = header(fd, filename)
+    if dtype[2:] != "2":
+        raise ValueError("Only 16-bit samples are supported: %s" % filename)
+    available = os.path.getsize(filename) - offset
+    if size < 0 or size > available:
+        size = available
+    frame_size = num_chan * int(dtype[2:])
+    num_samp = size // frame_size
+    if num_samp == 0:
+        return np.zeros((num_chan, 0), dtype=dtype), rate
+    data = np.memmap(
+        filename, dtype=dtype, mode="r", offset=offset, shape=(num_samp, num_chan)
+    )
+    # samples are interleaved, channels are strided views on the file
+    return data.T, rate
@@ -8,10 +8,10 @@ import logging
 import os
 import shutil
 import tempfile
-from subprocess import PIPE
-from subprocess import Popen
 
 from . import io
+from . import pipeline
+from .models import model_file
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +34,8 @@ def ivector_train(
     ----------
     feats : numpy.ndarray
         A 2D numpy ndarray object containing MFCCs.
-    fubm : str
-        A full-diagonal UBM
+    fubm : str or :py:class:`bob.kaldi.FullGmm`
+        A full-diagonal UBM, text formatted or parsed
     ivector_extractor : str
         A path for the ivector extractor
 
@@ -72,9 +72,7 @@ def ivector_train(
     binary7 = "ivector-extractor-est"
 
     # Convert full diagonal UBM string to a file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".fump") as fubmfile:
-        with open(fubmfile.name, "wt") as fp:
-            fp.write(fubm)
+    fubmfile = model_file(fubm, ".fump")
 
     # 1. Create Kaldi training data structure
     # ToDo: implement Bob's function for that
@@ -86,34 +84,22 @@ def ivector_train(
 
     # Initialize the i-vector extractor using the FGMM input
     cmd1 = [binary1]  # fgmm-global-to-gmm
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".dubm"
-    ) as dubmfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".dubm") as dubmfile:
         cmd1 += [
             fubmfile.name,
             dubmfile.name,
         ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe1.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd1])
 
     cmd2 = [binary2]  # ivector-extractor-init
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".ie"
-    ) as iefile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ie") as iefile:
         cmd2 += [
             "--ivector-dim=" + str(ivector_dim),
             "--use-weights=" + str(use_weights).lower(),
             fubmfile.name,
             iefile.name,
         ]
-        pipe2 = Popen(cmd2, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe2.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd2])
 
         inModel = iefile.name  # for later re-estimation
 
@@ -132,13 +118,7 @@ def ivector_train(
             "ark:" + arkfile.name,
             "ark:" + gselfile.name,
         ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe3 = Popen(cmd3, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            # io.write_mat(pipe3.stdin, feats, key='abc')
-            pipe3.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd3])
 
         cmd4 = [binary4]  # fgmm-global-gselect-to-post
         cmd4 += [
@@ -156,15 +136,7 @@ def ivector_train(
             "ark:|gzip -c >" + postfile.name,
         ]
 
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe4 = Popen(cmd4, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe5 = Popen(cmd5, stdin=pipe4.stdout, stdout=PIPE, stderr=logfile)
-            # io.write_mat(pipe4.stdin, feats, key='abc')
-            # pipe4.stdin.close()
-            pipe5.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+        pipeline.run([cmd4, cmd5])
 
         # Estimate num_iters times
         for x in range(0, num_iters):
@@ -182,18 +154,10 @@ def ivector_train(
                 ]
                 # ark,s,cs
 
-                with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-                    pipe6 = Popen(cmd6, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                    # io.write_mat(pipe6.stdin, feats, key='abc')
-                    pipe6.communicate()
-                    with open(logfile.name) as fp:
-                        logtxt = fp.read()
-                        logger.debug("%s", logtxt)
+                pipeline.run([cmd6])
 
                 cmd7 = [binary7]  # ivector-extractor-est
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".ie"
-                ) as estfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".ie") as estfile:
                     cmd7 += [
                         "--num-threads=4",
                         "--binary=false",
@@ -201,18 +165,14 @@ def ivector_train(
                         accfile.name,
                         estfile.name,
                     ]
-                    pipe7 = Popen(cmd7, stdin=PIPE, stdout=PIPE, stderr=logfile)
-                    pipe7.communicate()
-                    with open(logfile.name) as fp:
-                        logtxt = fp.read()
-                        logger.debug("%s", logtxt)
+                    pipeline.run([cmd7])
 
                     os.unlink(inModel)
                     inModel = estfile.name
 
     shutil.copyfile(inModel, ivector_extractor)
     os.unlink(inModel)
-    os.unlink(fubmfile.name)
+    fubmfile.close()
 
     with open(ivector_extractor) as fp:
         ietxt = fp.read()
@@ -220,7 +180,13 @@ def ivector_train(
 
 
 def ivector_extract(
-    feats, fubm, ivector_extractor, num_gselect=20, min_post=0.025, posterior_scale=1.0
+    feats,
+    fubm,
+    ivector_extractor,
+    num_gselect=20,
+    min_post=0.025,
+    posterior_scale=1.0,
+    cache=None,
 ):
     """Implements Kaldi egs/sre10/v1/extract_ivectors.sh
 
@@ -228,8 +194,8 @@ def ivector_extract(
     ----------
     feats : numpy.ndarray
         A 2D numpy ndarray object containing MFCCs.
-    fubm : str
-        A full-diagonal UBM
+    fubm : str or :py:class:`bob.kaldi.FullGmm`
+        A full-diagonal UBM, text formatted or parsed
     ivector_extractor : str
         An ivector extractor model
     num_gselect : :obj:`int`, optional
@@ -239,6 +205,11 @@ def ivector_extract(
         away and the rest will be renormalized to sum to one.
     posterior_scale : :obj:`float`, optional
         A posterior scaling with a global scale.
+    cache : :py:class:`bob.kaldi.UbmCache`, optional
+        If given, the UBM posteriors of the frames, from which the
+        zeroth and first-order statistics are accumulated, are looked up
+        in and stored to the cache, and only ``ivector-extract`` is run on
+        a hit.
 
     Returns
     -------
@@ -257,73 +228,69 @@ def ivector_extract(
     # ivector-extract --verbose=2 $srcdir/final.ie "$feats" ark,s,cs:- \
     # ark,scp,t:$dir/ivector.JOB.ark,$dir/ivector.JOB.scp || exit 1;
 
-    # Convert full diagonal UBM string to a file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".fump") as fubmfile:
-        with open(fubmfile.name, "wt") as fp:
-            fp.write(fubm)
+    def posteriors():
+        """The posteriors of the Gaussians of the UBM, as a Kaldi archive"""
+
+        # Convert full diagonal UBM string to a file
+        fubmfile = model_file(fubm, ".fump")
+
+        # Initialize the i-vector extractor using the FGMM input
+        cmd1 = [binary1]  # fgmm-global-to-gmm
+        with tempfile.NamedTemporaryFile(suffix=".dubm") as dubmfile:
+            cmd1 += [
+                fubmfile.name,
+                dubmfile.name,
+            ]
+            pipeline.run([cmd1])
+
+            cmd = [binary2]  # gmm-gselect
+            with tempfile.NamedTemporaryFile(suffix=".gsel") as gselfile:
+                cmd += [
+                    "--n=" + str(num_gselect),
+                    dubmfile.name,
+                    "ark:-",
+                    "ark:" + gselfile.name,
+                ]
+                pipeline.run(
+                    [cmd], lambda stdin: io.write_mat(stdin, feats, key=b"abc")
+                )
+
+                cmd2 = [binary3]  # fgmm-global-gselect-to-post
+                cmd2 += [
+                    "--min-post=" + str(min_post),
+                    fubmfile.name,
+                    "ark:-",
+                    "ark,s,cs:" + gselfile.name,
+                    "ark:-",
+                ]
+                cmd3 = [binary4]  # scale-post
+                cmd3 += [
+                    "ark:-",
+                    str(posterior_scale),
+                    "ark:-",
+                ]
+
+                ret = pipeline.run(
+                    [cmd2, cmd3], lambda stdin: io.write_mat(stdin, feats, key=b"abc")
+                )
+
+        fubmfile.close()
+        return ret
+
+    if cache is None:
+        posts = posteriors()
+    else:
+        name = "post%d,%r,%r" % (num_gselect, min_post, posterior_scale)
+        posts = cache.fetch(cache.key(feats, fubm), name, posteriors)
 
     # Convert IvectorExtractor string to a file
     with tempfile.NamedTemporaryFile(delete=False, suffix=".ie") as iefile:
         with open(iefile.name, "wt") as fp:
             fp.write(ivector_extractor)
 
-    # Initialize the i-vector extractor using the FGMM input
-    cmd1 = [binary1]  # fgmm-global-to-gmm
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".dubm"
-    ) as dubmfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-        cmd1 += [
-            fubmfile.name,
-            dubmfile.name,
-        ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe1.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
-
-    cmd = [binary2]  # gmm-gselect
-    with tempfile.NamedTemporaryFile(
-        suffix=".gsel"
-    ) as gselfile, tempfile.NamedTemporaryFile(suffix=".post") as postfile:
-        cmd += [
-            "--n=" + str(num_gselect),
-            dubmfile.name,
-            "ark:-",
-            "ark:" + gselfile.name,
-        ]
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            io.write_mat(pipe.stdin, feats, key=b"abc")
-            pipe.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
-
-        cmd2 = [binary3]  # fgmm-global-gselect-to-post
-        cmd2 += [
-            "--min-post=" + str(min_post),
-            fubmfile.name,
-            "ark:-",
-            "ark,s,cs:" + gselfile.name,
-            "ark:-",
-        ]
-        cmd3 = [binary4]  # scale-post
-        cmd3 += [
-            "ark:-",
-            str(posterior_scale),
-            "ark:" + postfile.name,
-        ]
-
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe2 = Popen(cmd2, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            pipe3 = Popen(cmd3, stdin=pipe2.stdout, stdout=PIPE, stderr=logfile)
-            io.write_mat(pipe2.stdin, feats, key=b"abc")
-            pipe2.stdin.close()
-            pipe3.communicate()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
+    with tempfile.NamedTemporaryFile(suffix=".post") as postfile:
+        postfile.write(posts)
+        postfile.flush()
 
         cmd4 = [binary5]  # ivector-extract
         cmd4 += [
@@ -333,21 +300,16 @@ def ivector_extract(
             "ark:-",
         ]
 
-        with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-            pipe4 = Popen(cmd4, stdin=PIPE, stdout=PIPE, stderr=logfile)
-            io.write_mat(pipe4.stdin, feats, key=b"abc")
-            pipe4.stdin.close()
-            with open(logfile.name) as fp:
-                logtxt = fp.read()
-                logger.debug("%s", logtxt)
-
-            # read ark from pipe1.stdout
-            ret = [mat for name, mat in io.read_vec_flt_ark(pipe4.stdout)][0]
+        # read ark from stdout
+        ret = pipeline.run(
+            [cmd4],
+            lambda stdin: io.write_mat(stdin, feats, key=b"abc"),
+            pipeline.first(io.read_vec_flt_ark),
+        )
 
-            os.unlink(fubmfile.name)
-            os.unlink(iefile.name)
+        os.unlink(iefile.name)
 
-            return ret
+        return ret
 
 
 def plda_train(feats, plda_file, mean_file):
@@ -412,21 +374,14 @@ def plda_train(feats, plda_file, mean_file):
     ]
     cmd2 = [binary2]  # ivector-compute-plda
 
-    with tempfile.NamedTemporaryFile(
-        suffix=".plda"
-    ) as pldafile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(suffix=".plda") as pldafile:
         cmd2 += [
             "--binary=false",
             "ark,t:" + spkfile.name,
             "ark:-",
             pldafile.name,
         ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe2 = Popen(cmd2, stdin=pipe1.stdout, stdout=PIPE, stderr=logfile)
-        pipe2.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd1, cmd2])
 
         shutil.copyfile(pldafile.name, plda_file)
 
@@ -439,19 +394,12 @@ def plda_train(feats, plda_file, mean_file):
     # ark:- \| ivector-mean ark:- ${plda_ivec_dir}/mean.vec || exit 1;
     # import ipdb; ipdb.set_trace()
     cmd3 = [binary3]  # ivector-mean
-    with tempfile.NamedTemporaryFile(
-        suffix=".mean"
-    ) as meanfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(suffix=".mean") as meanfile:
         cmd3 += [
             "ark:-",
             meanfile.name,
         ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe3 = Popen(cmd3, stdin=pipe1.stdout, stdout=PIPE, stderr=logfile)
-        pipe3.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd1, cmd3])
 
         shutil.copyfile(meanfile.name, mean_file)
 
@@ -544,25 +492,15 @@ def plda_enroll(feats, pldamean):
         "ark:-",
     ]
     cmd5 = [binary5]  # ivector-normalize-length
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".ark"
-    ) as spkarkfile, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ark") as spkarkfile:
 
         cmd5 += [
             "ark:-",
             "ark,t:" + spkarkfile.name,
         ]
 
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe2 = Popen(cmd2, stdin=pipe1.stdout, stdout=PIPE, stderr=logfile)
-        pipe3 = Popen(cmd3, stdin=pipe2.stdout, stdout=PIPE, stderr=logfile)
-        pipe4 = Popen(cmd4, stdin=pipe3.stdout, stdout=PIPE, stderr=logfile)
-        pipe5 = Popen(cmd5, stdin=pipe4.stdout, stdout=PIPE, stderr=logfile)
-        pipe5.communicate()
+        pipeline.run([cmd1, cmd2, cmd3, cmd4, cmd5])
         logger.debug("PLDA enrollment DONE ->")
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
 
         # get text format
         with open(spkarkfile.name) as fp:
@@ -668,23 +606,15 @@ def plda_score(feats, model, plda, globalmean, smoothing=0):
     ret = 0
 
     # plda smooting
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".plda"
-    ) as pldasmooth, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".plda") as pldasmooth:
         cmd1 += [
             "--smoothing=" + str(smoothing),
             pldafile.name,
             pldasmooth.name,
         ]
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe1.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run([cmd1])
 
-    with tempfile.NamedTemporaryFile(
-        delete=False, suffix=".score"
-    ) as score, tempfile.NamedTemporaryFile(suffix=".log") as logfile:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".score") as score:
         cmd4 += [
             "--normalize-length=true",
             pldasmooth.name,
@@ -694,15 +624,10 @@ def plda_score(feats, model, plda, globalmean, smoothing=0):
             score.name,
         ]
 
-        pipe2 = Popen(cmd2, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe3 = Popen(cmd3, stdin=pipe2.stdout, stdout=PIPE, stderr=logfile)
-        pipe4 = Popen(cmd4, stdin=pipe3.stdout, stdout=PIPE, stderr=logfile)
-        io.write_vec_flt(pipe2.stdin, feats, key=b"spk1")
-        pipe2.stdin.close()
-        pipe4.communicate()
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+        pipeline.run(
+            [cmd2, cmd3, cmd4],
+            lambda stdin: io.write_vec_flt(stdin, feats, key=b"spk1"),
+        )
 
         with open(score.name) as fp:
             scoretxt = fp.readline()
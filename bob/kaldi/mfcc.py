@@ -4,19 +4,21 @@
 # Mon 11 Jul 2016 10:39:15 CEST
 
 import logging
-import os
-import tempfile
 from os.path import isfile
-from subprocess import PIPE
-from subprocess import Popen
 
 import numpy as np
 
 from . import io
+from . import native
+from . import pipeline
+from .cache import cached
+from .extractor import FeatureExtractor
+from .worker import read_mat_record
 
 logger = logging.getLogger(__name__)
 
 
+@cached
 def mfcc(
     data,
     rate=8000,
@@ -32,6 +34,9 @@ def mfcc(
     dither=1.0,
     snip_edges=True,
     normalization=True,
+    backend=None,
+    pool=None,
+    cache=None,
 ):
     """Computes the MFCCs for given speech samples.
 
@@ -40,7 +45,8 @@ def mfcc(
     data : numpy.ndarray
         A 1D numpy ndarray object containing 64-bit float
         numbers with the audio signal to calculate the MFCCs from. The input
-        needs to be normalized between [-1, 1].
+        needs to be normalized between [-1, 1]. Integer arrays are taken
+        as 16-bit PCM samples and used without conversion.
 
     rate : float
         The sampling rate of the input signal in ``data``.
@@ -73,6 +79,18 @@ def mfcc(
         the ends. 
     normalization : :obj:`bool`, optional
         If true, the input samples in ``data`` are normalized to [-1, 1].
+        The samples are scaled as they are written or framed, ``data`` is
+        left untouched.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run the Kaldi binaries, ``native`` to compute the
+        features in-process. If not set, the backend selected with
+        :py:func:`bob.kaldi.set_backend` is used.
+    pool : :py:class:`bob.kaldi.WorkerPool`, optional
+        If given, the Kaldi pipeline is run on warm worker processes of
+        the pool instead of being started for this call only. As the
+        processes are reused, the dither noise differs from a fresh run.
+    cache : :py:class:`bob.kaldi.FeatureCache`, optional
+        If given, the features are looked up in and stored to the cache.
 
     Returns
     -------
@@ -86,10 +104,9 @@ def mfcc(
     cmd1 = [binary1]
     binary2 = "add-deltas"
     cmd2 = [binary2]
-    binary3 = "apply-cmvn-sliding"
-    cmd3 = [binary3]
 
-    # compute features plus deltas and sliding cmvn into the ark file
+    # compute features plus deltas into the ark file, sliding cmvn is
+    # applied in-process
     cmd1 += [
         "--sample-frequency=" + str(rate),
         "--preemphasis-coefficient=" + str(preemphasis_coefficient),
@@ -108,33 +125,45 @@ def mfcc(
         "ark:-",
         "ark:-",
     ]
-    cmd3 += [
-        "--norm-vars=false",
-        "--center=true",
-        "--cmn-window=300",
-        "ark:-",
-        "ark:-",
-    ]
 
     # import ipdb; ipdb.set_trace()
-    if normalization:
-        data /= np.max(np.abs(data), axis=0)  # normalize to [-1,1]
-
-    with open(os.devnull, "w") as fnull:
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=fnull)
-        pipe2 = Popen(cmd2, stdout=PIPE, stdin=pipe1.stdout, stderr=fnull)
-        pipe3 = Popen(cmd3, stdout=PIPE, stdin=pipe2.stdout, stderr=fnull)
-
+    peak = native._pcm_peak(data, normalization)  # normalize to [-1,1]
+
+    if native._resolve_backend(backend) == "native":
+        return native.mfcc(
+            data,
+            rate,
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+            peak=peak,
+        )
+
+    def write(stdin):
         # write wav file name (as if it were a Kaldi ark file)
-        pipe1.stdin.write(b"abc ")
+        stdin.write(b"abc ")
         # write WAV file in 16-bit format
-        io.write_wav(pipe1.stdin, data, rate)
-        pipe1.stdin.close()
+        io.write_wav(stdin, data, rate, peak=peak)
+
+    if pool is not None:
+        # flush every output record so the workers answer immediately
+        cmds = [cmd[:-1] + ["ark,f:-"] for cmd in (cmd1, cmd2)]
+        feats = pool.submit(cmds, write, read_mat_record)
+        return native.apply_cmvn_sliding(feats)
 
-        ret = [mat for name, mat in io.read_mat_ark(pipe3.stdout)][0]
-        return ret
+    ret = pipeline.run([cmd1, cmd2], write, pipeline.first(io.read_mat_ark))
+    return native.apply_cmvn_sliding(ret)
 
 
+@cached
 def mfcc_from_path(
     filename,
     channel=0,
@@ -149,6 +178,8 @@ def mfcc_from_path(
     high_freq=0,
     dither=1.0,
     snip_edges=True,
+    backend=None,
+    cache=None,
 ):
     """Computes the MFCCs for a given input signal recorded into a file
 
@@ -157,8 +188,11 @@ def mfcc_from_path(
     filename : str
         A path to a valid WAV or NIST Sphere file to read data from
 
-    channel : int
-        The audio channel to read from inside the file
+    channel : int or str or list
+        The audio channel to read from inside the file, ``all`` for all
+        channels, or a list of channels. Several channels are computed
+        from a single memory map of the file, see
+        :py:func:`bob.kaldi.io.read_audio`.
 
     preemphasis_coefficient : :obj:`float`, optional
         Coefficient for use in signal preemphasis
@@ -186,21 +220,55 @@ def mfcc_from_path(
         depends on the frame-length.  If false, the number of frames
         depends only on the frame-shift, and we reflect the data at
         the ends
+    backend : :obj:`str`, optional
+        ``kaldi`` to run the Kaldi binaries, ``native`` to compute the
+        features in-process. If not set, the backend selected with
+        :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.FeatureCache`, optional
+        If given, the features are looked up in and stored to the cache.
 
     Returns
     -------
     numpy.ndarray
         The MFCCs calculated for the input signal (2D array of
-        32-bit floats).
+        32-bit floats), or for several channels, a 3D array with the
+        MFCCs of every channel.
 
     """
 
+    assert isfile(filename)
+
+    multichannel = channel == "all" or isinstance(channel, (list, tuple))
+    backend = native._resolve_backend(backend)
+    if multichannel or backend == "native":
+        data, rate = io.read_audio(filename)
+        # slices keep the memory map, only a list of channels is gathered
+        if isinstance(channel, (list, tuple)):
+            data = data[list(channel)]
+        elif channel != "all":
+            data = data[channel : channel + 1]
+        feats = _mfcc_channels(
+            data,
+            rate,
+            backend,
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+        )
+        return feats if multichannel else feats[0]
+
     binary1 = "compute-mfcc-feats"
     cmd1 = [binary1]
     binary2 = "add-deltas"
     cmd2 = [binary2]
-    binary3 = "apply-cmvn-sliding"
-    cmd3 = [binary3]
 
     # compute features into the ark file
     cmd1 += [
@@ -221,33 +289,534 @@ def mfcc_from_path(
         "ark:-",
         "ark:-",
     ]
-    cmd3 += [
-        "--norm-vars=false",
-        "--center=true",
-        "--cmn-window=300",
+
+    def write(stdin):
+        # write scp file into pipe.stdin
+        strwrite = "abc " + filename
+        stdin.write(strwrite.encode("utf-8"))
+
+    ret = pipeline.run([cmd1, cmd2], write, pipeline.first(io.read_mat_ark))
+    return native.apply_cmvn_sliding(ret)
+
+
+def _mfcc_channels(data, rate, backend, **kwargs):
+    """Computes the MFCCs of the rows of ``data``, the channels of a file.
+
+    The native backend frames and transforms all channels jointly, the
+    Kaldi backend streams them as utterances through a single pipeline.
+    """
+    if backend == "native":
+        return native.mfcc(data, rate, **kwargs)
+    utterances = (("ch%d" % i, samples) for i, samples in enumerate(data))
+    feats = mfcc_batch(utterances, rate, normalization=False, backend=backend, **kwargs)
+    return np.stack([mat for _, mat in feats])
+
+
+def _mfcc_commands(options, rspecifier):
+    """The ``compute-mfcc-feats | add-deltas`` commands, reading from
+    ``rspecifier``"""
+
+    cmd1 = ["compute-mfcc-feats"]
+    cmd1 += ["--%s=%s" % (k.replace("_", "-"), v) for k, v in options]
+    cmd1 += [
+        rspecifier,
+        "ark:-",
+    ]
+    cmd2 = [
+        "add-deltas",
         "ark:-",
         "ark:-",
     ]
+    return cmd1, cmd2
 
-    # import ipdb; ipdb.set_trace()
-    assert isfile(filename)
 
-    with open(os.devnull, "w") as fnull:
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=fnull)
-        pipe2 = Popen(cmd2, stdout=PIPE, stdin=pipe1.stdout, stderr=fnull)
-        pipe3 = Popen(cmd3, stdout=PIPE, stdin=pipe2.stdout, stderr=fnull)
+def _read_batch(cmds, write, read_ark=io.read_mat_ark):
+    """Streams the archive written by ``write`` through ``cmds``, yielding
+    the decoded keys with the records read with ``read_ark``"""
+
+    for name, mat in pipeline.stream(cmds, write, read_ark):
+        yield name.decode("utf-8"), mat
+
+
+def mfcc_batch(
+    utterances,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    normalization=True,
+    backend=None,
+):
+    """Computes the MFCCs for many utterances in a single Kaldi pipeline.
+
+    All utterances are streamed as one multi-key archive through
+    ``compute-mfcc-feats | add-deltas``, and the
+    features are read back while the remaining utterances are still being
+    written, so memory is bounded by a single utterance.
+
+    Parameters
+    ----------
+    utterances : dict or iterable
+        A dictionary mapping keys to signals, or an iterable of ``(key,
+        data)`` tuples, where ``data`` is as in :py:func:`bob.kaldi.mfcc`.
+    rate : float
+        The sampling rate of all input signals.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters. With
+    ``normalization``, each signal is normalized to [-1, 1] on its own
+    and the input arrays are left untouched.
+
+    Yields
+    ------
+    (key, numpy.ndarray)
+        The key of each utterance with its MFCCs (2D array of 32-bit
+        floats), in the input order.
+
+    """
+
+    if isinstance(utterances, dict):
+        utterances = utterances.items()
+
+    options = [
+        ("sample_frequency", rate),
+        ("preemphasis_coefficient", preemphasis_coefficient),
+        ("raw_energy", str(raw_energy).lower()),
+        ("frame_length", frame_length),
+        ("frame_shift", frame_shift),
+        ("num_ceps", num_ceps),
+        ("num_mel_bins", num_mel_bins),
+        ("cepstral_lifter", cepstral_lifter),
+        ("dither", dither),
+        ("snip_edges", str(snip_edges).lower()),
+    ]
+
+    if native._resolve_backend(backend) == "native":
+        # the tables of the front-end are built once for all utterances
+        extractor = FeatureExtractor(
+            normalization=normalization,
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+        )
+        for key, data in utterances:
+            yield key, extractor(data, rate)
+        return
+
+    # Kaldi keys are restricted, so utterances get internal ids
+    keys = {}
+
+    def write(stdin):
+        for i, (key, data) in enumerate(utterances):
+            uttid = "utt%d" % i
+            keys[uttid] = key
+            peak = native._pcm_peak(data, normalization)
+            stdin.write(uttid.encode("utf-8") + b" ")
+            io.write_wav(stdin, data, rate, peak=peak)
+
+    for uttid, mat in _read_batch(_mfcc_commands(options, "ark:-"), write):
+        yield keys.pop(uttid), native.apply_cmvn_sliding(mat)
+
+
+def mfcc_from_paths(
+    filenames,
+    channel=0,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    backend=None,
+):
+    """Computes the MFCCs for many files in a single Kaldi pipeline.
+
+    The files are handed to ``compute-mfcc-feats`` as one scp, so the
+    whole list is processed by a single ``compute-mfcc-feats | add-deltas``
+    chain. With the native backend, each file is memory mapped and its
+    samples are framed without being copied.
+
+    Parameters
+    ----------
+    filenames : iterable
+        Paths to valid WAV or NIST Sphere files to read data from
+
+    See :py:func:`bob.kaldi.mfcc_from_path` for the remaining parameters.
+
+    Yields
+    ------
+    (str, numpy.ndarray)
+        The path of each file with its MFCCs (2D array of 32-bit floats),
+        in the input order. Files Kaldi fails to read are skipped.
+
+    """
+
+    if native._resolve_backend(backend) == "native":
+        extractor = FeatureExtractor(
+            normalization=False,
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            frame_length=frame_length,
+            frame_shift=frame_shift,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+            snip_edges=snip_edges,
+        )
+        for filename in filenames:
+            data, rate = io.read_audio(filename)
+            yield filename, extractor(data[channel], rate)
+        return
+
+    # the scp is written from another thread, check the paths here
+    filenames = list(filenames)
+    for filename in filenames:
+        assert isfile(filename)
+        if any(c.isspace() for c in filename):
+            raise ValueError(
+                "Path `%s' contains whitespace, which Kaldi scp files cannot hold"
+                % filename
+            )
+
+    options = [
+        ("channel", channel),
+        ("preemphasis_coefficient", preemphasis_coefficient),
+        ("raw_energy", str(raw_energy).lower()),
+        ("frame_length", frame_length),
+        ("frame_shift", frame_shift),
+        ("num_ceps", num_ceps),
+        ("num_mel_bins", num_mel_bins),
+        ("cepstral_lifter", cepstral_lifter),
+        ("dither", dither),
+        ("snip_edges", str(snip_edges).lower()),
+    ]
+
+    paths = {}
+
+    def write(stdin):
+        for i, filename in enumerate(filenames):
+            uttid = "utt%d" % i
+            paths[uttid] = filename
+            stdin.write(("%s %s\n" % (uttid, filename)).encode("utf-8"))
+
+    for uttid, mat in _read_batch(_mfcc_commands(options, "scp:-"), write):
+        yield paths.pop(uttid), native.apply_cmvn_sliding(mat)
+
+
+def _segment_range(start, end, rate, num_samples):
+    """The samples of a segment, as ``extract-segments`` computes them"""
+    begin = int(start * rate)
+    stop = num_samples if end <= 0 else min(int(end * rate), num_samples)
+    return begin, stop
 
-        # write scp file into pipe.stdin
-        strwrite = "abc " + filename
-        pipe1.stdin.write(strwrite.encode("utf-8"))
-        pipe1.stdin.close()
-        # pipe3.communicate()
 
-        # read ark from pipe3.stdout
-        ret = [mat for name, mat in io.read_mat_ark(pipe3.stdout)][0]
-        return ret
+def _shared_statics(extractor, data, rate, ranges, channels):
+    """Computes the static MFCCs of the ``ranges`` of the ``channels`` of
+    ``data``.
 
+    Overlapping ranges of a channel whose starts lie on the same frame
+    grid share their frames, which are computed only once.
+    """
+    c = extractor.config
+    length, shift = native._window_size(rate, c["frame_length"], c["frame_shift"])
+    statics = [None] * len(ranges)
+
+    def flush(channel, begin, end, members):
+        feats = extractor.statics(data[channel][begin:end], rate)
+        for i in members:
+            first = (ranges[i][0] - begin) // shift
+            size = ranges[i][1] - ranges[i][0]
+            count = native._num_frames(size, length, shift, True)
+            statics[i] = feats[first : first + count]
+
+    def grid(i):
+        return channels[i], ranges[i][0] % shift
+
+    run = None
+    for i in sorted(range(len(ranges)), key=lambda i: (grid(i), ranges[i])):
+        begin, end = ranges[i]
+        if run and grid(i) == grid(run[3][0]) and begin < run[2]:
+            run[2] = max(run[2], end)
+            run[3].append(i)
+            continue
+        if run:
+            flush(*run)
+        run = [channels[i], begin, end, [i]]
+    if run:
+        flush(*run)
+    return statics
+
+
+def mfcc_from_segments(
+    wav_scp,
+    segments,
+    channel=0,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    reuse_frames=False,
+    backend=None,
+):
+    """Computes the MFCCs of the segments of long recordings.
 
+    Each recording is memory mapped once and all of its segments are
+    extracted from it, as ``extract-segments | compute-mfcc-feats |
+    add-deltas`` would. With the Kaldi backend, the segments of all
+    recordings are streamed through a single pipeline.
+
+    Parameters
+    ----------
+    wav_scp : dict or str
+        A dictionary mapping recording ids to the paths of PCM WAV or NIST
+        Sphere files, or a Kaldi ``wav.scp`` file with this mapping.
+    segments : iterable or str
+        A Kaldi ``segments`` file, or an iterable of ``(utt_id, reco_id,
+        start, end)`` tuples, with an optional channel, as returned by
+        :py:func:`bob.kaldi.io.read_segments`. Times are in seconds.
+    channel : :obj:`int`, optional
+        The audio channel of the segments that do not give their own.
+    reuse_frames : :obj:`bool`, optional
+        With the native backend, overlapping segments whose starts are a
+        multiple of the frame shift apart share their frames, which are
+        computed once. Only the dither differs from extracting the
+        segments one by one. Needs ``snip_edges=True``.
+    backend : :obj:`str`, optional
+        ``kaldi`` to run the Kaldi binaries, ``native`` to compute the
+        features in-process. If not set, the backend selected with
+        :py:func:`bob.kaldi.set_backend` is used.
+
+    See :py:func:`bob.kaldi.mfcc_from_path` for the remaining parameters.
+
+    Yields
+    ------
+    (str, numpy.ndarray)
+        The id of each segment with its MFCCs (2D array of 32-bit floats),
+        grouped by recording. Segments too short for a single frame are
+        skipped.
+
+    Raises
+    ------
+    ValueError
+        If a recording does not hold 16-bit samples, or with the Kaldi
+        backend, if the recordings have different sampling rates.
+
+    """
+
+    if reuse_frames and not snip_edges:
+        raise ValueError("reuse_frames needs snip_edges=True")
+    if isinstance(wav_scp, str):
+        wav_scp = dict(io.read_wav_scp(wav_scp))
+    if isinstance(segments, str):
+        segments = io.read_segments(segments)
+
+    # the segments of each recording, in the order of the recordings
+    recordings = {}
+    for segment in segments:
+        utt, reco, start, end = segment[:4]
+        if len(segment) > 4 and segment[4] is not None:
+            utt_channel = segment[4]
+        else:
+            utt_channel = channel
+        recordings.setdefault(reco, []).append((utt, start, end, utt_channel))
+
+    options = dict(
+        preemphasis_coefficient=preemphasis_coefficient,
+        raw_energy=raw_energy,
+        frame_length=frame_length,
+        frame_shift=frame_shift,
+        num_ceps=num_ceps,
+        num_mel_bins=num_mel_bins,
+        cepstral_lifter=cepstral_lifter,
+        low_freq=low_freq,
+        high_freq=high_freq,
+        dither=dither,
+        snip_edges=snip_edges,
+    )
+
+    def read(reco):
+        data, rate = io.read_audio(wav_scp[reco])
+        ranges = [
+            _segment_range(start, end, rate, data.shape[1])
+            for _, start, end, _ in recordings[reco]
+        ]
+        return data, rate, ranges
+
+    if native._resolve_backend(backend) == "native":
+        extractor = FeatureExtractor(normalization=False, **options)
+        for reco, segs in recordings.items():
+            data, rate, ranges = read(reco)
+            channels = [ch for _, _, _, ch in segs]
+            if reuse_frames:
+                statics = _shared_statics(extractor, data, rate, ranges, channels)
+            else:
+                statics = (
+                    extractor.statics(data[ch][begin:end], rate)
+                    for ch, (begin, end) in zip(channels, ranges)
+                )
+            for (utt, _, _, _), feats in zip(segs, statics):
+                if len(feats) == 0:
+                    logger.warning("Segment %s has no frames, skipped", utt)
+                    continue
+                yield utt, native.apply_cmvn_sliding(native.add_deltas(feats))
+        return
+
+    if not recordings:
+        return
+    # the recordings are mapped before the pipeline starts, so that files
+    # it cannot take are refused here and not from the writing thread
+    audio = {reco: read(reco) for reco in recordings}
+    rate = audio[next(iter(recordings))][1]
+    for reco, (_, reco_rate, _) in audio.items():
+        if reco_rate != rate:
+            raise ValueError(
+                "Recording %s has a sampling rate of %s, not %s"
+                % (reco, reco_rate, rate)
+            )
+    length, shift = native._window_size(rate, frame_length, frame_shift)
+
+    def utterances():
+        for reco, segs in recordings.items():
+            data, _, ranges = audio[reco]
+            for (utt, _, _, ch), (begin, end) in zip(segs, ranges):
+                if native._num_frames(end - begin, length, shift, snip_edges) == 0:
+                    logger.warning("Segment %s has no frames, skipped", utt)
+                    continue
+                yield utt, data[ch][begin:end]
+
+    for utt, feats in mfcc_batch(
+        utterances(), rate, normalization=False, backend="kaldi", **options
+    ):
+        yield utt, feats
+
+
+def mfcc_vad(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    vad_energy_mean_scale=0.5,
+    vad_energy_th=5,
+    vad_frames_context=0,
+    vad_proportion_th=0.6,
+    normalization=True,
+    backend=None,
+):
+    """Computes the MFCCs and the energy-based VAD labels for given speech
+    samples.
+
+    The static MFCCs are computed once, then both the VAD labels (from C0)
+    and the features with deltas and sliding CMN are derived from them.
+    This gives the same results as calling :py:func:`bob.kaldi.mfcc` and
+    :py:func:`bob.kaldi.compute_vad` on the same samples, at the cost of a
+    single feature extraction.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        A 1D numpy ndarray object containing 64-bit float
+        numbers with the audio signal to calculate the MFCCs from. The input
+        needs to be normalized between [-1, 1]. Integer arrays are taken
+        as 16-bit PCM samples and used without conversion.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+
+    See :py:func:`bob.kaldi.mfcc` for the feature options and
+    :py:func:`bob.kaldi.compute_vad` for the VAD options.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        The MFCCs (2D array of 32-bit floats) and the labels [1/0] of voiced
+        features (1D array of floats).
+
+    """
+
+    peak = native._pcm_peak(data, normalization)  # normalize to [-1,1]
+
+    options = dict(
+        preemphasis_coefficient=preemphasis_coefficient,
+        raw_energy=raw_energy,
+        frame_length=frame_length,
+        frame_shift=frame_shift,
+        num_ceps=num_ceps,
+        num_mel_bins=num_mel_bins,
+        cepstral_lifter=cepstral_lifter,
+        low_freq=low_freq,
+        high_freq=high_freq,
+        dither=dither,
+        snip_edges=snip_edges,
+    )
+
+    if native._resolve_backend(backend) == "native":
+        feats = native.compute_mfcc_feats(data, rate, peak=peak, **options)
+    else:
+        cmd1 = ["compute-mfcc-feats", "--sample-frequency=" + str(rate)]
+        cmd1 += [
+            "--%s=%s" % (k.replace("_", "-"), str(v).lower())
+            for k, v in sorted(options.items())
+        ]
+        cmd1 += [
+            "ark:-",
+            "ark:-",
+        ]
+
+        def write(stdin):
+            stdin.write(b"abc ")
+            io.write_wav(stdin, data, rate, peak=peak)
+
+        feats = pipeline.run([cmd1], write, pipeline.first(io.read_mat_ark))
+
+    vad = native.compute_vad_from_feats(
+        feats,
+        vad_energy_mean_scale,
+        vad_energy_th,
+        vad_frames_context,
+        vad_proportion_th,
+    )
+    return native.apply_cmvn_sliding(native.add_deltas(feats)), vad
+
+
+@cached
 def compute_vad(
     samples,
     rate,
@@ -255,6 +824,8 @@ def compute_vad(
     vad_energy_th=5,
     vad_frames_context=0,
     vad_proportion_th=0.6,
+    backend=None,
+    cache=None,
 ):
     """Performs Voice Activity Detection on a Kaldi feature matrix
 
@@ -276,6 +847,12 @@ def compute_vad(
     vad_proportion_th: :obj:`float`, optional
         Parameter controlling the proportion of frames within the window that
         need to have more energy than the threshold
+    backend : :obj:`str`, optional
+        ``kaldi`` to run the Kaldi binaries, ``native`` to compute the
+        features and labels in-process. If not set, the backend selected
+        with :py:func:`bob.kaldi.set_backend` is used.
+    cache : :py:class:`bob.kaldi.FeatureCache`, optional
+        If given, the features are looked up in and stored to the cache.
 
     Returns
     -------
@@ -303,20 +880,101 @@ def compute_vad(
         "ark:-",
     ]
 
-    samples /= np.max(np.abs(samples), axis=0)  # normalize to [-1,1]
+    peak = native._pcm_peak(samples, True)  # normalize to [-1,1]
+
+    if native._resolve_backend(backend) == "native":
+        feats = native.compute_mfcc_feats(samples, rate, peak=peak)
+        return native.compute_vad_from_feats(
+            feats,
+            vad_energy_mean_scale,
+            vad_energy_th,
+            vad_frames_context,
+            vad_proportion_th,
+        )
+
+    def write(stdin):
+        stdin.write(b"abc ")
+        io.write_wav(stdin, samples, rate, peak=peak)
+
+    return pipeline.run([cmd1, cmd2], write, pipeline.first(io.read_vec_flt_ark))
+
+
+def compute_vad_batch(
+    utterances,
+    rate,
+    vad_energy_mean_scale=0.5,
+    vad_energy_th=5,
+    vad_frames_context=0,
+    vad_proportion_th=0.6,
+    backend=None,
+):
+    """Performs Voice Activity Detection on many utterances.
+
+    With the Kaldi backend, all utterances are streamed as one multi-key
+    archive through a single ``compute-mfcc-feats | compute-vad`` chain.
+    With the native backend, the labels are computed in-process, as in
+    :py:func:`bob.kaldi.compute_vad`.
 
-    with tempfile.NamedTemporaryFile(suffix=".log") as logfile:
-        pipe1 = Popen(cmd1, stdin=PIPE, stdout=PIPE, stderr=logfile)
-        pipe2 = Popen(cmd2, stdin=pipe1.stdout, stdout=PIPE, stderr=logfile)
+    Parameters
+    ----------
+    utterances : dict or iterable
+        A dictionary mapping keys to signals, or an iterable of ``(key,
+        samples)`` tuples. Each signal is normalized to [-1, 1] on its own
+        and the input arrays are left untouched.
+    rate : float
+        The sampling rate of all input signals.
+
+    See :py:func:`bob.kaldi.compute_vad` for the remaining parameters.
+
+    Yields
+    ------
+    (key, numpy.ndarray)
+        The key of each utterance with its labels [1/0] of voiced features
+        (1D array of floats), in the input order.
+    """
+
+    if isinstance(utterances, dict):
+        utterances = utterances.items()
+
+    if native._resolve_backend(backend) == "native":
+        for key, samples in utterances:
+            peak = native._pcm_peak(samples, True)
+            feats = native.compute_mfcc_feats(samples, rate, peak=peak)
+            yield key, native.compute_vad_from_feats(
+                feats,
+                vad_energy_mean_scale,
+                vad_energy_th,
+                vad_frames_context,
+                vad_proportion_th,
+            )
+        return
+
+    cmd1 = [
+        "compute-mfcc-feats",
+        "--sample-frequency=" + str(rate),
+        "ark:-",
+        "ark:-",
+    ]
+    cmd2 = [
+        "compute-vad",
+        "--vad-energy-mean-scale=" + str(vad_energy_mean_scale),
+        "--vad-energy-threshold=" + str(vad_energy_th),
+        "--vad-frames-context=" + str(vad_frames_context),
+        "--vad-proportion-threshold=" + str(vad_proportion_th),
+        "ark:-",
+        "ark:-",
+    ]
 
-        pipe1.stdin.write(b"abc ")
-        io.write_wav(pipe1.stdin, samples, rate)
-        pipe1.stdin.close()
+    # Kaldi keys are restricted, so utterances get internal ids
+    keys = {}
 
-        with open(logfile.name) as fp:
-            logtxt = fp.read()
-            logger.debug("%s", logtxt)
+    def write(stdin):
+        for i, (key, samples) in enumerate(utterances):
+            uttid = "utt%d" % i
+            keys[uttid] = key
+            peak = native._pcm_peak(samples, True)
+            stdin.write(uttid.encode("utf-8") + b" ")
+            io.write_wav(stdin, samples, rate, peak=peak)
 
-        # read ark from pipe2.stdout
-        ret = [mat for name, mat in io.read_vec_flt_ark(pipe2.stdout)][0]
-        return ret
+    for uttid, vad in _read_batch([cmd1, cmd2], write, io.read_vec_flt_ark):
+        yield keys.pop(uttid), vad
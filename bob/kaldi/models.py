@@ -0,0 +1,479 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import logging
+import os
+import struct
+import tempfile
+import weakref
+
+import numpy as np
+
+from . import io
+
+logger = logging.getLogger(__name__)
+
+_LOG_2PI = np.log(2 * np.pi)
+
+
+def _read_token(fd):
+    """Reads a space-terminated token of a binary Kaldi object"""
+    token = b""
+    while True:
+        char = fd.read(1)
+        if char == b"":
+            break
+        if char == b" ":
+            if token:
+                break
+            continue
+        token += char
+    return token.decode("utf-8") or None
+
+
+def _read_binary(fd):
+    """Reads a binary Kaldi vector, matrix or packed symmetric matrix"""
+    kind = _read_token(fd)
+    if kind is None or kind[0] not in "FD" or kind[1:] not in ("V", "M", "P"):
+        raise ValueError("Unsupported Kaldi type `%s'" % kind)
+    dtype = np.dtype("float32" if kind[0] == "F" else "float64")
+    assert fd.read(1) == b"\4"
+    rows = struct.unpack("<i", fd.read(4))[0]
+    if kind[1] == "V":
+        return np.frombuffer(fd.read(rows * dtype.itemsize), dtype)
+    if kind[1] == "P":
+        size = rows * (rows + 1) // 2
+        return _unpack(np.frombuffer(fd.read(size * dtype.itemsize), dtype))
+    assert fd.read(1) == b"\4"
+    cols = struct.unpack("<i", fd.read(4))[0]
+    buf = fd.read(rows * cols * dtype.itemsize)
+    return np.frombuffer(buf, dtype).reshape(rows, cols)
+
+
+def _read_text(tokens):
+    """Reads the numbers between brackets of a text Kaldi object"""
+    assert next(tokens) == "["
+    values = []
+    for token in tokens:
+        if token == "]":
+            break
+        values.append(token)
+    return np.array(values, dtype="float32")
+
+
+def _unpack(packed):
+    """Builds the symmetric matrix of a packed lower triangle"""
+    rows = int(round((np.sqrt(8 * len(packed) + 1) - 1) / 2))
+    mat = np.zeros((rows, rows), packed.dtype)
+    mat[np.tril_indices(rows)] = packed
+    return mat + np.tril(mat, -1).T
+
+
+def _write_binary(fd, array, packed=False):
+    """Writes a binary Kaldi vector, matrix or packed symmetric matrix"""
+    kind = "F" if array.dtype == np.float32 else "D"
+    if packed:
+        kind += "P"
+        data = array[np.tril_indices(array.shape[0])]
+    elif array.ndim == 1:
+        kind += "V"
+        data = array
+    else:
+        kind += "M"
+        data = np.ascontiguousarray(array)
+    fd.write(kind.encode("utf-8") + b" ")
+    for size in array.shape[: 1 if packed else None]:
+        fd.write(b"\4" + struct.pack("<i", size))
+    fd.write(data.tobytes())
+
+
+def _format(values):
+    return " ".join("%.9g" % v for v in values)
+
+
+def _text(array, packed=False):
+    """Formats a Kaldi vector, matrix or packed symmetric matrix as text"""
+    if packed:
+        rows = [_format(array[i, : i + 1]) + " \n" for i in range(array.shape[0])]
+        return " [\n" + "".join(rows) + "]\n"
+    if array.ndim == 1:
+        return " [ " + _format(array) + " ]\n"
+    rows = ["  " + _format(r) for r in array]
+    return " [\n" + "\n".join(rows) + " ]\n"
+
+
+def _unlink(name):
+    try:
+        os.unlink(name)
+    except OSError:
+        pass
+
+
+class _Gmm(object):
+    """Reading, writing and the model file of Kaldi GMMs"""
+
+    _TOKEN = None
+    _SUFFIX = None
+    _FIELDS = {}
+    # the fields written, in order: (token, attribute, packed)
+    _LAYOUT = []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_file"] = None
+        return state
+
+    @classmethod
+    def read(cls, file_or_fd):
+        """Reads a model written by Kaldi, in text or binary format.
+
+        Parameters
+        ----------
+        file_or_fd : obj
+            A file name or an opened file descriptor.
+        """
+        fd = io.open_or_fd(file_or_fd)
+        try:
+            header = fd.read(2)
+            if header == b"\0B":
+                return cls._read_binary(fd)
+            return cls.from_string((header + fd.read()).decode("utf-8"))
+        finally:
+            if fd is not file_or_fd:
+                fd.close()
+
+    @classmethod
+    def from_string(cls, text):
+        """Parses a model in Kaldi text format, e.g. as returned by
+        :py:func:`bob.kaldi.ubm_train`.
+
+        Parameters
+        ----------
+        text : str
+            The text formatted model.
+        """
+        fields = {}
+        tokens = iter(text.split())
+        for token in tokens:
+            kind = cls._FIELDS.get(token)
+            if kind == "packed":
+                num_gauss = len(fields["<WEIGHTS>"])
+                fields[token] = [_unpack(_read_text(tokens)) for _ in range(num_gauss)]
+            elif kind == "matrix":
+                num_gauss = len(fields["<WEIGHTS>"])
+                fields[token] = _read_text(tokens).reshape(num_gauss, -1)
+            elif kind == "vector":
+                fields[token] = _read_text(tokens)
+        return cls._from_fields(fields)
+
+    @classmethod
+    def _read_binary(cls, fd):
+        fields = {}
+        end = "</%s>" % cls._TOKEN
+        token = _read_token(fd)
+        while token is not None and token != end:
+            kind = cls._FIELDS.get(token)
+            if kind == "packed":
+                num_gauss = len(fields["<WEIGHTS>"])
+                fields[token] = [_read_binary(fd) for _ in range(num_gauss)]
+            elif kind is not None:
+                fields[token] = _read_binary(fd)
+            token = _read_token(fd)
+        return cls._from_fields(fields)
+
+    def write(self, file_or_fd, binary=True):
+        """Writes the model in Kaldi format.
+
+        Parameters
+        ----------
+        file_or_fd : obj
+            A file name or a file descriptor opened for writing bytes.
+        binary : :obj:`bool`, optional
+            If false, the text format is written.
+        """
+        fd = io.open_or_fd(file_or_fd, mode="wb")
+        try:
+            if not binary:
+                fd.write(self.to_string().encode("utf-8"))
+                return
+            fd.write(b"\0B<%s> " % self._TOKEN.encode("utf-8"))
+            for token, attribute, packed in self._LAYOUT:
+                array = getattr(self, attribute)
+                fd.write(token.encode("utf-8") + b" ")
+                for a in array if packed else [array]:
+                    _write_binary(fd, a, packed)
+            fd.write(b"</%s> " % self._TOKEN.encode("utf-8"))
+        finally:
+            if fd is not file_or_fd:
+                fd.close()
+
+    def to_string(self):
+        """Returns the model in Kaldi text format, as accepted by the
+        functions taking text formatted models.
+
+        Returns
+        -------
+        str
+            The text formatted model.
+        """
+        text = ["<%s> \n" % self._TOKEN]
+        for token, attribute, packed in self._LAYOUT:
+            array = getattr(self, attribute)
+            text.append(token + " ")
+            text.extend(_text(a, packed) for a in (array if packed else [array]))
+        text.append("</%s> \n" % self._TOKEN)
+        return "".join(text)
+
+    def path(self):
+        """Returns the path of a binary Kaldi file holding the model.
+
+        The file is written on the first call and reused by the following
+        ones, so Kaldi binaries can load the model without any conversion.
+        It is removed when the model is garbage collected, so the model
+        should not be modified once the file exists.
+
+        Returns
+        -------
+        str
+            The path of the model file.
+        """
+        if self._file is None:
+            fd, name = tempfile.mkstemp(suffix=self._SUFFIX)
+            with os.fdopen(fd, "wb") as fp:
+                self.write(fp)
+            weakref.finalize(self, _unlink, name)
+            self._file = name
+        return self._file
+
+    @property
+    def num_gauss(self):
+        """The number of Gaussians"""
+        return len(self.weights)
+
+
+class DiagGmm(_Gmm):
+    """A diagonal-covariance GMM in Kaldi's parametrization.
+
+    Parse the models of :py:func:`bob.kaldi.ubm_train` and
+    :py:func:`bob.kaldi.ubm_enroll` once with :py:meth:`from_string` or
+    :py:meth:`read`, and pass the object wherever a text formatted
+    diagonal GMM is accepted: the model is then written once, in binary
+    format, for all the calls.
+
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        The weights of the Gaussians (1D array).
+    means_invvars : numpy.ndarray
+        The means multiplied by the inverse variances (2D array, one row
+        per Gaussian).
+    inv_vars : numpy.ndarray
+        The inverse variances (2D array, one row per Gaussian).
+    gconsts : :obj:`numpy.ndarray`, optional
+        The constant terms of the log-likelihoods. Computed from the other
+        parameters if not given.
+    """
+
+    _TOKEN = "DiagGMM"
+    _SUFFIX = ".dubm"
+    _FIELDS = {
+        "<GCONSTS>": "vector",
+        "<WEIGHTS>": "vector",
+        "<MEANS_INVVARS>": "matrix",
+        "<INV_VARS>": "matrix",
+    }
+    _LAYOUT = [
+        ("<GCONSTS>", "gconsts", False),
+        ("<WEIGHTS>", "weights", False),
+        ("<MEANS_INVVARS>", "means_invvars", False),
+        ("<INV_VARS>", "inv_vars", False),
+    ]
+
+    def __init__(self, weights, means_invvars, inv_vars, gconsts=None):
+        self.weights = np.asarray(weights)
+        self.means_invvars = np.asarray(means_invvars)
+        self.inv_vars = np.asarray(inv_vars)
+        if gconsts is None:
+            gconsts = self.compute_gconsts()
+        self.gconsts = np.asarray(gconsts)
+        self._file = None
+
+    @classmethod
+    def _from_fields(cls, fields):
+        return cls(
+            fields["<WEIGHTS>"],
+            fields["<MEANS_INVVARS>"],
+            fields["<INV_VARS>"],
+            fields.get("<GCONSTS>"),
+        )
+
+    @property
+    def dim(self):
+        """The dimension of the features"""
+        return self.means_invvars.shape[1]
+
+    @property
+    def means(self):
+        """The means of the Gaussians (2D array)"""
+        return self.means_invvars / self.inv_vars
+
+    @property
+    def variances(self):
+        """The variances of the Gaussians (2D array)"""
+        return 1.0 / self.inv_vars
+
+    def compute_gconsts(self):
+        """Computes the constant terms of the log-likelihoods, as Kaldi's
+        ``DiagGmm::ComputeGconsts``.
+
+        Returns
+        -------
+        numpy.ndarray
+            The constant term of every Gaussian (1D array).
+        """
+        inv_vars = self.inv_vars.astype("float64")
+        means_invvars = self.means_invvars.astype("float64")
+        gconsts = np.log(self.weights) - 0.5 * (
+            inv_vars.shape[1] * _LOG_2PI
+            - np.log(inv_vars).sum(axis=1)
+            + (means_invvars ** 2 / inv_vars).sum(axis=1)
+        )
+        return gconsts.astype(self.weights.dtype)
+
+
+class FullGmm(_Gmm):
+    """A full-covariance GMM in Kaldi's parametrization.
+
+    Parse the models of :py:func:`bob.kaldi.ubm_full_train` once with
+    :py:meth:`from_string` or :py:meth:`read`, and pass the object wherever
+    a text formatted full GMM is accepted.
+
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        The weights of the Gaussians (1D array).
+    means_invcovars : numpy.ndarray
+        The means multiplied by the inverse covariances (2D array, one row
+        per Gaussian).
+    inv_covars : numpy.ndarray
+        The inverse covariance matrices (3D array, one matrix per
+        Gaussian).
+    gconsts : :obj:`numpy.ndarray`, optional
+        The constant terms of the log-likelihoods. Computed from the other
+        parameters if not given.
+    """
+
+    _TOKEN = "FullGMM"
+    _SUFFIX = ".fubm"
+    _FIELDS = {
+        "<GCONSTS>": "vector",
+        "<WEIGHTS>": "vector",
+        "<MEANS_INVCOVARS>": "matrix",
+        "<INV_COVARS>": "packed",
+    }
+    _LAYOUT = [
+        ("<GCONSTS>", "gconsts", False),
+        ("<WEIGHTS>", "weights", False),
+        ("<MEANS_INVCOVARS>", "means_invcovars", False),
+        ("<INV_COVARS>", "inv_covars", True),
+    ]
+
+    def __init__(self, weights, means_invcovars, inv_covars, gconsts=None):
+        self.weights = np.asarray(weights)
+        self.means_invcovars = np.asarray(means_invcovars)
+        self.inv_covars = np.asarray(inv_covars)
+        if gconsts is None:
+            gconsts = self.compute_gconsts()
+        self.gconsts = np.asarray(gconsts)
+        self._file = None
+
+    @classmethod
+    def _from_fields(cls, fields):
+        return cls(
+            fields["<WEIGHTS>"],
+            fields["<MEANS_INVCOVARS>"],
+            np.stack(fields["<INV_COVARS>"]),
+            fields.get("<GCONSTS>"),
+        )
+
+    @property
+    def dim(self):
+        """The dimension of the features"""
+        return self.means_invcovars.shape[1]
+
+    @property
+    def means(self):
+        """The means of the Gaussians (2D array)"""
+        return np.linalg.solve(
+            self.inv_covars.astype("float64"),
+            self.means_invcovars.astype("float64")[..., None],
+        )[..., 0]
+
+    @property
+    def covars(self):
+        """The covariance matrices of the Gaussians (3D array)"""
+        return np.linalg.inv(self.inv_covars.astype("float64"))
+
+    def compute_gconsts(self):
+        """Computes the constant terms of the log-likelihoods, as Kaldi's
+        ``FullGmm::ComputeGconsts``.
+
+        Returns
+        -------
+        numpy.ndarray
+            The constant term of every Gaussian (1D array).
+        """
+        _, logdet = np.linalg.slogdet(self.inv_covars.astype("float64"))
+        means = self.means
+        gconsts = np.log(self.weights) - 0.5 * (
+            means.shape[1] * _LOG_2PI
+            - logdet
+            + (means * self.means_invcovars).sum(axis=1)
+        )
+        return gconsts.astype(self.weights.dtype)
+
+
+class _TextModel(object):
+    """The temporary file of a text formatted model"""
+
+    def __init__(self, text, suffix):
+        with tempfile.NamedTemporaryFile(
+            mode="wt", delete=False, suffix=suffix
+        ) as fp:
+            fp.write(text)
+        self.name = fp.name
+
+    def close(self):
+        os.unlink(self.name)
+
+
+class _ParsedModel(object):
+    """The file of a parsed model, kept with the model"""
+
+    def __init__(self, model):
+        self.name = model.path()
+
+    def close(self):
+        pass
+
+
+def model_file(model, suffix):
+    """Gives a Kaldi binary the file of a model.
+
+    Parameters
+    ----------
+    model : str or :py:class:`DiagGmm` or :py:class:`FullGmm`
+        A text formatted model, written to a temporary file, or a parsed
+        model, whose own file is used.
+    suffix : str
+        The suffix of the temporary file.
+
+    Returns
+    -------
+    obj
+        An object with the path of the file as ``name``, whose ``close()``
+        method removes the file if it is temporary.
+    """
+    if isinstance(model, _Gmm):
+        return _ParsedModel(model)
+    return _TextModel(model, suffix)
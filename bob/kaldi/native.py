@@ -0,0 +1,1362 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import logging
+
+import numpy as np
+
+from . import io
+
+logger = logging.getLogger(__name__)
+
+# Kaldi floors energies and log-arguments with FLT_EPSILON
+_EPSILON = np.finfo(np.float32).eps
+
+_BACKENDS = ("kaldi", "native")
+_backend = "kaldi"
+
+
+def set_backend(backend):
+    """Selects the default backend used for feature extraction and GMM
+    scoring.
+
+    Parameters
+    ----------
+    backend : str
+        Either ``kaldi`` (features are computed by piping the signal
+        through the Kaldi binaries) or ``native`` (features are computed
+        in-process with NumPy).
+
+    Raises
+    ------
+    ValueError
+        If ``backend`` is not a known backend.
+    """
+    global _backend
+    if backend not in _BACKENDS:
+        raise ValueError(
+            "Unknown backend `%s', choose one of %s" % (backend, ", ".join(_BACKENDS))
+        )
+    _backend = backend
+
+
+def get_backend():
+    """Returns the name of the default feature extraction backend.
+
+    Returns
+    -------
+    str
+        The name of the backend used when none is given explicitly.
+    """
+    return _backend
+
+
+def _resolve_backend(backend):
+    if backend is None:
+        return _backend
+    if backend not in _BACKENDS:
+        raise ValueError(
+            "Unknown backend `%s', choose one of %s" % (backend, ", ".join(_BACKENDS))
+        )
+    return backend
+
+
+def _glibc_seed_state():
+    """The 31 words of glibc's ``random()`` state before its first output
+    with the default seed"""
+    r = [1]
+    for i in range(1, 31):
+        r.append((16807 * r[-1]) % 2147483647)
+    r.extend(r[:3])
+    while len(r) < 344:
+        r.append((r[-31] + r[-3]) & 0xFFFFFFFF)
+    return np.array(r[-31:], dtype="uint64")
+
+
+_GLIBC_STATE = _glibc_seed_state()
+# matrices advancing the state by 2**k steps, by k
+_GLIBC_JUMPS = []
+# the rand_r jump coefficients of _rand_r_powers, by number of steps
+_RAND_R_POWERS = {}
+
+
+def _glibc_jump(k):
+    if not _GLIBC_JUMPS:
+        # one step: shift the words, append r[-31] + r[-3]
+        step = np.eye(31, k=1, dtype="uint64")
+        step[30, 0] = step[30, 28] = 1
+        _GLIBC_JUMPS.append(step)
+    while len(_GLIBC_JUMPS) <= k:
+        # matrices are appended whole, so other threads never see a partial one
+        jump = _GLIBC_JUMPS[-1]
+        _GLIBC_JUMPS.append((jump @ jump) & np.uint64(0xFFFFFFFF))
+    return _GLIBC_JUMPS[k]
+
+
+def _glibc_rand(count, start=0):
+    """The outputs ``start`` to ``start + count`` of glibc's ``rand()`` with
+    the default seed.
+
+    The state at ``start`` is reached by jumping ahead with powers of the
+    step matrix, so only the ``count`` outputs are computed and stored.
+    """
+    state = _GLIBC_STATE
+    k = 0
+    while start >> k:
+        if (start >> k) & 1:
+            state = (_glibc_jump(k) @ state) & np.uint64(0xFFFFFFFF)
+        k += 1
+    r = np.empty(31 + count, dtype="uint32")
+    r[:31] = state
+    # r[i] = r[i - 31] + r[i - 3], three words at a time
+    for i in range(31, 31 + count, 3):
+        j = min(i + 3, 31 + count)
+        r[i:j] = r[i - 31 : j - 31] + r[i - 3 : j - 3]
+    return r[31:] >> 1
+
+
+def _rand_r_powers(num_steps):
+    """Coefficients to jump ``n`` steps ahead in the ``rand_r`` LCG"""
+    powers = _RAND_R_POWERS.get(num_steps)
+    if powers is None:
+        mult = np.empty(num_steps, dtype="uint64")
+        incr = np.empty(num_steps, dtype="uint64")
+        a, c = 1, 0
+        for n in range(num_steps):
+            a = (a * 1103515245) & 0xFFFFFFFF
+            c = (c * 1103515245 + 12345) & 0xFFFFFFFF
+            mult[n] = a
+            incr[n] = c
+        mult.flags.writeable = incr.flags.writeable = False
+        powers = _RAND_R_POWERS[num_steps] = (mult, incr)
+    return powers
+
+
+def _dither_noise(num_frames, frame_length, first_frame=0, block_size=256):
+    """Gaussian noise reproducing Kaldi's ``Dither()``, frame by frame.
+
+    Kaldi seeds a ``RandomState`` from ``rand()`` for every frame and then
+    draws two ``rand_r()`` uniforms per sample for a Box-Muller transform.
+    Rebuilding the same sequence makes the native backend deterministic
+    and identical to a fresh ``compute-*-feats`` process.
+    """
+    seeds = _glibc_rand(num_frames, first_frame).astype("uint64")
+    seeds = (seeds + np.uint64(27437)) & np.uint64(0xFFFFFFFF)
+    mult, incr = _rand_r_powers(6 * frame_length)
+    noise = np.empty((num_frames, frame_length), dtype="float32")
+    for start in range(0, num_frames, block_size):
+        block = seeds[start : start + block_size, None]
+        states = (block * mult + incr) & np.uint64(0xFFFFFFFF)
+        high = (states >> np.uint64(16)).reshape(len(block), 2 * frame_length, 3)
+        draws = (
+            ((high[..., 0] % np.uint64(2048)) << np.uint64(20))
+            ^ ((high[..., 1] % np.uint64(1024)) << np.uint64(10))
+            ^ (high[..., 2] % np.uint64(1024))
+        )
+        uniform = ((draws + 1.0) / (2147483647 + 2.0)).astype("float32")
+        noise[start : start + block_size] = np.sqrt(
+            -2 * np.log(uniform[:, 0::2], dtype="float64")
+        ) * np.cos(2 * np.pi * uniform[:, 1::2])
+    return noise
+
+
+def _to_pcm_scale(data, peak=None, block_size=1 << 16):
+    """The 16-bit samples written by :py:func:`bob.kaldi.io.write_wav`, which
+    Kaldi reads without scaling.
+
+    16-bit integer arrays already hold PCM samples and are returned as they
+    are. Otherwise, the samples (divided by ``peak``, by default as in
+    :py:func:`_pcm_peak`) are converted block by block, so only the int16
+    result is allocated.
+    """
+    data = np.asarray(data)
+    if peak is None:
+        peak = _pcm_peak(data)
+        if peak is None:
+            return data
+    pcm = np.empty(data.shape, dtype="int16")
+    for start in range(0, data.shape[-1], block_size):
+        block = data[..., start : start + block_size]
+        if peak is not None:
+            block = block / peak
+        pcm[..., start : start + block_size] = block * (1 << 15)
+    return pcm
+
+
+def _peak(data):
+    """``np.max(np.abs(data), axis=0)`` without a temporary copy of ``data``"""
+    high, low = data.max(axis=0), data.min(axis=0)
+    if np.issubdtype(data.dtype, np.integer):
+        high, low = high.astype("int64"), low.astype("int64")
+    return np.maximum(high, -low)
+
+
+def _pcm_peak(data, normalization=False):
+    """The ``peak`` that :py:func:`bob.kaldi.io.write_wav` and the native
+    front-ends divide ``data`` by: its maximum magnitude with
+    ``normalization``, otherwise 1 for floats in [-1, 1], ``None`` for
+    16-bit PCM samples, which are used as they are, and the full scale of
+    other signed integers, which are rescaled to 16 bits.
+
+    The samples are scaled a block or a frame at a time, so ``data`` is
+    neither modified nor copied.
+    """
+    dtype = np.asarray(data).dtype
+    if np.issubdtype(dtype, np.integer):
+        peak = io._integer_peak(dtype)  # rejects unsigned samples
+    else:
+        peak = 1.0
+    if normalization:
+        return _peak(data)
+    return peak
+
+
+def _pcm_frames(frames, peak=None):
+    """Copies ``frames`` to 64-bit floats, converting them to the 16-bit
+    samples :py:func:`bob.kaldi.io.write_wav` writes if ``peak`` is given"""
+    if peak is None:
+        return np.array(frames, dtype="float64")
+    pcm = np.asarray(frames / peak * (1 << 15), dtype="int16")
+    return pcm.astype("float64")
+
+
+def _num_frames(num_samples, frame_length, frame_shift, snip_edges):
+    if snip_edges:
+        if num_samples < frame_length:
+            return 0
+        return 1 + (num_samples - frame_length) // frame_shift
+    return (num_samples + frame_shift // 2) // frame_shift
+
+
+def _frame_signal(data, frame_length, frame_shift, snip_edges=True):
+    """Splits the last axis of ``data`` into (possibly overlapping) frames.
+
+    With ``snip_edges`` the frames are a strided view on ``data``,
+    otherwise the signal is reflected at its ends the same way Kaldi's
+    ``ExtractWindow`` does.
+    """
+    num_samples = data.shape[-1]
+    num_frames = _num_frames(num_samples, frame_length, frame_shift, snip_edges)
+    if num_frames == 0:
+        return np.zeros(data.shape[:-1] + (0, frame_length), dtype=data.dtype)
+    if not snip_edges:
+        # frames are centered on multiples of frame_shift
+        begin = frame_shift // 2 - frame_length // 2
+        end = (num_frames - 1) * frame_shift + begin + frame_length
+        index = np.arange(begin, max(end, begin))
+        # reflect out-of-range indices, as Kaldi does
+        while True:
+            low = index < 0
+            high = index >= num_samples
+            if not (low.any() or high.any()):
+                break
+            index[low] = -index[low] - 1
+            index[high] = 2 * num_samples - index[high] - 1
+        data = data[..., index]
+    frames = np.lib.stride_tricks.sliding_window_view(data, frame_length, axis=-1)
+    return frames[..., : num_frames * frame_shift : frame_shift, :]
+
+
+def _povey_window(frame_length):
+    a = 2 * np.pi / (frame_length - 1)
+    return (0.5 - 0.5 * np.cos(a * np.arange(frame_length))) ** 0.85
+
+
+def _padded_length(frame_length):
+    return 1 << int(np.ceil(np.log2(frame_length)))
+
+
+def _mel_scale(freq):
+    return 1127.0 * np.log(1.0 + freq / 700.0)
+
+
+def _inverse_mel_scale(mel):
+    return 700.0 * (np.exp(mel / 1127.0) - 1.0)
+
+
+def _mel_banks(num_mel_bins, rate, padded_length, low_freq, high_freq):
+    """Triangular mel filters, shape ``(num_fft_bins, num_mel_bins)``"""
+    nyquist = 0.5 * rate
+    if high_freq <= 0:
+        high_freq += nyquist
+    if not (0.0 <= low_freq < nyquist and 0.0 < high_freq <= nyquist):
+        raise ValueError(
+            "Bad values in options: low-freq %s and high-freq %s vs. nyquist %s"
+            % (low_freq, high_freq, nyquist)
+        )
+    num_fft_bins = padded_length // 2
+    fft_bin_width = float(rate) / padded_length
+    mel_low = _mel_scale(low_freq)
+    mel_high = _mel_scale(high_freq)
+    mel_delta = (mel_high - mel_low) / (num_mel_bins + 1)
+
+    left = mel_low + np.arange(num_mel_bins) * mel_delta
+    center = left + mel_delta
+    right = center + mel_delta
+
+    mel = _mel_scale(fft_bin_width * np.arange(num_fft_bins))[:, None]
+    up = (mel - left) / (center - left)
+    down = (right - mel) / (right - center)
+    weights = np.where(mel <= center, up, down)
+    weights[(mel <= left) | (mel >= right)] = 0.0
+    return weights
+
+
+def _dct_matrix(num_ceps, num_mel_bins):
+    """The first ``num_ceps`` rows of Kaldi's normalized DCT-II matrix"""
+    k = np.arange(num_ceps)[:, None]
+    n = np.arange(num_mel_bins)[None, :]
+    dct = np.sqrt(2.0 / num_mel_bins) * np.cos(np.pi / num_mel_bins * (n + 0.5) * k)
+    dct[0] = np.sqrt(1.0 / num_mel_bins)
+    return dct
+
+
+def _lifter_coeffs(num_ceps, cepstral_lifter):
+    i = np.arange(num_ceps)
+    return 1.0 + 0.5 * cepstral_lifter * np.sin(np.pi * i / cepstral_lifter)
+
+
+def _front_end_tables(
+    rate,
+    frame_length,
+    num_mel_bins,
+    low_freq,
+    high_freq,
+    num_ceps=13,
+    cepstral_lifter=22,
+    lpc_order=12,
+):
+    """Builds the tables of a front-end configuration.
+
+    ``frame_length`` is in samples. The window, mel banks, DCT, lifter
+    and PLP weights only depend on the sampling rate and the options, so
+    they can be computed once and reused for every signal.
+    """
+    padded_length = _padded_length(frame_length)
+    return dict(
+        window=_povey_window(frame_length),
+        banks=_mel_banks(num_mel_bins, rate, padded_length, low_freq, high_freq),
+        dct=_dct_matrix(num_ceps, num_mel_bins),
+        lifter=_lifter_coeffs(num_ceps, cepstral_lifter) if cepstral_lifter else None,
+        loudness=_equal_loudness(num_mel_bins, rate, low_freq, high_freq),
+        idft=_idft_bases(lpc_order + 1, num_mel_bins + 2),
+    )
+
+
+def _table(tables, name, build, *args):
+    """Returns ``tables[name]``, or builds it if no tables are given"""
+    if tables is None:
+        return build(*args)
+    return tables[name]
+
+
+def _process_frames(
+    frames,
+    preemphasis_coefficient,
+    raw_energy,
+    dither,
+    remove_dc_offset=True,
+    first_frame=0,
+    window=None,
+    peak=None,
+):
+    """Dithers, removes the DC, pre-emphasizes and windows ``frames``.
+
+    ``first_frame`` is the index of the first frame in the utterance, it
+    keeps the dither sequence aligned when frames come in chunks. With
+    ``peak``, the frames are first converted to 16-bit PCM, see
+    :py:func:`_pcm_peak`.
+    Returns the windowed frames and their log-energy.
+    """
+    frames = _pcm_frames(frames, peak)
+    if dither != 0.0:
+        num_frames, frame_length = frames.shape[-2:]
+        frames += dither * _dither_noise(num_frames, frame_length, first_frame)
+    if remove_dc_offset:
+        frames -= frames.mean(axis=-1, keepdims=True)
+    if raw_energy:
+        energy = np.einsum("...i,...i->...", frames, frames)
+    if preemphasis_coefficient != 0.0:
+        frames[..., 1:] -= preemphasis_coefficient * frames[..., :-1]
+        frames[..., 0] -= preemphasis_coefficient * frames[..., 0]
+    if window is None:
+        window = _povey_window(frames.shape[-1])
+    frames *= window
+    if not raw_energy:
+        energy = np.einsum("...i,...i->...", frames, frames)
+    return frames, np.log(np.maximum(energy, _EPSILON))
+
+
+def _power_spectrum(frames):
+    padded_length = _padded_length(frames.shape[-1])
+    spectrum = np.fft.rfft(frames, n=padded_length, axis=-1)
+    return spectrum.real ** 2 + spectrum.imag ** 2
+
+
+def compute_mfcc_feats(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    peak=None,
+):
+    """Computes static MFCCs in-process, equivalent to ``compute-mfcc-feats``
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The audio signal, in the scale of 16-bit PCM samples. The last
+        axis is time, any leading axes (e.g. channels) are processed
+        jointly.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    peak : :obj:`float`, optional
+        If given, the samples are divided by ``peak`` and converted to
+        16-bit PCM a frame at a time, as
+        :py:func:`bob.kaldi.io.write_wav` writes them: 1 for floats in
+        [-1, 1], or the maximum magnitude of ``data`` to normalize it.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The static MFCCs, with C0 replaced by the log-energy (array of
+        32-bit floats with shape ``data.shape[:-1] + (frames, num_ceps)``).
+    """
+    length, shift = _window_size(rate, frame_length, frame_shift)
+    frames = _frame_signal(np.asarray(data), length, shift, snip_edges)
+    return _mfcc_from_frames(
+        frames,
+        rate,
+        preemphasis_coefficient,
+        raw_energy,
+        num_ceps,
+        num_mel_bins,
+        cepstral_lifter,
+        low_freq,
+        high_freq,
+        dither,
+        peak=peak,
+    )
+
+
+def _window_size(rate, frame_length, frame_shift):
+    """Frame length and shift in samples, for times in milliseconds"""
+    return int(rate * 0.001 * frame_length), int(rate * 0.001 * frame_shift)
+
+
+def _mel_energies(
+    frames,
+    rate,
+    preemphasis_coefficient,
+    raw_energy,
+    num_mel_bins,
+    low_freq,
+    high_freq,
+    dither,
+    first_frame=0,
+    tables=None,
+    peak=None,
+):
+    """The front-end shared by all feature types.
+
+    ``tables`` are the tables of the configuration, as returned by
+    :py:func:`_front_end_tables`, or ``None`` to build them.
+    Returns the mel filterbank energies of ``frames`` and their log-energy.
+    """
+    frames, log_energy = _process_frames(
+        frames,
+        preemphasis_coefficient,
+        raw_energy,
+        dither,
+        first_frame=first_frame,
+        window=None if tables is None else tables["window"],
+        peak=peak,
+    )
+    power = _power_spectrum(frames)
+
+    banks = _table(
+        tables,
+        "banks",
+        _mel_banks,
+        num_mel_bins,
+        rate,
+        _padded_length(frames.shape[-1]),
+        low_freq,
+        high_freq,
+    )
+    return power[..., : banks.shape[0]] @ banks, log_energy
+
+
+def _log_mel_energies(
+    frames,
+    rate,
+    preemphasis_coefficient,
+    raw_energy,
+    num_mel_bins,
+    low_freq,
+    high_freq,
+    dither,
+    first_frame=0,
+    tables=None,
+    peak=None,
+):
+    mel_energies, log_energy = _mel_energies(
+        frames,
+        rate,
+        preemphasis_coefficient,
+        raw_energy,
+        num_mel_bins,
+        low_freq,
+        high_freq,
+        dither,
+        first_frame,
+        tables,
+        peak,
+    )
+    return np.log(np.maximum(mel_energies, _EPSILON)), log_energy
+
+
+def _mfcc_from_log_mel(log_mel, log_energy, num_ceps, cepstral_lifter, tables=None):
+    feats = log_mel @ _table(tables, "dct", _dct_matrix, num_ceps, log_mel.shape[-1]).T
+    if cepstral_lifter != 0.0:
+        feats *= _table(tables, "lifter", _lifter_coeffs, num_ceps, cepstral_lifter)
+    feats[..., 0] = log_energy
+    return feats.astype("float32")
+
+
+def _mfcc_from_frames(
+    frames,
+    rate,
+    preemphasis_coefficient,
+    raw_energy,
+    num_ceps,
+    num_mel_bins,
+    cepstral_lifter,
+    low_freq,
+    high_freq,
+    dither,
+    first_frame=0,
+    tables=None,
+    peak=None,
+):
+    log_mel, log_energy = _log_mel_energies(
+        frames,
+        rate,
+        preemphasis_coefficient,
+        raw_energy,
+        num_mel_bins,
+        low_freq,
+        high_freq,
+        dither,
+        first_frame,
+        tables,
+        peak,
+    )
+    return _mfcc_from_log_mel(log_mel, log_energy, num_ceps, cepstral_lifter, tables)
+
+
+def compute_fbank_feats(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_mel_bins=23,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    use_energy=False,
+    peak=None,
+):
+    """Computes log mel filterbank energies in-process, equivalent to
+    ``compute-fbank-feats``
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The audio signal, in the scale of 16-bit PCM samples. The last
+        axis is time, any leading axes (e.g. channels) are processed
+        jointly.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    use_energy : :obj:`bool`, optional
+        If true, the log-energy is prepended to the filterbank energies.
+    peak : :obj:`float`, optional
+        As in :py:func:`compute_mfcc_feats`.
+
+    See :py:func:`bob.kaldi.fbank` for the remaining parameters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The log filterbank energies (array of 32-bit floats with shape
+        ``data.shape[:-1] + (frames, num_mel_bins)``, plus one column with
+        ``use_energy``).
+    """
+    length, shift = _window_size(rate, frame_length, frame_shift)
+    frames = _frame_signal(np.asarray(data), length, shift, snip_edges)
+    log_mel, log_energy = _log_mel_energies(
+        frames,
+        rate,
+        preemphasis_coefficient,
+        raw_energy,
+        num_mel_bins,
+        low_freq,
+        high_freq,
+        dither,
+        peak=peak,
+    )
+    if use_energy:
+        log_mel = np.concatenate([log_energy[..., None], log_mel], axis=-1)
+    return log_mel.astype("float32")
+
+
+def compute_front_end(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    peak=None,
+):
+    """Computes filterbank energies, MFCCs and log-energy in a single pass.
+
+    The signal is framed and transformed once; the MFCCs are the DCT of
+    the same log filterbank energies.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The audio signal, in the scale of 16-bit PCM samples.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    peak : :obj:`float`, optional
+        As in :py:func:`compute_mfcc_feats`.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        The log filterbank energies, as ``compute-fbank-feats``, the static
+        MFCCs, as ``compute-mfcc-feats``, and the log-energy of every frame
+        (arrays of 32-bit floats).
+    """
+    length, shift = _window_size(rate, frame_length, frame_shift)
+    frames = _frame_signal(np.asarray(data), length, shift, snip_edges)
+    log_mel, log_energy = _log_mel_energies(
+        frames,
+        rate,
+        preemphasis_coefficient,
+        raw_energy,
+        num_mel_bins,
+        low_freq,
+        high_freq,
+        dither,
+        peak=peak,
+    )
+    mfcc = _mfcc_from_log_mel(log_mel, log_energy, num_ceps, cepstral_lifter)
+    return log_mel.astype("float32"), mfcc, log_energy.astype("float32")
+
+
+def _equal_loudness(num_mel_bins, rate, low_freq, high_freq):
+    """Equal-loudness weights at the center frequencies of the mel bins"""
+    nyquist = 0.5 * rate
+    if high_freq <= 0:
+        high_freq += nyquist
+    mel_low = _mel_scale(low_freq)
+    mel_delta = (_mel_scale(high_freq) - mel_low) / (num_mel_bins + 1)
+    fsq = _inverse_mel_scale(mel_low + (np.arange(num_mel_bins) + 1) * mel_delta) ** 2
+    fsub = fsq / (fsq + 1.6e5)
+    return fsub * fsub * ((fsq + 1.44e6) / (fsq + 9.61e6))
+
+
+def _idft_bases(num_bases, dimension):
+    """Kaldi's basis to go from the mel spectrum to autocorrelations"""
+    angle = np.pi / (dimension - 1)
+    scale = 1.0 / (2.0 * (dimension - 1))
+    i = np.arange(num_bases)[:, None]
+    j = np.arange(dimension)[None, :]
+    bases = 2.0 * scale * np.cos(angle * i * j)
+    bases[:, 0] = scale
+    bases[:, -1] *= 0.5
+    return bases
+
+
+def _levinson_durbin(autocorr):
+    """Solves for the LPC coefficients of every frame at once.
+
+    Returns the coefficients (with Kaldi's sign convention) and the
+    energy of the residual.
+    """
+    order = autocorr.shape[-1] - 1
+    lpc = np.zeros(autocorr.shape[:-1] + (order,))
+    energy = autocorr[..., 0].copy()
+    for i in range(order):
+        k = autocorr[..., i + 1] + np.einsum(
+            "...j,...j->...", lpc[..., :i], autocorr[..., i:0:-1]
+        )
+        k /= energy
+        energy *= np.maximum(1.0 - k * k, 1.0e-5)
+        update = lpc[..., :i] - k[..., None] * lpc[..., i - 1 :: -1][..., :i]
+        lpc[..., :i] = update
+        lpc[..., i] = -k
+    return lpc, energy
+
+
+def _lpc_to_cepstrum(lpc):
+    order = lpc.shape[-1]
+    cepstrum = np.zeros(lpc.shape)
+    for i in range(order):
+        j = np.arange(i)
+        acc = np.einsum(
+            "...j,...j->...", (i - j) * lpc[..., :i], cepstrum[..., i - 1 :: -1][..., :i]
+        )
+        cepstrum[..., i] = -lpc[..., i] - acc / (i + 1)
+    return cepstrum
+
+
+def compute_plp_feats(
+    data,
+    rate=8000,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    snip_edges=True,
+    lpc_order=12,
+    compress_factor=0.33333,
+    peak=None,
+):
+    """Computes static PLPs in-process, equivalent to ``compute-plp-feats``
+
+    The framing, windowing, power spectrum and mel banks are shared with
+    :py:func:`compute_mfcc_feats`. The mel energies are then weighted by
+    an equal-loudness curve, compressed, and turned into autocorrelations
+    from which LPC coefficients are obtained with the Levinson-Durbin
+    recursion, vectorized over frames.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The audio signal, in the scale of 16-bit PCM samples. The last
+        axis is time, any leading axes (e.g. channels) are processed
+        jointly.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    lpc_order : :obj:`int`, optional
+        Order of the LPC analysis.
+    compress_factor : :obj:`float`, optional
+        Exponent of the intensity-loudness compression.
+    peak : :obj:`float`, optional
+        As in :py:func:`compute_mfcc_feats`.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The static PLPs, with C0 replaced by the log-energy (array of
+        32-bit floats with shape ``data.shape[:-1] + (frames, num_ceps)``).
+    """
+    length, shift = _window_size(rate, frame_length, frame_shift)
+    frames = _frame_signal(np.asarray(data), length, shift, snip_edges)
+    mel_energies, log_energy = _mel_energies(
+        frames,
+        rate,
+        preemphasis_coefficient,
+        raw_energy,
+        num_mel_bins,
+        low_freq,
+        high_freq,
+        dither,
+        peak=peak,
+    )
+    return _plp_from_mel_energies(
+        mel_energies,
+        log_energy,
+        rate,
+        num_ceps,
+        num_mel_bins,
+        cepstral_lifter,
+        low_freq,
+        high_freq,
+        lpc_order,
+        compress_factor,
+    )
+
+
+def _plp_from_mel_energies(
+    mel_energies,
+    log_energy,
+    rate,
+    num_ceps,
+    num_mel_bins,
+    cepstral_lifter,
+    low_freq,
+    high_freq,
+    lpc_order=12,
+    compress_factor=0.33333,
+    tables=None,
+):
+    mel_energies *= _table(
+        tables, "loudness", _equal_loudness, num_mel_bins, rate, low_freq, high_freq
+    )
+    mel_energies **= compress_factor
+    # the first and last bins are duplicated at the edges
+    mel_energies = np.concatenate(
+        [mel_energies[..., :1], mel_energies, mel_energies[..., -1:]], axis=-1
+    )
+    idft = _table(tables, "idft", _idft_bases, lpc_order + 1, num_mel_bins + 2)
+    autocorr = mel_energies @ idft.T
+
+    lpc, residual = _levinson_durbin(autocorr)
+    residual = np.maximum(residual, np.finfo(np.float32).tiny)
+    feats = np.empty(lpc.shape[:-1] + (num_ceps,))
+    feats[..., 1:] = _lpc_to_cepstrum(lpc)[..., : num_ceps - 1]
+    feats[..., 0] = np.log(residual)
+    if cepstral_lifter != 0.0:
+        feats *= _table(tables, "lifter", _lifter_coeffs, num_ceps, cepstral_lifter)
+    feats[..., 0] = log_energy
+    return feats.astype("float32")
+
+
+def _delta_scales(order, window):
+    """The regression filters of every delta order, as in Kaldi"""
+    scales = [np.ones(1)]
+    normalizer = 2.0 * np.sum(np.arange(1, window + 1) ** 2)
+    taps = np.arange(-window, window + 1) / normalizer
+    for i in range(order):
+        scales.append(np.convolve(scales[-1], taps))
+    return scales
+
+
+def _deltas_from_padded(padded, scales, num_frames):
+    """Applies ``scales`` to ``padded``, which holds ``order * window``
+    frames of context on each side of ``num_frames`` frames"""
+    context = len(scales[-1]) // 2
+    out = [padded[..., context : context + num_frames, :]]
+    for scale in scales[1:]:
+        offset = context - len(scale) // 2
+        delta = np.zeros(out[0].shape)
+        for j, s in enumerate(scale):
+            if s != 0.0:
+                delta += s * padded[..., offset + j : offset + j + num_frames, :]
+        out.append(delta)
+    return np.concatenate(out, axis=-1)
+
+
+def add_deltas(feats, order=2, window=2):
+    """Appends regression deltas in NumPy, equivalent to ``add-deltas``
+
+    Frames beyond the edges of the utterance are replaced by the first or
+    last frame, as Kaldi does.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray or list
+        A 2D feature matrix (frames x dimension), a 3D array holding a
+        batch of matrices with the same number of frames, or a list of 2D
+        matrices of any lengths.
+    order : :obj:`int`, optional
+        Order of delta computation.
+    window : :obj:`int`, optional
+        Parameter controlling window for delta computation (actual window
+        size for each delta order is 1 + 2 * ``window``).
+
+    Returns
+    -------
+    numpy.ndarray or list
+        The features with their deltas, ``order + 1`` times wider than
+        ``feats``, with the same data type (or list structure).
+    """
+    if isinstance(feats, (list, tuple)):
+        return [add_deltas(m, order, window) for m in feats]
+
+    feats = np.asarray(feats)
+    num_frames = feats.shape[-2]
+    context = order * window
+    index = np.clip(np.arange(-context, num_frames + context), 0, num_frames - 1)
+    padded = feats[..., index, :].astype("float64")
+    scales = _delta_scales(order, window)
+    return _deltas_from_padded(padded, scales, num_frames).astype(feats.dtype)
+
+
+def _cmvn_window(t, cmn_window, center, min_window, num_frames=None):
+    """First and last (excluded) frames of the CMN window of frames ``t``.
+
+    Follows ``apply-cmvn-sliding``. If ``num_frames`` is not known yet,
+    the windows are those of an utterance that goes on.
+    """
+    if center:
+        start = t - cmn_window // 2
+        end = start + cmn_window
+    else:
+        start = t - cmn_window
+        end = t + 1
+    end = np.where(start < 0, end - start, end)
+    start = np.maximum(start, 0)
+    if not center:
+        end = np.maximum(t + 1, min_window)
+    if num_frames is not None:
+        start = np.where(end > num_frames, start - (end - num_frames), start)
+        end = np.minimum(end, num_frames)
+        start = np.maximum(start, 0)
+    return start, end
+
+
+def apply_cmvn_sliding(
+    feats, cmn_window=300, center=True, min_window=100, norm_vars=False
+):
+    """Sliding-window CMVN in NumPy, equivalent to ``apply-cmvn-sliding``
+
+    The window sums are computed from cumulative sums, so the cost does not
+    depend on ``cmn_window``. Windows are truncated and shifted at the
+    edges of the utterance the same way Kaldi does.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray or list
+        A 2D feature matrix (frames x dimension), a 3D array holding a
+        batch of matrices with the same number of frames, or a list of 2D
+        matrices of any lengths.
+    cmn_window : :obj:`int`, optional
+        Window in frames for running average CMN computation.
+    center : :obj:`bool`, optional
+        If true, use a window centered on the current frame (to the extent
+        possible, modulo end effects). If false, the window precedes the
+        current frame.
+    min_window : :obj:`int`, optional
+        Minimum CMN window used at start of decoding, only applicable if
+        ``center`` is false.
+    norm_vars : :obj:`bool`, optional
+        If true, also normalize the variance.
+
+    Returns
+    -------
+    numpy.ndarray or list
+        The normalized features, with the same shape (or list structure)
+        and data type as ``feats``.
+    """
+    if isinstance(feats, (list, tuple)):
+        return [
+            apply_cmvn_sliding(m, cmn_window, center, min_window, norm_vars)
+            for m in feats
+        ]
+
+    feats = np.asarray(feats)
+    num_frames = feats.shape[-2]
+    start, end = _cmvn_window(
+        np.arange(num_frames), cmn_window, center, min_window, num_frames
+    )
+    count = (end - start)[:, None]
+
+    csum = np.zeros(feats.shape[:-2] + (num_frames + 1, feats.shape[-1]))
+    np.cumsum(feats, axis=-2, out=csum[..., 1:, :])
+    mean = (csum[..., end, :] - csum[..., start, :]) / count
+    out = feats - mean
+    if norm_vars:
+        np.cumsum(np.square(feats, dtype="float64"), axis=-2, out=csum[..., 1:, :])
+        variance = (csum[..., end, :] - csum[..., start, :]) / count - mean ** 2
+        out /= np.sqrt(np.maximum(variance, 1.0e-10))
+    return out.astype(feats.dtype)
+
+
+def compute_cmvn_stats(feats):
+    """Accumulates CMVN statistics in NumPy, as ``compute-cmvn-stats``
+
+    Parameters
+    ----------
+    feats : numpy.ndarray or list
+        A 2D feature matrix, or a list of matrices (e.g. all utterances of
+        a speaker) accumulated together.
+
+    Returns
+    -------
+    numpy.ndarray
+        The statistics in Kaldi's layout, a 2 x (dimension + 1) array of
+        64-bit floats: the sums of the features followed by the frame
+        count, then the sums of the squared features followed by zero.
+        They can be written with :py:func:`bob.kaldi.io.write_mat` for
+        use with ``apply-cmvn``.
+    """
+    if not isinstance(feats, (list, tuple)):
+        feats = [feats]
+    dim = np.shape(feats[0])[-1]
+    stats = np.zeros((2, dim + 1))
+    for mat in feats:
+        mat = np.asarray(mat, dtype="float64")
+        stats[0, :dim] += mat.sum(axis=0)
+        stats[1, :dim] += np.einsum("ij,ij->j", mat, mat)
+        stats[0, dim] += mat.shape[0]
+    return stats
+
+
+def apply_cmvn(feats, stats=None, norm_means=True, norm_vars=False):
+    """Applies CMVN in NumPy, as ``apply-cmvn``
+
+    Parameters
+    ----------
+    feats : numpy.ndarray or list
+        A 2D feature matrix, or a list of matrices.
+    stats : :obj:`numpy.ndarray`, optional
+        Statistics from :py:func:`compute_cmvn_stats`. If not given, each
+        matrix is normalized with its own statistics.
+    norm_means : :obj:`bool`, optional
+        If false, the features are returned as they are.
+    norm_vars : :obj:`bool`, optional
+        If true, also normalize the variance.
+
+    Returns
+    -------
+    numpy.ndarray or list
+        The normalized features, with the same data type (or list
+        structure) as ``feats``.
+    """
+    if isinstance(feats, (list, tuple)):
+        return [apply_cmvn(m, stats, norm_means, norm_vars) for m in feats]
+
+    if norm_vars and not norm_means:
+        raise ValueError("You cannot normalize the variance but not the mean.")
+    feats = np.asarray(feats)
+    if not norm_means:
+        return feats
+    if stats is None:
+        stats = compute_cmvn_stats(feats)
+    count = stats[0, -1]
+    if count < 1.0:
+        raise ValueError("Insufficient CMVN statistics: count is %s" % count)
+    mean = stats[0, :-1] / count
+    if not norm_vars:
+        return (feats - mean).astype(feats.dtype)
+    variance = np.maximum(stats[1, :-1] / count - mean ** 2, 1.0e-20)
+    scale = 1.0 / np.sqrt(variance)
+    return (feats * scale - mean * scale).astype(feats.dtype)
+
+
+def compute_vad_from_feats(
+    feats,
+    vad_energy_mean_scale=0.5,
+    vad_energy_th=5,
+    vad_frames_context=0,
+    vad_proportion_th=0.6,
+):
+    """Energy-based VAD in NumPy, equivalent to ``compute-vad``
+
+    Parameters
+    ----------
+    feats : numpy.ndarray or list
+        A 2D feature matrix, with log-energy (or C0) in its first column,
+        as computed by :py:func:`bob.kaldi.mfcc` without normalization, or
+        a list of such matrices. The frames of all matrices of a list are
+        processed together, with a threshold and context windows of their
+        own.
+    vad_energy_mean_scale : :obj:`float`, optional
+        If this is set to s, to get the actual threshold we let m be the mean
+        log-energy of the file, and use s*m + vad-energy-th
+    vad_energy_th : :obj:`float`, optional
+        Constant term in energy threshold for MFCC0 for VAD.
+    vad_frames_context : :obj:`int`, optional
+        Number of frames of context on each side of central frame,
+        in window for which energy is monitored
+    vad_proportion_th : :obj:`float`, optional
+        Parameter controlling the proportion of frames within the window that
+        need to have more energy than the threshold
+
+    Returns
+    -------
+    numpy.ndarray or list
+        The labels [1/0] of voiced features (1D array of 32-bit floats), or
+        a list of them.
+    """
+    if not isinstance(feats, (list, tuple)):
+        return compute_vad_from_feats(
+            [feats],
+            vad_energy_mean_scale,
+            vad_energy_th,
+            vad_frames_context,
+            vad_proportion_th,
+        )[0]
+    if not feats:
+        return []
+
+    energies = [np.asarray(f, dtype="float32")[:, 0] for f in feats]
+    lengths = np.array([e.shape[0] for e in energies], dtype="int64")
+    thresholds = np.full(len(energies), vad_energy_th, dtype="float32")
+    if vad_energy_mean_scale != 0.0:
+        means = [e.mean(dtype="float64") if e.size else 0.0 for e in energies]
+        thresholds += np.float32(vad_energy_mean_scale) * np.float32(means)
+    log_energy = np.concatenate(energies + [np.zeros(0, dtype="float32")])
+    num_frames = log_energy.shape[0]
+
+    # count the frames above the threshold in every context window, which
+    # stops at the edges of its utterance
+    above = np.zeros(num_frames + 1, dtype="int64")
+    np.cumsum(log_energy > np.repeat(thresholds, lengths), out=above[1:])
+    ends = np.cumsum(lengths)
+    t = np.arange(num_frames)
+    start = np.maximum(t - vad_frames_context, np.repeat(ends - lengths, lengths))
+    end = np.minimum(t + vad_frames_context + 1, np.repeat(ends, lengths))
+    num = above[end] - above[start]
+    den = (end - start).astype("float32")
+    voiced = (num >= den * np.float32(vad_proportion_th)).astype("float32")
+    return np.split(voiced, ends[:-1])
+
+
+def _diag_gmm_weights(gmm):
+    """The matrix mapping ``[x, x*x]`` frames to the log-likelihoods of the
+    Gaussians of ``gmm``, without the gconsts"""
+    return np.vstack([gmm.means_invvars.T, -0.5 * gmm.inv_vars.T]).astype("float32")
+
+
+def _gaussian_likes(feats, weights, gconsts):
+    """The log-likelihoods of the frames of ``feats`` for every Gaussian,
+    as Kaldi's ``DiagGmm::LogLikelihoods``"""
+    loglikes = np.hstack([feats, feats * feats]).dot(weights)
+    loglikes += gconsts
+    return loglikes
+
+
+def _log_sum_exp(loglikes):
+    peak = loglikes.max(axis=1)
+    return peak + np.log(np.exp(loglikes - peak[:, None]).sum(axis=1))
+
+
+def _selected_likes(feats, weights, gconsts, gselect):
+    """The log-likelihoods of the frames of ``feats`` for the Gaussians
+    selected in ``gselect`` only, as Kaldi's
+    ``DiagGmm::LogLikelihoodsPreselect``"""
+    loglikes = np.einsum(
+        "td,dtn->tn", np.hstack([feats, feats * feats]), weights[:, gselect]
+    )
+    loglikes += gconsts[gselect]
+    return loglikes
+
+
+def gmm_gselect(feats, gmm, num_gselect=10, chunk_size=1024):
+    """Selects the most likely Gaussians of every frame for a diagonal GMM,
+    as ``gmm-gselect``.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 2D feature matrix.
+    gmm : :py:class:`bob.kaldi.DiagGmm`
+        The model, usually the UBM.
+    num_gselect : :obj:`int`, optional
+        The number of Gaussians selected for every frame.
+    chunk_size : :obj:`int`, optional
+        The number of frames processed at once.
+
+    Returns
+    -------
+    numpy.ndarray
+        The indices of the selected Gaussians, one row per frame, the
+        most likely first (2D array of 32-bit ints).
+    """
+    feats = np.asarray(feats, dtype="float32")
+    weights = _diag_gmm_weights(gmm)
+    gconsts = gmm.gconsts.astype("float32")
+    num_gselect = min(num_gselect, gmm.num_gauss)
+    gselect = np.empty((feats.shape[0], num_gselect), dtype="int32")
+    for start in range(0, feats.shape[0], chunk_size):
+        chunk = feats[start : start + chunk_size]
+        loglikes = _gaussian_likes(chunk, weights, gconsts)
+        best = np.argpartition(-loglikes, num_gselect - 1, axis=1)
+        best = best[:, :num_gselect]
+        order = np.argsort(-np.take_along_axis(loglikes, best, axis=1), axis=1)
+        gselect[start : start + chunk_size] = np.take_along_axis(best, order, axis=1)
+    return gselect
+
+
+def gmm_frame_likes(feats, gmm, chunk_size=1024, gselect=None):
+    """Computes the log-likelihood of every frame for a diagonal GMM, as
+    ``gmm-global-get-frame-likes``.
+
+    The log-likelihoods of the Gaussians are computed with one matrix
+    product in 32-bit floats, ``chunk_size`` frames at a time. With
+    ``gselect``, only the selected Gaussians of every frame are computed.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 2D feature matrix.
+    gmm : :py:class:`bob.kaldi.DiagGmm`
+        The model.
+    chunk_size : :obj:`int`, optional
+        The number of frames scored at once, which bounds the memory used
+        for the log-likelihoods of the Gaussians.
+    gselect : :obj:`numpy.ndarray`, optional
+        The Gaussians to compute for every frame, as returned by
+        :py:func:`gmm_gselect`, e.g. for the UBM of ``gmm``.
+
+    Returns
+    -------
+    numpy.ndarray
+        The log-likelihood of every frame (1D array of 32-bit floats).
+    """
+    feats = np.asarray(feats, dtype="float32")
+    weights = _diag_gmm_weights(gmm)
+    gconsts = gmm.gconsts.astype("float32")
+    likes = np.empty(feats.shape[0], dtype="float32")
+    for start in range(0, feats.shape[0], chunk_size):
+        chunk = feats[start : start + chunk_size]
+        if gselect is None:
+            loglikes = _gaussian_likes(chunk, weights, gconsts)
+        else:
+            chunk_gselect = gselect[start : start + chunk_size]
+            loglikes = _selected_likes(chunk, weights, gconsts, chunk_gselect)
+        likes[start : start + chunk_size] = _log_sum_exp(loglikes)
+    return likes
+
+
+def gmm_stats(feats, gmm, chunk_size=1024):
+    """Accumulates the zeroth and first-order statistics of the frames for
+    a diagonal GMM, as ``gmm-global-acc-stats``.
+
+    Parameters
+    ----------
+    feats : numpy.ndarray
+        A 2D feature matrix.
+    gmm : :py:class:`bob.kaldi.DiagGmm`
+        The model, usually the UBM.
+    chunk_size : :obj:`int`, optional
+        The number of frames processed at once.
+
+    Returns
+    -------
+    zeroth : numpy.ndarray
+        The sum of the posteriors of every Gaussian (1D array of 64-bit
+        floats).
+    first : numpy.ndarray
+        The sum of the frames weighted by the posteriors of every Gaussian
+        (2D array of 64-bit floats, one row per Gaussian).
+    """
+    feats = np.asarray(feats, dtype="float32")
+    weights = _diag_gmm_weights(gmm)
+    gconsts = gmm.gconsts.astype("float32")
+    zeroth = np.zeros(gmm.num_gauss)
+    first = np.zeros((gmm.num_gauss, feats.shape[1]))
+    for start in range(0, feats.shape[0], chunk_size):
+        chunk = feats[start : start + chunk_size]
+        loglikes = _gaussian_likes(chunk, weights, gconsts)
+        posts = np.exp(loglikes - _log_sum_exp(loglikes)[:, None])
+        posts = posts.astype("float64")
+        zeroth += posts.sum(axis=0)
+        first += posts.T.dot(chunk.astype("float64"))
+    return zeroth, first
+
+
+def mfcc(data, rate=8000, **kwargs):
+    """Computes MFCCs with deltas and sliding CMN entirely in NumPy.
+
+    This is the in-process equivalent of the ``compute-mfcc-feats |
+    add-deltas | apply-cmvn-sliding`` pipeline run by
+    :py:func:`bob.kaldi.mfcc`.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        A 1D numpy ndarray object containing 64-bit float
+        numbers with the audio signal, normalized between [-1, 1], or an
+        integer array of 16-bit PCM samples.
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    **kwargs
+        Options passed to :py:func:`compute_mfcc_feats`.
+
+    Returns
+    -------
+    numpy.ndarray
+        The MFCCs calculated for the input signal (2D array of
+        32-bit floats).
+    """
+    kwargs.setdefault("peak", _pcm_peak(data))
+    feats = compute_mfcc_feats(data, rate, **kwargs)
+    return apply_cmvn_sliding(add_deltas(feats))
+
+
+def cepstral(
+    data,
+    cepstral_type,
+    rate=8000,
+    delta_order=2,
+    cmvn_stats=None,
+    norm_means=True,
+    norm_vars=False,
+    **kwargs
+):
+    """Computes MFCCs, PLPs or filterbanks with per-utterance CMN and deltas
+    in NumPy.
+
+    This is the in-process equivalent of ``compute-mfcc-feats`` (or
+    ``compute-plp-feats``, ``compute-fbank-feats``) followed by
+    ``compute-cmvn-stats``, ``apply-cmvn`` and ``add-deltas``.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        A 1D numpy ndarray object containing 64-bit float
+        numbers with the audio signal, normalized between [-1, 1], or an
+        integer array of 16-bit PCM samples.
+    cepstral_type : str
+        The type of cepstral features: mfcc, plp or fbank
+    rate : float
+        The sampling rate of the input signal in ``data``.
+    delta_order : :obj:`int`, optional
+        Order of the deltas appended to the features.
+    cmvn_stats : :obj:`numpy.ndarray`, optional
+        CMVN statistics (e.g. of a speaker) used instead of the statistics
+        of the utterance, see :py:func:`compute_cmvn_stats`.
+    norm_means : :obj:`bool`, optional
+        If false, no CMVN is applied.
+    norm_vars : :obj:`bool`, optional
+        If true, also normalize the variance.
+    **kwargs
+        Options passed to :py:func:`compute_mfcc_feats` or
+        :py:func:`compute_plp_feats`.
+
+    Returns
+    -------
+    numpy.ndarray
+        The cepstral features calculated for the input signal (2D
+        array of 32-bit floats).
+    """
+    if cepstral_type == "fbank":
+        for option in ("num_ceps", "cepstral_lifter"):
+            kwargs.pop(option, None)
+    compute = {
+        "mfcc": compute_mfcc_feats,
+        "plp": compute_plp_feats,
+        "fbank": compute_fbank_feats,
+    }[cepstral_type]
+    kwargs.setdefault("peak", _pcm_peak(data))
+    feats = compute(data, rate, **kwargs)
+    return add_deltas(apply_cmvn(feats, cmvn_stats, norm_means, norm_vars), delta_order)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import logging
+
+import numpy as np
+
+from . import io
+from . import native
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineMfcc(object):
+    """Computes MFCCs with deltas and sliding CMN on chunked audio.
+
+    Samples are fed with :py:meth:`accept_waveform` as they arrive, and
+    :py:meth:`get_frames` returns the feature vectors that can be computed
+    so far. The remainder of the signal that does not fill a frame, the
+    context needed for the deltas and the CMN window are kept between
+    calls, so the output is identical to processing the whole signal at
+    once with ``compute-mfcc-feats | add-deltas | apply-cmvn-sliding``.
+
+    With the default ``center=False`` and ``min_window=1`` the CMN only
+    looks at past frames and features are delayed by ``delta_order *
+    delta_window`` frames only. With ``center=True`` the result matches
+    :py:func:`bob.kaldi.mfcc`, at the cost of ``cmn_window / 2`` frames of
+    latency.
+
+    Parameters
+    ----------
+    rate : float
+        The sampling rate of the input signal.
+    cmn_window : :obj:`int`, optional
+        Number of frames of the CMN window.
+    center : :obj:`bool`, optional
+        If true, the CMN window is centered on the current frame.
+    min_window : :obj:`int`, optional
+        Minimum CMN window used at the start of the signal, if ``center``
+        is false (adds latency only at the start).
+    delta_order : :obj:`int`, optional
+        Order of the deltas appended to the static features.
+    delta_window : :obj:`int`, optional
+        Half-width of the delta regression window.
+    **kwargs
+        MFCC options, as in :py:func:`bob.kaldi.mfcc`. Only
+        ``snip_edges=True`` is supported.
+    """
+
+    def __init__(
+        self,
+        rate=8000,
+        cmn_window=300,
+        center=False,
+        min_window=1,
+        delta_order=2,
+        delta_window=2,
+        preemphasis_coefficient=0.97,
+        raw_energy=True,
+        frame_length=25,
+        frame_shift=10,
+        num_ceps=13,
+        num_mel_bins=23,
+        cepstral_lifter=22,
+        low_freq=20,
+        high_freq=0,
+        dither=1.0,
+        snip_edges=True,
+    ):
+        if not snip_edges:
+            raise ValueError("OnlineMfcc only supports snip_edges=True")
+        self.rate = rate
+        self.cmn_window = cmn_window
+        self.center = center
+        self.min_window = min_window
+        self.options = dict(
+            preemphasis_coefficient=preemphasis_coefficient,
+            raw_energy=raw_energy,
+            num_ceps=num_ceps,
+            num_mel_bins=num_mel_bins,
+            cepstral_lifter=cepstral_lifter,
+            low_freq=low_freq,
+            high_freq=high_freq,
+            dither=dither,
+        )
+        self._length, self._shift = native._window_size(
+            rate, frame_length, frame_shift
+        )
+        self._tables = native._front_end_tables(
+            rate,
+            self._length,
+            num_mel_bins,
+            low_freq,
+            high_freq,
+            num_ceps,
+            cepstral_lifter,
+        )
+        self._scales = native._delta_scales(delta_order, delta_window)
+        self._context = delta_order * delta_window
+        self.dim = num_ceps * (delta_order + 1)
+        self.reset()
+
+    def reset(self):
+        """Starts a new utterance"""
+        self._waveform = np.zeros(0)
+        self._finished = False
+        # static features, from frame _static_start on
+        self._statics = np.zeros((0, self.options["num_ceps"]), dtype="float32")
+        self._static_start = 0
+        self._num_statics = 0
+        # features with deltas, from frame _delta_start on
+        self._deltas = np.zeros((0, self.dim))
+        self._delta_start = 0
+        self._num_deltas = 0
+        # number of frames returned so far
+        self._num_output = 0
+
+    def accept_waveform(self, data):
+        """Appends samples to the signal.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            A 1D array with the next samples, either normalized between
+            [-1, 1] or 16-bit integer PCM.
+        """
+        if self._finished:
+            raise RuntimeError("accept_waveform() called after input_finished()")
+        waveform = np.concatenate([self._waveform, native._to_pcm_scale(data)])
+        num_frames = native._num_frames(
+            waveform.size, self._length, self._shift, True
+        )
+        if num_frames > 0:
+            frames = native._frame_signal(waveform, self._length, self._shift)
+            statics = native._mfcc_from_frames(
+                frames,
+                self.rate,
+                first_frame=self._num_statics,
+                tables=self._tables,
+                **self.options
+            )
+            self._statics = np.concatenate([self._statics, statics])
+            self._num_statics += num_frames
+            waveform = waveform[num_frames * self._shift :]
+        self._waveform = waveform
+
+    def input_finished(self):
+        """Tells that no more samples will come, so the last frames can be
+        computed using edge replication"""
+        self._finished = True
+
+    def _compute_deltas(self):
+        # frames [begin, end) can get their deltas now
+        begin = self._num_deltas
+        end = self._num_statics
+        if not self._finished:
+            end -= self._context
+        if end <= begin:
+            return
+        index = np.arange(begin - self._context, end + self._context)
+        index = np.clip(index, 0, self._num_statics - 1) - self._static_start
+        padded = self._statics[index].astype("float64")
+        deltas = native._deltas_from_padded(padded, self._scales, end - begin)
+        self._deltas = np.concatenate([self._deltas, deltas])
+        self._num_deltas = end
+
+        # keep the context of the next frames only
+        drop = max(0, end - self._context - self._static_start)
+        self._statics = self._statics[drop:]
+        self._static_start += drop
+
+    def get_frames(self):
+        """Returns the feature vectors that became available.
+
+        Returns
+        -------
+        numpy.ndarray
+            The new features (2D array of 32-bit floats), possibly with no
+            rows.
+        """
+        self._compute_deltas()
+        num_frames = self._num_deltas if self._finished else None
+        t = np.arange(self._num_output, self._num_deltas)
+        start, end = native._cmvn_window(
+            t, self.cmn_window, self.center, self.min_window, num_frames
+        )
+        ready = end <= self._num_deltas
+        if not self._finished and not ready.all():
+            # the windows only grow with t
+            t, start, end = t[ready], start[ready], end[ready]
+        if t.size == 0:
+            return np.zeros((0, self.dim), dtype="float32")
+
+        csum = np.zeros((self._deltas.shape[0] + 1, self.dim))
+        np.cumsum(self._deltas, axis=0, out=csum[1:])
+        offset = self._delta_start
+        mean = (csum[end - offset] - csum[start - offset]) / (end - start)[:, None]
+        feats = self._deltas[t - offset] - mean
+        self._num_output = t[-1] + 1
+
+        # keep the frames the next windows may still cover
+        keep_from = self._num_output - self.cmn_window - 1
+        drop = max(0, keep_from - self._delta_start)
+        self._deltas = self._deltas[drop:]
+        self._delta_start += drop
+        return feats.astype("float32")
+
+
+def mfcc_chunked(
+    source,
+    rate=8000,
+    channel=0,
+    block_size=1 << 19,
+    preemphasis_coefficient=0.97,
+    raw_energy=True,
+    frame_length=25,
+    frame_shift=10,
+    num_ceps=13,
+    num_mel_bins=23,
+    cepstral_lifter=22,
+    low_freq=20,
+    high_freq=0,
+    dither=1.0,
+    normalization=False,
+):
+    """Computes the MFCCs of a long recording block by block.
+
+    The audio is read and processed ``block_size`` samples at a time with
+    :py:class:`bob.kaldi.OnlineMfcc`, which keeps the partial frames, the
+    delta context and the CMN window across blocks. The concatenated
+    chunks are therefore the features :py:func:`bob.kaldi.mfcc` computes
+    with the native backend, while the memory used does not depend on the
+    length of the recording.
+
+    Parameters
+    ----------
+    source : numpy.ndarray or str or iterable
+        A 1D array with the samples, either normalized between [-1, 1] or
+        integer PCM, the path to a PCM WAV or NIST Sphere file, or an
+        iterable of 1D arrays with consecutive blocks of samples.
+    rate : float
+        The sampling rate of the input signal. Ignored for audio files,
+        which give their own.
+    channel : :obj:`int`, optional
+        The audio channel to read from inside audio files.
+    block_size : :obj:`int`, optional
+        Number of samples read and processed at a time.
+    normalization : :obj:`bool`, optional
+        If true, the samples are normalized to [-1, 1]. This needs a first
+        pass over arrays and audio files and is not possible for iterables.
+
+    See :py:func:`bob.kaldi.mfcc` for the remaining parameters. Only
+    ``snip_edges=True`` is supported.
+
+    Yields
+    ------
+    numpy.ndarray
+        Consecutive chunks of MFCCs (2D arrays of 32-bit floats).
+
+    """
+
+    if isinstance(source, str):
+        # blocks are views on the memory mapped file
+        data, rate = io.read_audio(source)
+        source = data[channel]
+
+    if isinstance(source, np.ndarray):
+
+        def blocks():
+            for start in range(0, source.shape[0], block_size):
+                yield source[start : start + block_size]
+
+    else:
+        if normalization:
+            raise ValueError("Iterables of blocks cannot be normalized")
+
+        def blocks():
+            return iter(source)
+
+    peak = None
+    if normalization:
+        peak = max(native._peak(block) for block in blocks())
+
+    online = OnlineMfcc(
+        rate,
+        center=True,
+        preemphasis_coefficient=preemphasis_coefficient,
+        raw_energy=raw_energy,
+        frame_length=frame_length,
+        frame_shift=frame_shift,
+        num_ceps=num_ceps,
+        num_mel_bins=num_mel_bins,
+        cepstral_lifter=cepstral_lifter,
+        low_freq=low_freq,
+        high_freq=high_freq,
+        dither=dither,
+    )
+    for block in blocks():
+        online.accept_waveform(native._to_pcm_scale(block, peak))
+        feats = online.get_frames()
+        if len(feats):
+            yield feats
+    online.input_finished()
+    feats = online.get_frames()
+    if len(feats):
+        yield feats
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+"""Runs chains of Kaldi binaries connected by pipes.
+
+The input of a chain is written from a separate thread while its output
+is read, and the logs of all binaries go to a temporary file, so no pipe
+can fill up and block a binary, whatever the size of the data.
+"""
+
+import logging
+import signal
+import tempfile
+import threading
+from subprocess import PIPE
+from subprocess import Popen
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_SIZE = 1 << 16
+
+
+class _Feeder(threading.Thread):
+    """Writes the input of a chain with ``write``, then closes it, or only
+    flushes it if ``close`` is false"""
+
+    def __init__(self, stdin, write, close=True):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stdin = stdin
+        self.write = write
+        self.close = close
+        self.error = None
+
+    def run(self):
+        try:
+            if self.write is not None:
+                self.write(self.stdin)
+        except BrokenPipeError:
+            logger.debug("Kaldi pipeline exited before reading all input")
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                if self.close:
+                    self.stdin.close()
+                else:
+                    self.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                pass
+
+
+def _start(cmds, logfile):
+    """Starts the binaries of ``cmds``, each one reading the output of the
+    previous one"""
+
+    pipes = []
+    for cmd in cmds:
+        stdin = pipes[-1].stdout if pipes else PIPE
+        pipes.append(Popen(cmd, stdin=stdin, stdout=PIPE, stderr=logfile))
+        if len(pipes) > 1:
+            # only the next binary may hold the pipe, so it gets SIGPIPE
+            # if its reader exits
+            pipes[-2].stdout.close()
+    return pipes
+
+
+def _stop(pipes, feeder, logfile):
+    """Waits for a chain to finish and logs its output"""
+
+    pipes[-1].stdout.close()
+    feeder.join()
+    for pipe in pipes:
+        pipe.wait()
+    logfile.seek(0)
+    logtxt = logfile.read().decode("utf-8", "replace")
+    if logtxt:
+        logger.debug("%s", logtxt)
+
+
+def _check(cmds, pipes, feeder):
+    """Raises the error of the writer or of the first binary that failed
+    on its own, rather than because its output was closed"""
+
+    if feeder.error is not None:
+        raise feeder.error
+    failed = [
+        (cmd, pipe.returncode)
+        for cmd, pipe in zip(cmds, pipes)
+        if pipe.returncode != 0
+    ]
+    if not failed:
+        return
+    cmd, code = next(
+        (f for f in failed if f[1] != -signal.SIGPIPE),
+        failed[0],
+    )
+    raise RuntimeError("`%s' failed with exit code %d" % (" ".join(cmd), code))
+
+
+def first(read_ark):
+    """Makes a reader returning the value of the first record of an
+    archive, read with ``read_ark``, e.g. :py:func:`bob.kaldi.io.read_mat_ark`"""
+
+    def read(fd):
+        for _, value in read_ark(fd):
+            return value
+        raise RuntimeError("Kaldi pipeline returned no output")
+
+    return read
+
+
+def run(cmds, write=None, read=None):
+    """Runs a chain of Kaldi binaries to completion.
+
+    Parameters
+    ----------
+    cmds : list
+        The command lines of the binaries. The standard output of each
+        binary is connected to the standard input of the next.
+    write : :obj:`callable`, optional
+        Called from a separate thread with the standard input of the first
+        binary, to write the input of the chain. If not given, the input
+        is empty.
+    read : :obj:`callable`, optional
+        Called with the standard output of the last binary, returns the
+        result. The output left unread is discarded.
+
+    Returns
+    -------
+    object
+        What ``read`` returned, or the whole output of the chain as bytes
+        if ``read`` is not given.
+
+    Raises
+    ------
+    RuntimeError
+        If a binary exited with an error.
+    """
+
+    with tempfile.TemporaryFile() as logfile:
+        pipes = _start(cmds, logfile)
+        feeder = _Feeder(pipes[0].stdin, write)
+        feeder.start()
+        stdout = pipes[-1].stdout
+        try:
+            if read is None:
+                ret = stdout.read()
+            else:
+                ret = read(stdout)
+                while stdout.read(_BLOCK_SIZE):
+                    pass
+        finally:
+            _stop(pipes, feeder, logfile)
+        _check(cmds, pipes, feeder)
+        return ret
+
+
+def stream(cmds, write, read):
+    """Runs a chain of Kaldi binaries, yielding its output as it comes.
+
+    Parameters
+    ----------
+    cmds : list
+        The command lines of the binaries, as in :py:func:`run`.
+    write : callable
+        Called from a separate thread with the standard input of the first
+        binary, to write the input of the chain.
+    read : callable
+        Called with the standard output of the last binary, returns an
+        iterator over the output records, e.g.
+        :py:func:`bob.kaldi.io.read_mat_ark`.
+
+    Yields
+    ------
+    object
+        The records of the output. If the generator is closed early, the
+        binaries are stopped and their exit codes are not checked.
+
+    Raises
+    ------
+    RuntimeError
+        If a binary exited with an error.
+    """
+
+    with tempfile.TemporaryFile() as logfile:
+        pipes = _start(cmds, logfile)
+        feeder = _Feeder(pipes[0].stdin, write)
+        feeder.start()
+        try:
+            for record in read(pipes[-1].stdout):
+                yield record
+        finally:
+            _stop(pipes, feeder, logfile)
+        _check(cmds, pipes, feeder)
@@ -5,6 +5,8 @@
 
 """Tests for Kaldi bindings"""
 
+import asyncio
+
 import numpy as np
 import pkg_resources
 
@@ -39,6 +41,10 @@ def test_forward_pass():
 
     np.testing.assert_allclose(ours, theirs, 1e-03, 1e-05)
 
+    # the same, as a coroutine
+    ours = asyncio.run(bob.kaldi.annet_forward(feats, dnn, trn))
+    np.testing.assert_allclose(ours, theirs, 1e-03, 1e-05)
+
 
 def test_compute_dnn_vad():
 
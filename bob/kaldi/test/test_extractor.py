@@ -5,6 +5,9 @@
 
 """Tests for Kaldi bindings"""
 
+import os
+import tempfile
+
 import numpy as np
 import pkg_resources
 
@@ -27,6 +30,122 @@ def test_mfcc():
     np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
 
 
+def test_mfcc_native():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+
+    ours = bob.kaldi.mfcc(
+        data.load()[0], data.rate, normalization=False, backend="native"
+    )
+    theirs = np.loadtxt(reference)
+
+    assert ours.shape == theirs.shape
+
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+    bob.kaldi.set_backend("native")
+    try:
+        ours = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    finally:
+        bob.kaldi.set_backend("kaldi")
+
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+
+def test_mfcc_int16():
+
+    import io
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    pcm = (data.load()[0] * 32768).astype("int16")
+    theirs = np.loadtxt(reference)
+
+    for backend in ("kaldi", "native"):
+        ours = bob.kaldi.mfcc(pcm, data.rate, normalization=False, backend=backend)
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+        # integer samples are not modified by the normalization
+        ours = bob.kaldi.mfcc(pcm, data.rate, backend=backend)
+        theirs_norm = bob.kaldi.mfcc(data.load()[0], data.rate, backend=backend)
+        np.testing.assert_allclose(ours, theirs_norm, 1e-05, 1e-05)
+        assert pcm.dtype == "int16"
+
+        # nor are float samples, which are scaled as they are framed
+        signal = data.load()[0]
+        original = signal.copy()
+        ours = bob.kaldi.mfcc(signal, data.rate, backend=backend)
+        np.testing.assert_allclose(ours, theirs_norm, 1e-05, 1e-05)
+        np.testing.assert_array_equal(signal, original)
+
+        # other integer widths are rescaled to 16 bits
+        wide = pcm.astype("int32") << 16
+        ours = bob.kaldi.mfcc(wide, data.rate, normalization=False, backend=backend)
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+        try:
+            bob.kaldi.mfcc(wide.astype("uint32"), data.rate, backend=backend)
+        except ValueError:
+            pass
+        else:
+            assert False, "unsigned samples were accepted"
+
+    samples = np.array([32767, -32768, 100], dtype="int16")
+    ours, theirs = io.BytesIO(), io.BytesIO()
+    bob.kaldi.io.write_wav(ours, samples.astype("int32") << 16, 16000)
+    bob.kaldi.io.write_wav(theirs, samples, 16000)
+    assert ours.getvalue() == theirs.getvalue()
+
+
+def test_online_mfcc():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    signal = data.load()[0]
+    theirs = np.loadtxt(reference)
+
+    # a centered CMN window reproduces the offline features
+    online = bob.kaldi.OnlineMfcc(data.rate, center=True)
+    chunks = []
+    for start in range(0, signal.size, 1600):
+        online.accept_waveform(signal[start : start + 1600])
+        chunks.append(online.get_frames())
+    online.input_finished()
+    chunks.append(online.get_frames())
+    ours = np.vstack(chunks)
+
+    assert ours.shape == theirs.shape
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+    # the causal CMN only delays the output by the delta context
+    online = bob.kaldi.OnlineMfcc(data.rate)
+    online.accept_waveform(signal[:16000])
+    assert online.get_frames().shape == (98 - 4, 39)
+
+
+def test_mfcc_chunked():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    theirs = np.loadtxt(reference)
+
+    # blocks do not need to match frames
+    chunks = list(bob.kaldi.mfcc_chunked(data.load()[0], data.rate, block_size=777))
+    assert len(chunks) > 1
+    np.testing.assert_allclose(np.vstack(chunks), theirs, 1e-02, 1e-02)
+
+    ours = np.vstack(list(bob.kaldi.mfcc_chunked(sample, block_size=4096)))
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+
 def test_mfcc_from_path():
 
     sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
@@ -40,6 +159,263 @@ def test_mfcc_from_path():
     np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
 
 
+def test_mfcc_from_path_channels():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    for backend in ("kaldi", "native"):
+        ours = bob.kaldi.mfcc_from_path(sample, channel="all", backend=backend)
+        assert ours.shape == (2, 317, 39)
+        for channel in (0, 1):
+            theirs = bob.kaldi.mfcc_from_path(sample, channel=channel, backend=backend)
+            np.testing.assert_allclose(ours[channel], theirs, 1e-02, 1e-02)
+
+        ours = bob.kaldi.mfcc_from_path(sample, channel=[1], backend=backend)
+        assert ours.shape == (1, 317, 39)
+
+
+def test_read_audio():
+
+    import struct
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data, rate = bob.kaldi.io.read_audio(sample)
+    assert data.shape == (2, 51020) and rate == 16000
+    np.testing.assert_allclose(data / 32768.0, bob.io.audio.reader(sample).load())
+
+    # the same samples in a big-endian NIST Sphere file
+    header = (
+        "NIST_1A\n   1024\nsample_rate -i 16000\nchannel_count -i 2\n"
+        "sample_n_bytes -i 2\nsample_byte_format -s2 10\n"
+        "sample_coding -s3 pcm\nsample_count -i 51020\nend_head\n"
+    )
+    with tempfile.NamedTemporaryFile(suffix=".sph") as fd:
+        fd.write(header.encode("ascii").ljust(1024))
+        fd.write(data.T.astype(">i2").tobytes())
+        fd.flush()
+
+        sphere, rate = bob.kaldi.io.read_audio(fd.name)
+        np.testing.assert_array_equal(sphere, data)
+
+        ours = dict(bob.kaldi.mfcc_from_paths([fd.name], backend="native"))[fd.name]
+        theirs = np.loadtxt(reference)
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+    # 32-bit samples cannot be memory mapped as 16-bit ones
+    with tempfile.NamedTemporaryFile(suffix=".wav") as fd:
+        fd.write(b"RIFF" + struct.pack("<I", 36 + 8) + b"WAVE")
+        fd.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 64000, 4, 32))
+        fd.write(b"data" + struct.pack("<I", 8))
+        fd.write(np.array([40000, -70000], dtype="<i4").tobytes())
+        fd.flush()
+
+        try:
+            bob.kaldi.io.read_audio(fd.name)
+        except ValueError as e:
+            assert "16-bit" in str(e)
+        else:
+            assert False, "32-bit samples were accepted"
+
+
+def test_mfcc_from_segments():
+
+    import struct
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample).load()
+    segments = [
+        ("seg1", "reco", 0.0, 2.0),
+        ("seg2", "reco", 0.5, 3.0, 1),
+        ("seg3", "reco", 1.0, 1.01),  # shorter than a frame
+        ("seg4", "reco", 2.5, -1),
+    ]
+    samples = [data[0][:32000], data[1][8000:48000], None, data[0][40000:]]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".scp") as fd:
+        fd.write("reco %s\n" % sample)
+        fd.flush()
+
+        for backend in ("kaldi", "native"):
+            ours = list(
+                bob.kaldi.mfcc_from_segments(fd.name, segments, backend=backend)
+            )
+            assert [utt for utt, _ in ours] == ["seg1", "seg2", "seg4"]
+            for (_, feats), signal in zip(ours, samples[:2] + samples[3:]):
+                theirs = bob.kaldi.mfcc(
+                    signal, 16000, normalization=False, backend=backend
+                )
+                np.testing.assert_allclose(feats, theirs, 1e-02, 1e-02)
+
+    # a 32-bit recording is refused, and not wrapped to 16 bits
+    with tempfile.NamedTemporaryFile(suffix=".wav") as fd:
+        fd.write(b"RIFF" + struct.pack("<I", 36 + 8) + b"WAVE")
+        fd.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 64000, 4, 32))
+        fd.write(b"data" + struct.pack("<I", 8))
+        fd.write(np.array([40000, -70000], dtype="<i4").tobytes())
+        fd.flush()
+
+        wav_scp = {"reco": sample, "wide": fd.name}
+        wide = segments + [("seg5", "wide", 0.0, -1)]
+        for backend in ("kaldi", "native"):
+            try:
+                list(bob.kaldi.mfcc_from_segments(wav_scp, wide, backend=backend))
+            except ValueError as e:
+                assert "16-bit" in str(e)
+            else:
+                assert False, "the 32-bit recording was accepted"
+
+    # overlapping segments share their frames, without dither this is exact
+    ours = bob.kaldi.mfcc_from_segments(
+        {"reco": sample},
+        [("a", "reco", 0.0, 2.0), ("b", "reco", 1.0, 3.0)],
+        dither=0.0,
+        reuse_frames=True,
+        backend="native",
+    )
+    for (_, feats), signal in zip(ours, [data[0][:32000], data[0][16000:48000]]):
+        theirs = bob.kaldi.mfcc(
+            signal, 16000, dither=0.0, normalization=False, backend="native"
+        )
+        np.testing.assert_allclose(feats, theirs, 1e-05, 1e-05)
+
+
+def test_mfcc_pool():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    theirs = np.loadtxt(reference)
+
+    with bob.kaldi.WorkerPool() as pool:
+        ours = bob.kaldi.mfcc(
+            data.load()[0], data.rate, normalization=False, pool=pool
+        )
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+        # the same processes serve the next request
+        ours = bob.kaldi.mfcc(
+            data.load()[0], data.rate, normalization=False, pool=pool
+        )
+        assert ours.shape == theirs.shape
+
+    # a new worker is not evicted to make room for itself, even when the
+    # other workers are busy
+    with bob.kaldi.WorkerPool(max_workers=1) as pool:
+        busy = pool._acquire([["copy-matrix", "ark:-", "ark,f:-"]], None)
+        with busy.lock:
+            worker = pool._acquire([["add-deltas", "ark:-", "ark,f:-"]], None)
+        assert list(pool._workers.values())[-1] == [worker]
+
+
+def test_pipeline():
+
+    from bob.kaldi import pipeline
+
+    # far larger than the pipe buffers, in and out of the chain
+    feats = np.random.rand(200000, 40).astype("float32")
+    cmd = ["copy-matrix", "ark:-", "ark:-"]
+
+    def write(stdin):
+        bob.kaldi.io.write_mat(stdin, feats, key=b"abc")
+
+    ours = pipeline.run([cmd, cmd], write, pipeline.first(bob.kaldi.io.read_mat_ark))
+    np.testing.assert_array_equal(ours, feats)
+
+    # the chain is stopped when the output is left early
+    records = pipeline.stream([cmd], write, bob.kaldi.io.read_mat_ark)
+    assert next(records)[0] == b"abc"
+    records.close()
+
+    # the binary that failed is reported, not the ones it stopped
+    with tempfile.TemporaryDirectory() as tmpdir:
+        missing = "ark:" + os.path.join(tmpdir, "missing.ark")
+        try:
+            pipeline.run([["copy-matrix", missing, "ark:-"], cmd])
+        except RuntimeError as e:
+            assert "missing.ark" in str(e)
+        else:
+            assert False, "the failure was not reported"
+
+
+def test_amfcc():
+
+    import asyncio
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    theirs = np.loadtxt(reference)
+
+    async def main(backend):
+        # more requests than the concurrency limit, on a single loop
+        return await asyncio.gather(
+            *[
+                bob.kaldi.amfcc(
+                    data.load()[0], data.rate, normalization=False, backend=backend
+                )
+                for i in range(8)
+            ]
+        )
+
+    limit = bob.kaldi.aio._max_concurrency
+    bob.kaldi.aio.set_max_concurrency(2)
+    try:
+        for backend in ("kaldi", "native"):
+            for ours in asyncio.run(main(backend)):
+                np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+    finally:
+        bob.kaldi.aio.set_max_concurrency(limit)
+
+
+def test_mfcc_batch():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    signal = data.load()[0]
+    theirs = np.loadtxt(reference)
+
+    utterances = [("first", signal), ("second", signal[: signal.size // 2])]
+    ours = list(bob.kaldi.mfcc_batch(utterances, data.rate, normalization=False))
+
+    assert [key for key, feats in ours] == ["first", "second"]
+    assert ours[0][1].shape == theirs.shape
+    assert ours[1][1].shape[1] == theirs.shape[1]
+    # the dither sequence continues over utterances in the same pipeline
+    np.testing.assert_allclose(ours[0][1], theirs, 1e-02, 1e-02)
+
+
+def test_mfcc_from_paths():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    theirs = np.loadtxt(reference)
+
+    ours = list(bob.kaldi.mfcc_from_paths([sample, sample]))
+
+    assert [key for key, feats in ours] == [sample, sample]
+    np.testing.assert_allclose(ours[0][1], theirs, 1e-02, 1e-02)
+
+    # paths with whitespace are rejected before the pipeline starts
+    with tempfile.TemporaryDirectory() as tmpdir:
+        spaced = os.path.join(tmpdir, "sample 16k.wav")
+        with open(sample, "rb") as src, open(spaced, "wb") as dst:
+            dst.write(src.read())
+        try:
+            list(bob.kaldi.mfcc_from_paths([sample, spaced]))
+        except ValueError as e:
+            assert "sample 16k.wav" in str(e)
+        else:
+            assert False, "the path was accepted"
+
+
 def test_compute_vad():
 
     sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
@@ -53,6 +429,24 @@ def test_compute_vad():
     np.testing.assert_allclose(ours, theirs)
 
 
+def test_compute_vad_native():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-vad.txt")
+
+    data = bob.io.audio.reader(sample)
+    theirs = np.loadtxt(reference)
+
+    ours = bob.kaldi.compute_vad(data.load()[0], data.rate, backend="native")
+    np.testing.assert_array_equal(ours, theirs)
+
+    utterances = [("a", data.load()[0]), ("b", data.load()[0][:8000])]
+    for backend in ("kaldi", "native"):
+        ours = dict(bob.kaldi.compute_vad_batch(utterances, data.rate, backend=backend))
+        np.testing.assert_array_equal(ours["a"], theirs)
+        assert ours["b"].shape == (48,)
+
+
 def test_cepstral_mfcc():
 
     sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
@@ -84,3 +478,262 @@ def test_cepstral_plp():
     assert ours.shape == theirs.shape
 
     np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+
+def test_cepstral_native():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+
+    for cepstral_type in ("mfcc", "plp"):
+        reference = pkg_resources.resource_filename(
+            __name__, "data/sample16k-cepstral-%s.txt" % cepstral_type
+        )
+        ours = bob.kaldi.cepstral(
+            data.load()[0],
+            cepstral_type,
+            data.rate,
+            normalization=False,
+            backend="native",
+        )
+        theirs = np.loadtxt(reference)
+
+        assert ours.shape == theirs.shape
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+
+def test_fbank():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    theirs = np.loadtxt(reference)
+
+    for backend in ("kaldi", "native"):
+        fbank, mfcc, energy = bob.kaldi.fbank_mfcc(
+            data.load()[0], data.rate, normalization=False, backend=backend
+        )
+        assert fbank.shape == (317, 23)
+        np.testing.assert_allclose(energy, mfcc[:, 0])
+
+        # the MFCCs are those of compute-mfcc-feats
+        ours = bob.kaldi.apply_cmvn_sliding(bob.kaldi.add_deltas(mfcc))
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+        ours = bob.kaldi.fbank(
+            data.load()[0], data.rate, normalization=False, backend=backend
+        )
+        np.testing.assert_allclose(ours, fbank, 1e-05, 1e-05)
+
+        ours = bob.kaldi.cepstral(
+            data.load()[0], "fbank", data.rate, normalization=False, backend=backend
+        )
+        assert ours.shape == (317, 69)
+
+
+def test_cepstral_speaker_cmvn():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    first, second = data.load()[0][:25000], data.load()[0][25000:]
+
+    statics = [
+        bob.kaldi.cepstral(
+            x, "mfcc", data.rate, delta_order=0, normalization=False, norm_means=False
+        )
+        for x in (first, second)
+    ]
+    stats = bob.kaldi.compute_cmvn_stats(statics)
+    np.testing.assert_allclose(stats, bob.kaldi.compute_cmvn_stats(np.vstack(statics)))
+    assert stats[0, -1] == sum(len(x) for x in statics)
+
+    # the speaker statistics normalize all utterances together
+    ours = [
+        bob.kaldi.cepstral(
+            x, "mfcc", data.rate, normalization=False, cmvn_stats=stats, norm_vars=True
+        )
+        for x in (first, second)
+    ]
+    ours = np.vstack(ours)[:, :13]
+    np.testing.assert_allclose(ours.mean(axis=0), 0.0, 1e-02, 1e-02)
+    np.testing.assert_allclose(ours.std(axis=0), 1.0, 1e-02, 1e-02)
+
+    ours = bob.kaldi.apply_cmvn(statics[0])
+    theirs = bob.kaldi.cepstral(
+        first, "mfcc", data.rate, delta_order=0, normalization=False
+    )
+    np.testing.assert_allclose(ours, theirs, 1e-05, 1e-04)
+
+
+def test_apply_cmvn_sliding():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    feats = bob.kaldi.mfcc(
+        data.load()[0], data.rate, normalization=False, backend="native"
+    )
+
+    # shorter than the window: the mean of the whole matrix is removed
+    ours = bob.kaldi.apply_cmvn_sliding(feats[:200])
+    theirs = feats[:200] - feats[:200].mean(axis=0)
+    np.testing.assert_allclose(ours, theirs, 1e-05, 1e-04)
+
+    # the sliding mean follows a constant offset
+    ours = bob.kaldi.apply_cmvn_sliding(feats + 5)
+    theirs = bob.kaldi.apply_cmvn_sliding(feats)
+    np.testing.assert_allclose(ours, theirs, 1e-04, 1e-04)
+
+    # batches are normalized one matrix at a time
+    ours = bob.kaldi.apply_cmvn_sliding([feats, feats[:100]], norm_vars=True)
+    assert ours[0].shape == feats.shape
+    assert ours[1].shape == (100, feats.shape[1])
+    np.testing.assert_allclose(np.std(ours[1], axis=0), 1.0, 1e-02, 1e-02)
+
+
+def test_add_deltas():
+
+    reference = pkg_resources.resource_filename(
+        __name__, "data/sample16k-cepstral-mfcc.txt"
+    )
+    theirs = np.loadtxt(reference)
+
+    # the deltas of the reference statics are those of add-deltas
+    ours = bob.kaldi.add_deltas(theirs[:, :13].astype("float32"))
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+    # a ramp has a constant slope, except at the replicated edges
+    ramp = np.arange(20, dtype="float64")[:, None]
+    ours = bob.kaldi.add_deltas(ramp, order=1, window=2)
+    np.testing.assert_allclose(ours[2:-2, 1], 1.0)
+
+    # batches and lists of matrices are processed one matrix at a time
+    batch = bob.kaldi.add_deltas(np.stack([theirs[:, :13], theirs[:, :13]]))
+    assert batch.shape == (2,) + theirs.shape
+    ragged = bob.kaldi.add_deltas([theirs[:, :13], theirs[:50, :13]])
+    assert ragged[1].shape == (50, 39)
+    np.testing.assert_allclose(ragged[0], batch[0])
+
+
+def test_mfcc_cache():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+
+    data = bob.io.audio.reader(sample)
+    theirs = np.loadtxt(reference)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = bob.kaldi.FeatureCache(directory)
+        for i in range(2):
+            ours = bob.kaldi.mfcc(
+                data.load()[0], data.rate, normalization=False, cache=cache
+            )
+            np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # other options make another entry
+        bob.kaldi.mfcc(
+            data.load()[0], data.rate, normalization=False, num_ceps=12, cache=cache
+        )
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        for i in range(2):
+            ours = bob.kaldi.mfcc_from_path(sample, cache=cache)
+            np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+        assert (cache.hits, cache.misses) == (2, 3)
+
+        # the input is not normalized in place, on a miss as on a hit
+        signal = data.load()[0]
+        original = signal.copy()
+        for i in range(2):
+            bob.kaldi.mfcc(signal, data.rate, cache=cache)
+            np.testing.assert_array_equal(signal, original)
+        assert (cache.hits, cache.misses) == (3, 4)
+
+        # the channels of a file are stored together
+        for i in range(2):
+            feats = bob.kaldi.mfcc_from_path(sample, channel="all", cache=cache)
+            assert feats.shape == (2, 317, 39)
+            np.testing.assert_allclose(feats[0], theirs, 1e-02, 1e-02)
+        assert (cache.hits, cache.misses) == (4, 5)
+        uncached = bob.kaldi.mfcc_from_path(sample, channel="all")
+        np.testing.assert_allclose(feats, uncached, 1e-02, 1e-02)
+
+        # replacing an entry does not count its size twice
+        size = cache._size
+        cache.put(cache.key("mfcc", sample), ours)
+        cache.put(cache.key("mfcc", sample), ours)
+        assert cache._size == size + ours.nbytes + 15
+
+        # the least recently used entries are removed
+        cache = bob.kaldi.FeatureCache(directory, max_bytes=100000)
+        cache.put(cache.key("mfcc", sample), ours)
+        sizes = [
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory)
+            for name in names
+        ]
+        assert len(sizes) < 4 and sum(sizes) <= 100000
+
+
+def test_mfcc_vad():
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+    vad_reference = pkg_resources.resource_filename(__name__, "data/sample16k-vad.txt")
+
+    data = bob.io.audio.reader(sample)
+
+    ours, _ = bob.kaldi.mfcc_vad(data.load()[0], data.rate, normalization=False)
+    theirs = np.loadtxt(reference)
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+    # compute_vad normalizes the samples
+    _, ours = bob.kaldi.mfcc_vad(data.load()[0], data.rate)
+    theirs = np.loadtxt(vad_reference)
+    np.testing.assert_allclose(ours, theirs)
+
+    # the threshold is 5 + 0.5 * 10, 3 frames out of 5 need to be above
+    feats = np.zeros((20, 13), dtype="float32")
+    feats[10:, 0] = 20
+    ours = bob.kaldi.compute_vad_from_feats(feats, vad_frames_context=2)
+    np.testing.assert_allclose(ours, feats[:, 0] > 0)
+
+
+def test_feature_extractor():
+
+    import pickle
+
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    samples = data.load()[0]
+
+    extractor = bob.kaldi.FeatureExtractor(normalization=False)
+    reference = pkg_resources.resource_filename(__name__, "data/sample16k-mfcc.txt")
+    theirs = np.loadtxt(reference)
+    ours = extractor(samples, data.rate)
+    np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
+
+    # batches share the tables, which are not pickled
+    batch = extractor([samples, samples[:8000]], data.rate)
+    np.testing.assert_allclose(batch[0], ours)
+    assert batch[1].shape == (48, 39)
+    copy = pickle.loads(pickle.dumps(extractor))
+    assert len(pickle.dumps(extractor)) < 1000
+    np.testing.assert_allclose(copy(samples, data.rate), ours)
+
+    for cepstral_type in ("mfcc", "plp"):
+        reference = pkg_resources.resource_filename(
+            __name__, "data/sample16k-cepstral-%s.txt" % cepstral_type
+        )
+        extractor = bob.kaldi.FeatureExtractor(
+            cepstral_type, cmvn="utterance", normalization=False
+        )
+        ours = extractor(samples, data.rate)
+        theirs = np.loadtxt(reference)
+        np.testing.assert_allclose(ours, theirs, 1e-02, 1e-02)
@@ -93,21 +93,325 @@ def test_gmm_score():
     np.testing.assert_allclose(score, [0.28698], 1e-03, 1e-05)
 
 
-# def test_gmm_score_fast():
-
-#     temp_dubm_file = bob.io.base.test_utils.temporary_filename()
-#     sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
-
-#     data = bob.io.audio.reader(sample)
-#     # MFCC
-#     array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
-#     # Train small diagonal GMM
-#     dubm = bob.kaldi.ubm_train(
-#         array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
-#     )
-#     # Perform MAP adaptation of the GMM
-#     spk_model = bob.kaldi.ubm_enroll(array, dubm)
-#     # GMM scoring
-#     score = bob.kaldi.gmm_score_fast(array, spk_model, dubm)
-
-#     np.testing.assert_allclose(score, [0.282168])
+def test_gmm_score_pool():
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    # Perform MAP adaptation of the GMM
+    spk_model = bob.kaldi.ubm_enroll(array, dubm)
+    # GMM scoring on warm workers, twice with the same processes
+    with bob.kaldi.WorkerPool() as pool:
+        for i in range(2):
+            score = bob.kaldi.gmm_score(array, spk_model, dubm, pool=pool)
+            np.testing.assert_allclose(score, [0.28698], 1e-03, 1e-05)
+
+
+def test_gmm_score_native():
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    # Perform MAP adaptation of the GMM
+    spk_model = bob.kaldi.ubm_enroll(array, dubm)
+    # GMM scoring in-process, with text and parsed models
+    score = bob.kaldi.gmm_score(array, spk_model, dubm, backend="native")
+    np.testing.assert_allclose(score, [0.28698], 1e-03, 1e-05)
+    spk, ubm = [bob.kaldi.DiagGmm.from_string(m) for m in (spk_model, dubm)]
+    ours = bob.kaldi.gmm_score(array, spk, ubm, backend="native")
+    assert ours == score
+
+
+def test_gmm_frame_likes():
+
+    rng = np.random.RandomState(0)
+    means = rng.randn(8, 5)
+    inv_vars = rng.uniform(0.5, 2.0, (8, 5))
+    weights = rng.dirichlet(np.ones(8))
+    gmm = bob.kaldi.DiagGmm(
+        weights.astype("float32"),
+        (means * inv_vars).astype("float32"),
+        inv_vars.astype("float32"),
+    )
+    feats = rng.randn(100, 5).astype("float32")
+
+    # sum of the weighted Gaussian densities, in double precision
+    diff = feats[:, None, :] - means
+    logdens = -0.5 * (
+        5 * np.log(2 * np.pi)
+        - np.log(inv_vars).sum(axis=1)
+        + (diff ** 2 * inv_vars).sum(axis=2)
+    )
+    theirs = np.log((weights * np.exp(logdens)).sum(axis=1))
+
+    # the result does not depend on the chunks
+    for chunk_size in (7, 1024):
+        ours = bob.kaldi.native.gmm_frame_likes(feats, gmm, chunk_size)
+        np.testing.assert_allclose(ours, theirs, 1e-04, 1e-04)
+
+
+def test_agmm_score():
+
+    import asyncio
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    # Perform MAP adaptation of the GMM
+    spk_model = bob.kaldi.ubm_enroll(array, dubm)
+
+    # GMM scoring of concurrent requests on an event loop
+    async def main():
+        return await asyncio.gather(
+            *[bob.kaldi.agmm_score(array, spk_model, dubm) for i in range(4)]
+        )
+
+    for score in asyncio.run(main()):
+        np.testing.assert_allclose(score, [0.28698], 1e-03, 1e-05)
+
+
+def test_diag_gmm():
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    temp_binary_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    spk_model = bob.kaldi.ubm_enroll(array, dubm)
+
+    ubm = bob.kaldi.DiagGmm.from_string(dubm)
+    assert ubm.means_invvars.shape == (2, 39)
+    np.testing.assert_allclose(ubm.gconsts, ubm.compute_gconsts(), 1e-03, 1e-03)
+
+    # the binary form holds the same parameters
+    ubm.write(temp_binary_file)
+    theirs = bob.kaldi.DiagGmm.read(temp_binary_file)
+    for name in ("weights", "means_invvars", "inv_vars", "gconsts"):
+        np.testing.assert_array_equal(getattr(theirs, name), getattr(ubm, name))
+    os.unlink(temp_binary_file)
+
+    # parsed models are accepted in place of the text ones
+    spk = bob.kaldi.DiagGmm.from_string(spk_model)
+    score = bob.kaldi.gmm_score(array, spk, ubm)
+    np.testing.assert_allclose(score, [0.28698], 1e-03, 1e-05)
+    adapted = bob.kaldi.DiagGmm.from_string(bob.kaldi.ubm_enroll(array, ubm))
+    np.testing.assert_allclose(adapted.means_invvars, spk.means_invvars, 1e-04, 1e-04)
+
+
+def test_full_gmm():
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    temp_fubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal and full GMMs
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    fubm = bob.kaldi.ubm_full_train(
+        array,
+        bob.kaldi.DiagGmm.from_string(dubm),
+        temp_fubm_file,
+        num_gselect=2,
+        num_iters=2,
+    )
+
+    ubm = bob.kaldi.FullGmm.from_string(fubm)
+    assert ubm.inv_covars.shape == (2, 39, 39)
+    np.testing.assert_allclose(ubm.gconsts, ubm.compute_gconsts(), 1e-03, 1e-03)
+    theirs = bob.kaldi.FullGmm.read(temp_fubm_file)
+    np.testing.assert_array_equal(theirs.inv_covars, ubm.inv_covars)
+
+
+def test_gmm_score_fast():
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    # Perform MAP adaptation of the GMM
+    spk_model = bob.kaldi.ubm_enroll(array, dubm)
+    # GMM scoring, all the Gaussians are selected
+    score = bob.kaldi.gmm_score_fast(array, spk_model, dubm, num_gselect=2)
+    theirs = bob.kaldi.gmm_score(array, spk_model, dubm)
+    np.testing.assert_allclose(score, theirs, 1e-03, 1e-05)
+    ours = bob.kaldi.gmm_score_fast(
+        array, spk_model, dubm, num_gselect=2, backend="native"
+    )
+    np.testing.assert_allclose(ours, score, 1e-03, 1e-05)
+    # GMM scoring on the best Gaussian only
+    score = bob.kaldi.gmm_score_fast(array, spk_model, dubm, num_gselect=1)
+    ours = bob.kaldi.gmm_score_fast(
+        array, spk_model, dubm, num_gselect=1, backend="native"
+    )
+    np.testing.assert_allclose(ours, score, 1e-03, 1e-05)
+
+
+def test_gmm_gselect():
+
+    rng = np.random.RandomState(0)
+    means = 3 * rng.randn(64, 5)
+    inv_vars = rng.uniform(0.5, 2.0, (64, 5))
+    gmm = bob.kaldi.DiagGmm(
+        rng.dirichlet(np.ones(64)).astype("float32"),
+        (means * inv_vars).astype("float32"),
+        inv_vars.astype("float32"),
+    )
+    feats = 3 * rng.randn(200, 5).astype("float32")
+
+    # the selected Gaussians are the most likely ones, best first
+    gselect = bob.kaldi.native.gmm_gselect(feats, gmm, 8, chunk_size=7)
+    assert gselect.shape == (200, 8)
+    full = bob.kaldi.native.gmm_gselect(feats, gmm, 64)
+    np.testing.assert_array_equal(gselect, full[:, :8])
+
+    # selecting all the Gaussians gives the full likelihoods, and the top
+    # ones hold nearly all the probability mass
+    theirs = bob.kaldi.native.gmm_frame_likes(feats, gmm)
+    ours = bob.kaldi.native.gmm_frame_likes(feats, gmm, gselect=full)
+    np.testing.assert_allclose(ours, theirs, 1e-05, 1e-05)
+    ours = bob.kaldi.native.gmm_frame_likes(feats, gmm, 7, gselect)
+    assert np.all(ours <= theirs + 1e-05)
+    assert np.mean(theirs - ours) < 0.01
+
+
+def test_gmm_score_matrix():
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    # Perform MAP adaptation of the GMM on two utterances
+    utterances = [array[:150], array[150:]]
+    models = [bob.kaldi.ubm_enroll(u, dubm) for u in utterances]
+    theirs = [[bob.kaldi.gmm_score(u, m, dubm) for u in utterances] for m in models]
+
+    # GMM scoring of every utterance against every model
+    scores = bob.kaldi.gmm_score_matrix(models, utterances, dubm)
+    assert scores.shape == (2, 2)
+    np.testing.assert_allclose(scores, theirs, 1e-05, 1e-05)
+    models = [bob.kaldi.DiagGmm.from_string(m) for m in models]
+    ubm = bob.kaldi.DiagGmm.from_string(dubm)
+    with ProcessPoolExecutor(2) as executor:
+        for backend in ("kaldi", "native"):
+            scores = bob.kaldi.gmm_score_matrix(
+                models, utterances, ubm, executor=executor, backend=backend
+            )
+            np.testing.assert_allclose(scores, theirs, 1e-03, 1e-05)
+            # one chunk per utterance, or a single chunk
+            for num_workers in (2, 1):
+                scores = bob.kaldi.gmm_score_matrix(
+                    models,
+                    utterances,
+                    ubm,
+                    executor=executor,
+                    backend=backend,
+                    num_workers=num_workers,
+                )
+                np.testing.assert_allclose(scores, theirs, 1e-03, 1e-05)
+    # all the Gaussians are selected
+    scores = bob.kaldi.gmm_score_matrix(models, utterances, ubm, num_gselect=2)
+    np.testing.assert_allclose(scores, theirs, 1e-05, 1e-05)
+
+
+def test_ubm_cache():
+
+    temp_dubm_file = bob.io.base.test_utils.temporary_filename()
+    sample = pkg_resources.resource_filename(__name__, "data/sample16k.wav")
+
+    data = bob.io.audio.reader(sample)
+    # MFCC
+    array = bob.kaldi.mfcc(data.load()[0], data.rate, normalization=False)
+    # Train small diagonal GMM
+    dubm = bob.kaldi.ubm_train(
+        array, temp_dubm_file, num_gauss=2, num_gselect=2, num_iters=2
+    )
+    cache = bob.kaldi.UbmCache()
+
+    # MAP adaptation from the cached statistics, which the backends do
+    # not share
+    theirs = bob.kaldi.DiagGmm.from_string(bob.kaldi.ubm_enroll(array, dubm))
+    for backend in ("kaldi", "native", "kaldi"):
+        spk_model = bob.kaldi.ubm_enroll(array, dubm, backend=backend, cache=cache)
+        ours = bob.kaldi.DiagGmm.from_string(spk_model)
+        np.testing.assert_allclose(
+            ours.means_invvars, theirs.means_invvars, 1e-04, 1e-04
+        )
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # GMM scoring with the cached UBM frame log-likelihoods
+    for backend in ("kaldi", "native", "kaldi"):
+        score = bob.kaldi.gmm_score(
+            array, spk_model, dubm, backend=backend, cache=cache
+        )
+        np.testing.assert_allclose(score, [0.28698], 1e-03, 1e-05)
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert cache.hit_rate == 2 / 6
+
+    # the Gaussian selection is cached too
+    theirs = bob.kaldi.gmm_score_fast(array, spk_model, dubm, num_gselect=1)
+    for i in range(2):
+        ours = bob.kaldi.gmm_score_fast(
+            array, spk_model, dubm, num_gselect=1, backend="kaldi", cache=cache
+        )
+        assert type(ours) is type(theirs) is float
+        np.testing.assert_allclose(ours, theirs, 1e-03, 1e-05)
+    assert (cache.hits, cache.misses) == (4, 6)
+
+    # a parsed UBM is hashed on its first use only
+    ubm = bob.kaldi.DiagGmm.from_string(dubm)
+    key = cache.key(array, ubm)
+    ubm.weights = ubm.weights[::-1]
+    assert cache.key(array, ubm) == key
+
+    # the least recently used entries are dropped, the cache holds the
+    # log-likelihoods of 100 frames only
+    cache = bob.kaldi.UbmCache(max_bytes=600)
+    for feats in (array[:100], array[100:200], array[:100]):
+        bob.kaldi.gmm_score(feats, spk_model, dubm, backend="native", cache=cache)
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (0, 3)
@@ -6,6 +6,7 @@
 
 """Tests for Kaldi bindings"""
 
+import asyncio
 import os
 
 import numpy as np
@@ -78,6 +79,21 @@ def test_ivector_extract():
 
     np.testing.assert_allclose(ivector_array, theirs, rtol=1e-03, atol=1e-05)
 
+    # the same, as a coroutine
+    ivector_array = asyncio.run(
+        bob.kaldi.aivector_extract(array, fubm, ivector, num_gselect=2)
+    )
+    np.testing.assert_allclose(ivector_array, theirs, rtol=1e-03, atol=1e-05)
+
+    # the UBM posteriors are computed once
+    cache = bob.kaldi.UbmCache()
+    for i in range(2):
+        ivector_array = bob.kaldi.ivector_extract(
+            array, fubm, ivector, num_gselect=2, cache=cache
+        )
+        np.testing.assert_allclose(ivector_array, theirs, rtol=1e-03, atol=1e-05)
+    assert (cache.hits, cache.misses) == (1, 1)
+
 
 def test_plda_train():
 
@@ -129,3 +145,8 @@ def test_plda_score():
     score = bob.kaldi.plda_score(test_feats, enrolled, plda[0], plda[1])
 
     np.testing.assert_allclose(score, [-23.9922], 1e-03, 1e-05)
+
+    score = asyncio.run(
+        bob.kaldi.aplda_score(test_feats, enrolled, plda[0], plda[1])
+    )
+    np.testing.assert_allclose(score, [-23.9922], 1e-03, 1e-05)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8 :
+
+import collections
+import logging
+import os
+import struct
+import tempfile
+import threading
+
+from . import io
+from . import pipeline
+from .models import _Gmm
+
+logger = logging.getLogger(__name__)
+
+
+def read_mat_record(fd):
+    """Reads a single keyed matrix from a Kaldi archive stream.
+
+    Parameters
+    ----------
+    fd : obj
+        An opened file descriptor, e.g. the ``stdout`` of a worker.
+
+    Returns
+    -------
+    numpy.ndarray
+        The matrix, or ``None`` at the end of the stream.
+    """
+    if io.read_key(fd) is None:
+        return None
+    return io.read_mat(fd)
+
+
+def read_text_record(fd):
+    """Reads a single ``key value...`` line from a text archive stream.
+
+    Parameters
+    ----------
+    fd : obj
+        An opened file descriptor, e.g. the ``stdout`` of a worker.
+
+    Returns
+    -------
+    list
+        The values of the record as strings, or ``None`` at the end of the
+        stream.
+    """
+    line = fd.readline().split()
+    if not line:
+        return None
+    return [v.decode("utf-8") for v in line[1:]]
+
+
+class KaldiWorker(object):
+    """A chain of Kaldi processes kept alive to serve many requests.
+
+    Kaldi binaries reading an archive from ``stdin`` process one key at a
+    time until EOF. If their output archives are flushed after each
+    record (``ark,f:-``), a single chain can therefore serve one request
+    after the other: one keyed record is written and one output record is
+    read back.
+
+    Parameters
+    ----------
+    cmds : list
+        The commands of the pipeline, each one a list of arguments. The
+        first command reads from ``stdin`` and the last one writes to
+        ``stdout``.
+    models : :obj:`dict`, optional
+        Maps placeholder names to model contents (text strings) or parsed
+        models, e.g. :py:class:`bob.kaldi.DiagGmm`. The text models are
+        written to files once when the worker starts and every ``{name}``
+        in ``cmds`` is replaced by the path of the file.
+    timeout : :obj:`float`, optional
+        Seconds after which a request is considered lost (e.g. Kaldi
+        skipped the utterance) and the processes are killed.
+    """
+
+    def __init__(self, cmds, models=None, timeout=60):
+        self.cmds = [list(cmd) for cmd in cmds]
+        self.models = dict(models or {})
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self._pipes = []
+        self._files = []
+        self._logfile = None
+
+    def start(self):
+        """Writes the models and starts the processes"""
+        self.close()
+        paths = {}
+        for name, model in self.models.items():
+            if isinstance(model, _Gmm):
+                paths["{" + name + "}"] = model.path()
+                continue
+            with tempfile.NamedTemporaryFile(
+                mode="wt", delete=False, suffix="." + name
+            ) as fp:
+                fp.write(model)
+            self._files.append(fp.name)
+            paths["{" + name + "}"] = fp.name
+
+        self._logfile = tempfile.TemporaryFile(suffix=".log")
+        cmds = []
+        for cmd in self.cmds:
+            for placeholder, path in paths.items():
+                cmd = [arg.replace(placeholder, path) for arg in cmd]
+            cmds.append(cmd)
+        self._pipes = pipeline._start(cmds, self._logfile)
+        logger.debug("Started Kaldi worker: %s", " | ".join(c[0] for c in self.cmds))
+
+    def alive(self):
+        """Tells if all the processes of the chain are running"""
+        return bool(self._pipes) and all(p.poll() is None for p in self._pipes)
+
+    def _kill(self):
+        for pipe in self._pipes:
+            if pipe.poll() is None:
+                pipe.kill()
+
+    def request(self, write, read):
+        """Serves one request.
+
+        Parameters
+        ----------
+        write : callable
+            Called with the ``stdin`` of the first process, it should write
+            exactly one keyed record.
+        read : callable
+            Called with the ``stdout`` of the last process, it should read
+            exactly one output record and return it.
+
+        Returns
+        -------
+        object
+            Whatever ``read`` returned.
+
+        Raises
+        ------
+        RuntimeError
+            If the processes died or did not answer within the timeout.
+        """
+        with self.lock:
+            if not self.alive():
+                self.start()
+            watchdog = threading.Timer(self.timeout, self._kill)
+            watchdog.start()
+            # the record is written while the answer is read, so records
+            # larger than the pipe buffers cannot block the chain
+            feeder = pipeline._Feeder(self._pipes[0].stdin, write, close=False)
+            feeder.start()
+            try:
+                ret = read(self._pipes[-1].stdout)
+                feeder.join()
+                if feeder.error is not None:
+                    raise feeder.error
+            except (OSError, ValueError, AssertionError, struct.error) as e:
+                self._log_failure()
+                self.close()
+                raise RuntimeError("Kaldi worker failed: %s" % e)
+            finally:
+                watchdog.cancel()
+            if ret is None:
+                self._log_failure()
+                self.close()
+                raise RuntimeError("Kaldi worker returned no output")
+            return ret
+
+    def _log_failure(self):
+        if self._logfile is not None:
+            self._logfile.seek(0)
+            logger.debug("%s", self._logfile.read().decode("utf-8", "replace"))
+
+    def close(self):
+        """Stops the processes and removes the model files"""
+        if self._pipes:
+            try:
+                self._pipes[0].stdin.close()
+            except OSError:
+                pass
+            for pipe in self._pipes:
+                pipe.stdout.close()
+            self._kill()
+            for pipe in self._pipes:
+                pipe.wait()
+        self._pipes = []
+        for name in self._files:
+            os.unlink(name)
+        self._files = []
+        if self._logfile is not None:
+            self._logfile.close()
+            self._logfile = None
+
+    def __del__(self):
+        self.close()
+
+
+class WorkerPool(object):
+    """Keeps :py:class:`KaldiWorker` chains warm and multiplexes requests.
+
+    Workers are indexed by their commands and models, so each distinct
+    (binary, options, model) combination gets its own processes.
+
+    Parameters
+    ----------
+    size : :obj:`int`, optional
+        Maximum number of concurrent workers for the same commands.
+    max_workers : :obj:`int`, optional
+        Maximum number of workers in the pool. The least recently used
+        idle workers are stopped when it is exceeded.
+    retries : :obj:`int`, optional
+        How many times a failed request is retried on a restarted worker.
+    timeout : :obj:`float`, optional
+        See :py:class:`KaldiWorker`.
+    """
+
+    def __init__(self, size=1, max_workers=16, retries=1, timeout=60):
+        self.size = size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.timeout = timeout
+        self._workers = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _acquire(self, cmds, models):
+        key = (
+            tuple(tuple(cmd) for cmd in cmds),
+            tuple(sorted((models or {}).items())),
+        )
+        with self._lock:
+            workers = self._workers.pop(key, [])
+            self._workers[key] = workers  # most recently used
+            for worker in workers:
+                if worker.lock.acquire(False):
+                    worker.lock.release()
+                    return worker
+            if len(workers) < self.size:
+                # make room first, the new worker is not locked by its caller
+                # yet and could be evicted otherwise
+                self._evict(self.max_workers - 1)
+                workers = self._workers.setdefault(key, workers)
+                worker = KaldiWorker(cmds, models, self.timeout)
+                workers.append(worker)
+                return worker
+            return workers[0]
+
+    def _evict(self, max_workers):
+        total = sum(len(w) for w in self._workers.values())
+        for key in list(self._workers):
+            if total <= max_workers:
+                break
+            workers = self._workers[key]
+            for worker in list(workers):
+                if total > max_workers and worker.lock.acquire(False):
+                    workers.remove(worker)
+                    worker.close()
+                    worker.lock.release()
+                    total -= 1
+            if not workers:
+                del self._workers[key]
+
+    def submit(self, cmds, write, read, models=None):
+        """Runs one request on a warm worker.
+
+        Parameters
+        ----------
+        cmds : list
+            The pipeline commands, see :py:class:`KaldiWorker`.
+        write : callable
+            Writes one keyed record, see :py:meth:`KaldiWorker.request`.
+        read : callable
+            Reads one output record, see :py:meth:`KaldiWorker.request`.
+        models : :obj:`dict`, optional
+            The models used by ``cmds``, see :py:class:`KaldiWorker`.
+
+        Returns
+        -------
+        object
+            Whatever ``read`` returned.
+        """
+        for attempt in range(self.retries + 1):
+            worker = self._acquire(cmds, models)
+            try:
+                return worker.request(write, read)
+            except RuntimeError:
+                if attempt == self.retries:
+                    raise
+                logger.warning("Restarting Kaldi worker: %s", cmds[0][0])
+
+    def close(self):
+        """Stops all workers"""
+        with self._lock:
+            for workers in self._workers.values():
+                for worker in workers:
+                    with worker.lock:
+                        worker.close()
+            self._workers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()